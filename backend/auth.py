@@ -1,24 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
+import jwt as pyjwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
 import os
+from token_cache import token_cache
+from session_versions import is_current
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+# Short-lived; clients renew through /api/auth/refresh
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+# "jose" (default) or "pyjwt", which decodes the same tokens with less overhead
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# bcrypt takes a few hundred ms per call; request handlers run it on this pool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_jobs = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_password_job(fn, *args):
+    """Run a bcrypt call off the event loop, shedding load once the queue is full"""
+    global _password_jobs
+    if _password_jobs >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sunucu şu anda yoğun, lütfen tekrar deneyin",
+            headers={"Retry-After": "1"}
+        )
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, fn, *args)
+    finally:
+        _password_jobs -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_job(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,31 +65,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def decode_token(token: str):
+def create_session_token(user_id: str, role: str, version: int = 0) -> str:
+    """Access token with compact claims: user id as sub, role and session version"""
+    return create_access_token({"sub": user_id, "role": role, "ver": version})
+
+def _decode_jose(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    token = credentials.credentials
-    payload = decode_token(token)
-    
-    if payload is None:
-        raise credentials_exception
-    
-    email: str = payload.get("sub")
-    if email is None:
-        raise credentials_exception
+def _decode_pyjwt(token: str):
+    try:
+        return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except pyjwt.PyJWTError:
+        return None
+
+decode_token = _decode_pyjwt if JWT_BACKEND == "pyjwt" else _decode_jose
+
+def authenticate_token(token: str) -> Optional[dict]:
+    """Principal for a valid token, from the verified-token cache when possible"""
+    principal = token_cache.get(token)
+    if principal is None:
+        payload = decode_token(token)
+        if payload is None or payload.get("sub") is None:
+            return None
+        if "userId" in payload:
+            # Tokens issued before compact claims carry the email as sub
+            email, user_id = payload["sub"], payload["userId"]
+        else:
+            email, user_id = None, payload["sub"]
+        principal = {
+            "email": email,
+            "userId": user_id,
+            "role": payload.get("role"),
+            "tokenVersion": payload.get("ver", 0)
+        }
+        token_cache.put(token, principal, payload.get("exp"))
     
-    return {"email": email, "userId": payload.get("userId"), "role": payload.get("role")}
+    # Revoked by a password/email change or an admin since it was issued
+    if not is_current(principal["userId"], principal["tokenVersion"]):
+        return None
+    return principal
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    principal = authenticate_token(credentials.credentials)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
 
 async def get_current_admin(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
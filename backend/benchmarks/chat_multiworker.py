@@ -0,0 +1,86 @@
+"""
+Multi-worker chat delivery check for socket_queue.AsyncUnixSocketManager.
+
+Starts several worker processes, each with its own Socket.IO server and one
+connected participant in the same chat room. Every worker emits a message to
+the room, and the run fails unless every participant receives the message
+from every worker.
+
+    python -m benchmarks.chat_multiworker --workers 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import tempfile
+import time
+
+
+def worker(index, workers, queue_dir, ready, start, results):
+    import socketio
+    from socket_queue import AsyncUnixSocketManager
+
+    async def main():
+        manager = AsyncUnixSocketManager(f"unix://{queue_dir}")
+        sio = socketio.AsyncServer(async_mode="asgi", client_manager=manager)
+        received = []
+
+        async def record(eio_sid, eio_pkt):
+            # Encoded Socket.IO event: '2' + JSON array [event, data]
+            received.append(json.loads(eio_pkt.data[1:]))
+
+        # Capture outgoing packets instead of writing them to a real transport
+        sio._send_eio_packet = record
+        manager.initialize()
+
+        sid = await manager.connect(f"eio-{index}", "/")
+        await manager.enter_room(sid, "/", "chat:multiworker")
+
+        # Give the listener a moment to bind its socket before announcing readiness
+        while not manager.socket_path.exists():
+            await asyncio.sleep(0.01)
+        ready.put(index)
+        while start.empty():
+            await asyncio.sleep(0.01)
+
+        await sio.emit("new_message", {"from": index}, room="chat:multiworker")
+
+        deadline = time.monotonic() + 5
+        while len(received) < workers and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        results.put({"worker": index, "from": sorted(data[1]["from"] for data in received)})
+
+    asyncio.run(main())
+
+
+def run(workers: int):
+    ctx = multiprocessing.get_context("spawn")
+    ready, start, results = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    with tempfile.TemporaryDirectory() as queue_dir:
+        processes = [
+            ctx.Process(target=worker, args=(i, workers, queue_dir, ready, start, results))
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in range(workers):
+            ready.get(timeout=10)
+        # Let every worker's peer list pick up the others
+        time.sleep(1.5)
+        start.put(True)
+
+        outcome = sorted((results.get(timeout=15) for _ in range(workers)), key=lambda r: r["worker"])
+        for process in processes:
+            process.join(timeout=5)
+
+    print(json.dumps(outcome, indent=2))
+    expected = list(range(workers))
+    missing = [r for r in outcome if r["from"] != expected]
+    assert not missing, f"messages were not delivered across workers: {missing}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    run(args.workers)
@@ -0,0 +1,121 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run benchmarks from the backend directory, e.g.
+    python -m benchmarks.order_pipeline
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+from pymongo import monitoring
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BENCH_MONGO_URL = os.getenv("BENCH_MONGO_URL", "mongodb://localhost:27017")
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "kargo_bench")
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server (one per round trip)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def bench_client(*listeners):
+    client = AsyncIOMotorClient(BENCH_MONGO_URL, event_listeners=list(listeners))
+    return client, client[BENCH_DB_NAME]
+
+
+def bind_database(client, db):
+    """
+    Point the backend at the benchmark database. Modules that did
+    `from database import db` (or client) hold their own reference, so every
+    loaded module still bound to the original handles is rebound as well;
+    modules imported afterwards pick up the new ones from `database`.
+    """
+    import database
+    original = {"db": database.db, "client": database.client}
+    replacement = {"db": db, "client": client}
+    for module in list(sys.modules.values()):
+        for name, handle in original.items():
+            if getattr(module, name, None) is handle:
+                setattr(module, name, replacement[name])
+    database._secondary_db = None
+    database._transactions_supported = None
+    # Nothing read from the old database may survive in process caches
+    if "shipping_catalogue" in sys.modules:
+        sys.modules["shipping_catalogue"]._drop_local()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+    }
+
+
+@contextmanager
+def timed(samples_ms):
+    started = time.perf_counter()
+    yield
+    samples_ms.append((time.perf_counter() - started) * 1000)
+
+
+async def asgi_request(app, method: str, url: str, body=None, token: Optional[str] = None) -> Tuple[int, bytes]:
+    """Call an ASGI app in-process, as a minimal HTTP client would; returns (status, body)"""
+    parts = urlsplit(url)
+    payload = json.dumps(body).encode() if body is not None else b""
+    headers = [(b"host", b"bench"), (b"content-type", b"application/json"),
+               (b"content-length", str(len(payload)).encode())]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": parts.path, "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(), "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    sent = False
+    status_code, chunks = 500, []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            # The client stays connected; the app cancels this wait when it is done
+            await asyncio.Event().wait()
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status_code, b"".join(chunks)
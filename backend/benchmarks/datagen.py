@@ -0,0 +1,244 @@
+"""
+Seeded synthetic data for the load and benchmark scripts.
+
+It fills the benchmark database with shipping companies (with tariffs),
+users, orders, ledger transactions, chat sessions and chat messages. It then
+applies the index registry. The same seed and scale always produce the same
+documents, ids and timestamps (relative to a fixed epoch), so results from
+different builds are comparable.
+
+Generated accounts:
+- users bench{i}@example.com, all with password BENCH_PASSWORD
+- admin bench-admin@example.com
+Tracking codes follow tracking_code(i). The load script derives its inputs
+from these instead of reading them back.
+
+    python -m benchmarks.datagen --scale 10k
+    python -m benchmarks.datagen --scale 1m --seed 7
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from benchmarks.common import bench_client
+from auth import get_password_hash
+import indexes
+from order_search import recipient_name_key
+from pricing import REGIONS, PricingEngine
+from utils import build_order_document
+
+SCALES = {
+    "10k": {"users": 1_000, "orders": 10_000, "transactions": 10_000, "chats": 500, "messages": 10_000},
+    "1m": {"users": 50_000, "orders": 1_000_000, "transactions": 1_000_000, "chats": 20_000, "messages": 1_000_000},
+}
+BENCH_PASSWORD = "bench123"
+ADMIN_EMAIL = "bench-admin@example.com"
+EPOCH = datetime(2026, 1, 1)
+BATCH_SIZE = 5_000
+
+FIRST_NAMES = ["Ali", "Ayşe", "İsmail", "Işıl", "Mehmet", "Zeynep", "Şükrü", "Çağla", "Ömer", "Gül"]
+LAST_NAMES = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Öztürk", "Aydın", "Arslan", "Doğan"]
+CITIES = [city for cities in REGIONS.values() for city in cities]
+STATUSES = ["created", "picked", "in_transit", "out_for_delivery", "delivered", "cancelled"]
+STATUS_WEIGHTS = [10, 5, 15, 5, 60, 5]
+
+COMPANIES = [
+    ("Yurtiçi Kargo", 45.0, [(1, 38.0), (5, 52.0), (15, 79.0), (30, 120.0)], 4.5),
+    ("Aras Kargo", 42.0, [(1, 36.0), (5, 49.0), (15, 75.0), (30, 118.0)], 4.0),
+    ("MNG Kargo", 40.0, [(2, 37.0), (10, 58.0), (30, 115.0)], 4.2),
+    ("PTT Kargo", 35.0, None, 0.0),
+    ("Sürat Kargo", 39.0, [(1, 33.0), (5, 47.0), (20, 90.0)], 3.8),
+]
+
+
+def object_id(kind: int, i: int) -> ObjectId:
+    """Stable ObjectId: epoch timestamp, then a kind byte and the index"""
+    return ObjectId(int(EPOCH.timestamp()).to_bytes(4, "big") + bytes([kind]) + i.to_bytes(7, "big"))
+
+
+def user_email(i: int) -> str:
+    return f"bench{i}@example.com"
+
+
+def tracking_code(i: int) -> str:
+    return f"TRK{i:09d}"
+
+
+def order_id(i: int) -> str:
+    return f"KRG-BENCH-{i:08d}"
+
+
+def company_docs():
+    docs = []
+    for i, (name, price, bands, extra) in enumerate(COMPANIES):
+        doc = {"_id": object_id(1, i), "name": name, "price": price, "isActive": True,
+               "deliveryTime": "1-3 gün", "createdAt": EPOCH}
+        if bands:
+            doc["tariff"] = {
+                "bands": [{"upTo": up_to, "price": band_price} for up_to, band_price in bands],
+                "extraPerUnit": extra,
+                "zoneMultipliers": {"local": 0.85, "regional": 1.0, "national": 1.15},
+                "codFee": 9.9,
+                "codRate": 0.01
+            }
+        docs.append(doc)
+    return docs
+
+
+def user_docs(count: int, password_hash: str):
+    yield {"_id": object_id(2, 0), "email": ADMIN_EMAIL, "password": password_hash, "name": "Bench Admin",
+           "role": "admin", "balance": 0.0, "totalShipments": 0, "createdAt": EPOCH}
+    for i in range(1, count + 1):
+        yield {"_id": object_id(2, i), "email": user_email(i), "password": password_hash,
+               "name": f"Bench User {i}", "phone": f"555{i:07d}", "company": f"Firma {i % 97}",
+               "role": "user", "balance": 1_000_000.0, "totalShipments": 0,
+               "createdAt": EPOCH + timedelta(minutes=i)}
+
+
+def order_docs(rng: random.Random, count: int, users: int, companies: list):
+    pricing = PricingEngine({str(c["_id"]): {**c, "_id": str(c["_id"])} for c in companies})
+    for i in range(count):
+        company = companies[i % len(companies)]
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        created = EPOCH + timedelta(seconds=i * 30)
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        cod = rng.random() < 0.3
+        order_data = {
+            "recipientName": name,
+            "recipientPhone": f"532{rng.randrange(10 ** 7):07d}",
+            "recipientCity": rng.choice(CITIES),
+            "recipientDistrict": "Merkez",
+            "recipientAddress": f"Örnek Mah. {rng.randrange(1, 200)}. Sok. No:{rng.randrange(1, 99)}",
+            "weight": round(rng.uniform(0.2, 25), 1),
+            "desi": rng.randrange(0, 30),
+            "shippingCompanyId": str(company["_id"]),
+            "paymentType": "cod" if cod else "prepaid",
+            "codAmount": round(rng.uniform(50, 2000), 2) if cod else None,
+            "description": ""
+        }
+        price = pricing.price_one(
+            order_data["shippingCompanyId"], order_data["weight"], order_data["desi"],
+            order_data["recipientCity"], order_data["codAmount"]
+        )
+        order = build_order_document(order_data, company, str(object_id(2, i % users + 1)), created, price=price)
+        order.update({
+            "_id": object_id(3, i),
+            "orderId": order_id(i),
+            "trackingCode": tracking_code(i),
+            "recipientNameKey": recipient_name_key(name),
+            "status": status,
+        })
+        if status == "delivered":
+            order["deliveredAt"] = created + timedelta(days=rng.randrange(1, 5))
+        yield order
+
+
+def transaction_docs(rng: random.Random, count: int, users: int):
+    for i in range(count):
+        amount = -round(rng.uniform(30, 150), 2) if i % 10 else round(rng.uniform(500, 5000), 2)
+        yield {"_id": f"bench-tx-{i:08d}", "userId": str(object_id(2, i % users + 1)),
+               "type": "payment" if amount < 0 else "deposit", "amount": amount,
+               "balanceBefore": 0.0, "balanceAfter": 0.0,
+               "description": "Kargo ödemesi" if amount < 0 else "Bakiye yükleme",
+               "createdAt": EPOCH + timedelta(seconds=i * 30)}
+
+
+def chat_docs(rng: random.Random, chats: int, messages: int, users: int):
+    sessions, chat_messages = [], []
+    per_chat = max(messages // max(chats, 1), 1)
+    for c in range(chats):
+        started = EPOCH + timedelta(minutes=c * 3)
+        status = "closed" if c % 10 else rng.choice(["waiting", "active"])
+        sessions.append({
+            "_id": f"bench-chat-{c:07d}", "userId": str(object_id(2, c % users + 1)),
+            "userName": f"Bench User {c % users + 1}", "userEmail": user_email(c % users + 1),
+            "agentId": None if status == "waiting" else str(object_id(2, 0)),
+            "agentName": None if status == "waiting" else "Bench Admin",
+            "status": status, "startedAt": started, "lastMessageAt": started + timedelta(seconds=per_chat * 20),
+            "endedAt": started + timedelta(hours=1) if status == "closed" else None
+        })
+        for m in range(per_chat):
+            chat_messages.append({
+                "_id": f"bench-msg-{c:07d}-{m:05d}", "sessionId": sessions[-1]["_id"],
+                "sender": "user" if m % 2 == 0 else "agent",
+                "senderName": sessions[-1]["userName"] if m % 2 == 0 else "Bench Admin",
+                "text": f"Mesaj {m}", "timestamp": started + timedelta(seconds=m * 20), "read": True
+            })
+            if len(chat_messages) >= BATCH_SIZE:
+                yield sessions, chat_messages
+                sessions, chat_messages = [], []
+    yield sessions, chat_messages
+
+
+async def insert_batches(collection, docs) -> int:
+    inserted, batch = 0, []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            await collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+
+async def generate(db, scale: str, seed: int) -> dict:
+    counts = SCALES[scale]
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    await db.client.drop_database(db.name)
+
+    companies = company_docs()
+    await db.shipping_companies.insert_many(companies)
+    await db.catalogue_versions.update_one({"_id": "shipping_companies"}, {"$inc": {"version": 1}}, upsert=True)
+
+    # One bcrypt hash shared by every account keeps generation fast
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    written = {
+        "users": await insert_batches(db.users, user_docs(counts["users"], password_hash)),
+        "orders": await insert_batches(db.orders, order_docs(rng, counts["orders"], counts["users"], companies)),
+        "transactions": await insert_batches(db.transactions, transaction_docs(rng, counts["transactions"], counts["users"])),
+        "chatSessions": 0,
+        "chatMessages": 0,
+    }
+    for sessions, messages in chat_docs(rng, counts["chats"], counts["messages"], counts["users"]):
+        if sessions:
+            await db.chat_sessions.insert_many(sessions, ordered=False)
+        if messages:
+            await db.chat_messages.insert_many(messages, ordered=False)
+        written["chatSessions"] += len(sessions)
+        written["chatMessages"] += len(messages)
+
+    await indexes.ensure_indexes(db)
+    manifest = {"_id": "manifest", "scale": scale, "seed": seed, "counts": counts, "written": written}
+    await db.bench_manifest.replace_one({"_id": "manifest"}, manifest, upsert=True)
+    return {**manifest, "seconds": round(time.perf_counter() - started, 1)}
+
+
+async def load_manifest(db) -> dict:
+    manifest = await db.bench_manifest.find_one({"_id": "manifest"})
+    if manifest is None:
+        raise SystemExit("No benchmark data; run python -m benchmarks.datagen first")
+    return manifest
+
+
+async def run(scale: str, seed: int):
+    client, db = bench_client()
+    result = await generate(db, scale, seed)
+    result.pop("_id")
+    print(json.dumps(result, indent=2))
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(run(args.scale, args.seed))
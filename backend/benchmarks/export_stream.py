@@ -0,0 +1,69 @@
+"""
+Streaming export benchmark: exports every order in the benchmark collection
+through exports.stream_export and fails if peak RSS grows past a ceiling.
+
+    python -m benchmarks.export_stream --orders 1000000 --max-rss-mb 256
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import time
+
+from benchmarks.common import bench_client, bind_database
+from benchmarks.order_search import generate_orders
+import exports
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def run(orders: int, fmt: str, max_rss_mb: float):
+    client, db = bench_client()
+    bind_database(client, db)
+
+    if await db.orders.estimated_document_count() != orders:
+        await db.orders.drop()
+        rng = random.Random(3)
+        for start in range(0, orders, 10_000):
+            await db.orders.insert_many(list(generate_orders(rng, start, min(10_000, orders - start))), ordered=False)
+        await db.orders.create_index("createdAt")
+
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    exported_bytes = 0
+    chunks = 0
+    async for chunk in exports.stream_export("orders", {}, fmt):
+        exported_bytes += len(chunk)
+        chunks += 1
+    elapsed = time.perf_counter() - started
+    rss_after = peak_rss_mb()
+
+    print(json.dumps({
+        "orders": orders,
+        "format": fmt,
+        "seconds": round(elapsed, 2),
+        "rowsPerSecond": round(orders / elapsed, 1),
+        "megabytes": round(exported_bytes / (1024 * 1024), 1),
+        "chunks": chunks,
+        "peakRssMbBefore": round(rss_before, 1),
+        "peakRssMbAfter": round(rss_after, 1),
+        "maxRssMb": max_rss_mb,
+    }, indent=2))
+    client.close()
+
+    assert rss_after <= max_rss_mb, f"peak RSS {rss_after:.1f} MB exceeded {max_rss_mb} MB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--max-rss-mb", type=float, default=256)
+    args = parser.parse_args()
+    asyncio.run(run(args.orders, args.format, args.max_rss_mb))
@@ -0,0 +1,338 @@
+"""
+Load scenarios for the API and Socket.IO paths.
+
+Each scenario runs a fixed number of operations through `--concurrency`
+closed-loop workers after a short warmup. It reports p50/p95/p99 latency,
+throughput and errors as JSON, so runs from different builds can be diffed or
+gated with --baseline.
+
+Scenarios:
+- login: POST /api/auth/login
+- create_order: POST /api/orders
+- tracking: GET /api/orders/tracking/{code}
+- admin_list: GET /api/admin/orders, as a first page, a status filter or
+  a keyset next page
+- chat: the send_message Socket.IO handler, with both participants joined
+  to the room
+
+By default the app runs in this process against the benchmark database
+(BENCH_MONGO_URL / BENCH_DB_NAME). Its startup hooks run, and requests go
+through the full ASGI stack with no network, so runs are repeatable on one
+machine. --base-url targets a running deployment that points at the same
+database instead; the chat scenario needs the in-process target.
+
+The suite needs a local mongod; it runs offline against it. A mongomock
+stand-in is not used: it cannot run the aggregations and transactions the
+routes issue, and its timings say nothing about the real database.
+
+    python -m benchmarks.datagen --scale 10k
+    python -m benchmarks.load --requests 2000 --concurrency 50 --output current.json
+    python -m benchmarks.load --baseline main.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.common import BENCH_DB_NAME, BENCH_MONGO_URL, asgi_request, bench_client, summarize
+
+# The app reads its database settings at import time
+os.environ["MONGO_URL"] = BENCH_MONGO_URL
+os.environ["DB_NAME"] = BENCH_DB_NAME
+
+from benchmarks import datagen  # noqa: E402
+
+SCENARIOS = ("login", "create_order", "tracking", "admin_list", "chat")
+
+
+class InProcessTarget:
+    name = "in-process"
+
+    async def start(self):
+        import server
+        self.server = server
+        # Per-event Socket.IO logging would dominate the chat numbers
+        for logger_name in ("socketio", "engineio"):
+            logging.getLogger(logger_name).setLevel(logging.WARNING)
+        await server.app.router.startup()
+
+    async def request(self, method, path, body=None, token=None):
+        return await asgi_request(self.server.app, method, path, body, token)
+
+    async def stop(self):
+        await self.server.app.router.shutdown()
+
+
+class HttpTarget:
+    def __init__(self, base_url: str, concurrency: int):
+        self.name = base_url
+        self.base_url = base_url.rstrip("/")
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load")
+        self._local = threading.local()
+
+    async def start(self):
+        pass
+
+    def _call(self, method, path, body, token):
+        import requests
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = session.request(method, self.base_url + path, json=body, headers=headers, timeout=30)
+        return response.status_code, response.content
+
+    async def request(self, method, path, body=None, token=None):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._call, method, path, body, token
+        )
+
+    async def stop(self):
+        self._executor.shutdown(wait=False)
+
+
+async def drive(op, total: int, concurrency: int, warmup: int) -> dict:
+    for i in range(warmup):
+        await op(-1 - i)
+
+    latencies_ms, errors, issued = [], 0, 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < total:
+            index = issued
+            issued += 1
+            started = time.perf_counter()
+            try:
+                ok = await op(index)
+            except Exception:
+                ok = False
+            latencies_ms.append((time.perf_counter() - started) * 1000)
+            errors += 0 if ok else 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(latencies_ms),
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2)
+    }
+
+
+async def login(target, email: str) -> str:
+    status_code, body = await target.request(
+        "POST", "/api/auth/login", {"email": email, "password": datagen.BENCH_PASSWORD}
+    )
+    if status_code != 200:
+        raise SystemExit(f"Login failed for {email} ({status_code}): {body[:200]!r}")
+    return json.loads(body)["token"]
+
+
+def scenario_login(target, counts, rng):
+    async def op(i):
+        email = datagen.user_email(rng.randrange(counts["users"]) + 1)
+        status_code, _ = await target.request(
+            "POST", "/api/auth/login", {"email": email, "password": datagen.BENCH_PASSWORD}
+        )
+        return status_code == 200
+    return op
+
+
+def scenario_create_order(target, counts, rng, tokens):
+    companies = [str(company["_id"]) for company in datagen.company_docs()]
+
+    async def op(i):
+        cod = rng.random() < 0.3
+        body = {
+            "recipientName": f"{rng.choice(datagen.FIRST_NAMES)} {rng.choice(datagen.LAST_NAMES)}",
+            "recipientPhone": f"532{rng.randrange(10 ** 7):07d}",
+            "recipientCity": rng.choice(datagen.CITIES),
+            "recipientDistrict": "Merkez",
+            "recipientAddress": "Yük Testi Mah. 1. Sok. No:1",
+            "weight": round(rng.uniform(0.2, 25), 1),
+            "desi": rng.randrange(0, 30),
+            "shippingCompanyId": rng.choice(companies),
+            "paymentType": "cod" if cod else "prepaid",
+            "codAmount": round(rng.uniform(50, 2000), 2) if cod else None
+        }
+        status_code, _ = await target.request("POST", "/api/orders", body, rng.choice(tokens))
+        return status_code == 200
+    return op
+
+
+def scenario_tracking(target, counts, rng):
+    async def op(i):
+        code = datagen.tracking_code(rng.randrange(counts["orders"]))
+        status_code, _ = await target.request("GET", f"/api/orders/tracking/{code}")
+        return status_code == 200
+    return op
+
+
+async def scenario_admin_list(target, counts, rng, admin_token):
+    status_code, body = await target.request("GET", "/api/admin/orders?limit=20&include_total=false", token=admin_token)
+    next_cursor = json.loads(body).get("nextCursor") if status_code == 200 else None
+    paths = [
+        "/api/admin/orders?limit=20",
+        "/api/admin/orders?limit=20&status=delivered&include_total=false",
+        f"/api/admin/orders?limit=20&include_total=false&cursor={next_cursor}" if next_cursor
+        else "/api/admin/orders?limit=20&page=2",
+    ]
+
+    async def op(i):
+        status_code, _ = await target.request("GET", paths[i % len(paths)], token=admin_token)
+        return status_code == 200
+    return op
+
+
+async def scenario_chat(target, counts, rng, rooms: int):
+    import socket_manager
+    sio = socket_manager.sio
+    delivered = {"packets": 0, "errors": 0}
+
+    async def record(eio_sid, eio_pkt):
+        delivered["packets"] += 1
+        if '"error"' in str(eio_pkt.data)[:20]:
+            delivered["errors"] += 1
+
+    # Capture outgoing packets instead of writing them to real transports
+    sio._send_eio_packet = record
+    participants = []
+    for k in range(min(rooms, counts["chats"])):
+        session_id = f"bench-chat-{k:07d}"
+        user_sid = await sio.manager.connect(f"bench-user-{k}", "/")
+        agent_sid = await sio.manager.connect(f"bench-agent-{k}", "/")
+        await sio.enter_room(user_sid, socket_manager.chat_room(session_id))
+        await sio.enter_room(agent_sid, socket_manager.chat_room(session_id))
+        participants.append((session_id, user_sid))
+
+    async def op(i):
+        session_id, sid = participants[i % len(participants)]
+        await socket_manager.send_message(sid, {
+            "sessionId": session_id, "sender": "user", "senderName": "Bench", "text": f"yük testi {i}"
+        })
+        return True
+    return op, delivered
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list:
+    """Scenarios whose p95 grew, or throughput fell, by more than max_regression"""
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before or "p95_ms" not in result or "p95_ms" not in before:
+            continue
+        if before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append({"scenario": name, "metric": "p95_ms", "baseline": before["p95_ms"], "current": result["p95_ms"]})
+        if before["rps"] and result["rps"] < before["rps"] * (1 - max_regression):
+            regressions.append({"scenario": name, "metric": "rps", "baseline": before["rps"], "current": result["rps"]})
+    return regressions
+
+
+async def run(args) -> int:
+    client, db = bench_client()
+    manifest = await datagen.load_manifest(db)
+    client.close()
+    counts = manifest["counts"]
+    rng = random.Random(args.seed)
+
+    target = HttpTarget(args.base_url, args.concurrency) if args.base_url else InProcessTarget()
+    await target.start()
+    results = {}
+    try:
+        scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+        needs_users = {"create_order"} & set(scenarios)
+        tokens = [await login(target, datagen.user_email(i + 1)) for i in range(min(args.users, counts["users"]))] if needs_users else []
+        admin_token = await login(target, datagen.ADMIN_EMAIL) if "admin_list" in scenarios else None
+
+        for name in scenarios:
+            if name == "login":
+                results[name] = await drive(scenario_login(target, counts, rng), args.login_requests, args.concurrency, 5)
+            elif name == "create_order":
+                results[name] = await drive(scenario_create_order(target, counts, rng, tokens), args.requests, args.concurrency, args.warmup)
+            elif name == "tracking":
+                results[name] = await drive(scenario_tracking(target, counts, rng), args.requests, args.concurrency, args.warmup)
+            elif name == "admin_list":
+                op = await scenario_admin_list(target, counts, rng, admin_token)
+                results[name] = await drive(op, args.requests, args.concurrency, args.warmup)
+            elif name == "chat":
+                if not isinstance(target, InProcessTarget):
+                    results[name] = {"skipped": "the chat scenario needs the in-process target"}
+                    continue
+                op, delivered = await scenario_chat(target, counts, rng, args.chat_rooms)
+                results[name] = await drive(op, args.requests, args.concurrency, args.warmup)
+                from chat_writer import message_buffer
+                flush_started = time.perf_counter()
+                await message_buffer.flush()
+                results[name].update({
+                    "deliveredPackets": delivered["packets"],
+                    "errorPackets": delivered["errors"],
+                    "finalFlushMs": round((time.perf_counter() - flush_started) * 1000, 2)
+                })
+            else:
+                raise SystemExit(f"Unknown scenario {name}; choose from {', '.join(SCENARIOS)}")
+    finally:
+        await target.stop()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "target": target.name,
+            "scale": manifest["scale"],
+            "dataSeed": manifest["seed"],
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "startedAt": datetime.utcnow().isoformat()
+        },
+        "scenarios": results
+    }
+    status_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(results, baseline.get("scenarios", {}), args.max_regression)
+        status_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return status_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--login-requests", type=int, default=200, help="bcrypt-bound, so fewer by default")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20, help="distinct accounts placing orders")
+    parser.add_argument("--chat-rooms", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--base-url", help="run against a live server instead of in-process")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,74 @@
+"""
+Login throughput vs event-loop latency. Runs concurrent bcrypt verifications
+inline (the old behaviour) and through auth's bounded executor while a probe
+task measures how late the loop wakes it. No database needed.
+
+    python -m benchmarks.login_throughput --logins 64 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import auth
+from benchmarks.common import summarize
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe_loop(lags_ms, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags_ms.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def run_mode(mode, hashed, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            if mode == "inline":
+                ok = auth.verify_password("demo123", hashed)
+                # Yield like a handler would between awaits
+                await asyncio.sleep(0)
+            else:
+                ok = await auth.verify_password_async("demo123", hashed)
+            assert ok
+
+    lags_ms = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop(lags_ms, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    return {
+        "loginsPerSecond": round(logins / elapsed, 1),
+        "loopLag": summarize(lags_ms) if lags_ms else None,
+        "maxLoopLagMs": round(max(lags_ms), 3) if lags_ms else None
+    }
+
+
+async def run(logins, concurrency):
+    hashed = auth.get_password_hash("demo123")
+    results = {
+        "logins": logins,
+        "concurrency": concurrency,
+        "workers": auth.PASSWORD_HASH_WORKERS,
+        "inline": await run_mode("inline", hashed, logins, concurrency),
+        "executor": await run_mode("executor", hashed, logins, concurrency)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(run(args.logins, args.concurrency))
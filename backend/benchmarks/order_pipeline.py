@@ -0,0 +1,121 @@
+"""
+Order creation pipeline benchmark: the original sequential flow against
+routes.order_routes.create_order. Reports round trips per order and latency
+percentiles on the response path.
+
+    python -m benchmarks.order_pipeline --orders 2000
+"""
+import argparse
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from bson import ObjectId
+from fastapi import BackgroundTasks
+
+from benchmarks.common import CommandCounter, bench_client, bind_database, summarize, timed
+from models import OrderCreate
+from routes import order_routes
+from utils import generate_order_id, generate_tracking_code
+
+
+async def legacy_create_order(db, order_data: OrderCreate, user_id: str):
+    """The pre-pipeline create_order flow, kept here as the baseline"""
+    shipping_company = await db.shipping_companies.find_one({"_id": ObjectId(order_data.shippingCompanyId)})
+    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    order_id = generate_order_id()
+    tracking_code = generate_tracking_code()
+    order_dict = {
+        "orderId": order_id,
+        "userId": user_id,
+        "trackingCode": tracking_code,
+        "recipient": {"name": order_data.recipientName, "phone": order_data.recipientPhone},
+        "shippingCompany": shipping_company["name"],
+        "price": shipping_company["price"],
+        "paymentType": order_data.paymentType,
+        "createdAt": datetime.utcnow(),
+    }
+    await db.orders.insert_one(order_dict)
+    old_balance = user.get("balance", 0.0)
+    new_balance = old_balance - shipping_company["price"]
+    await db.users.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"balance": new_balance}, "$inc": {"totalShipments": 1}}
+    )
+    await db.transactions.insert_one({
+        "_id": str(uuid.uuid4()),
+        "userId": user_id,
+        "type": "payment",
+        "amount": -shipping_company["price"],
+        "balanceBefore": old_balance,
+        "balanceAfter": new_balance,
+        "orderId": order_id,
+        "createdAt": datetime.utcnow(),
+    })
+    await db.notifications.insert_one({"userId": user_id, "message": order_id, "createdAt": datetime.utcnow()})
+    existing = await db.saved_recipients.find_one({
+        "userId": user_id, "name": order_data.recipientName, "phone": order_data.recipientPhone
+    })
+    if existing:
+        await db.saved_recipients.update_one({"_id": existing["_id"]}, {"$inc": {"usageCount": 1}})
+    else:
+        await db.saved_recipients.insert_one({
+            "_id": str(uuid.uuid4()), "userId": user_id,
+            "name": order_data.recipientName, "phone": order_data.recipientPhone, "usageCount": 1,
+        })
+
+
+async def seed(db, orders):
+    await db.client.drop_database(db.name)
+    company = await db.shipping_companies.insert_one({"name": "Bench Kargo", "price": 80.0, "isActive": True})
+    user = await db.users.insert_one({"email": "bench@example.com", "role": "user",
+                                      "balance": 100.0 + 80.0 * orders * 2, "totalShipments": 0})
+    return str(company.inserted_id), str(user.inserted_id)
+
+
+async def run(orders: int):
+    counter = CommandCounter()
+    client, db = bench_client(counter)
+    bind_database(client, db)
+    company_id, user_id = await seed(db, orders)
+    current_user = {"email": "bench@example.com", "userId": user_id, "role": "user"}
+
+    def payload(i):
+        return OrderCreate(
+            recipientName=f"Alıcı {i % 50}", recipientPhone=f"555{i % 50:07d}",
+            recipientCity="istanbul", recipientDistrict="Kadıköy", recipientAddress="Bench",
+            weight=1.0, desi=2, shippingCompanyId=company_id,
+        )
+
+    results = {}
+
+    samples, counter.count = [], 0
+    for i in range(orders):
+        with timed(samples):
+            await legacy_create_order(db, payload(i), user_id)
+    results["before"] = {**summarize(samples), "roundTripsPerOrder": counter.count / orders}
+
+    samples, counter.count, side_effect_trips = [], 0, 0
+    for i in range(orders):
+        tasks = BackgroundTasks()
+        with timed(samples):
+            await order_routes.create_order(payload(i), tasks, current_user)
+        response_trips = counter.count
+        await tasks()
+        side_effect_trips += counter.count - response_trips
+        counter.count = response_trips
+    results["after"] = {
+        **summarize(samples),
+        "roundTripsPerOrder": counter.count / orders,
+        "backgroundRoundTripsPerOrder": side_effect_trips / orders,
+    }
+
+    print(json.dumps(results, indent=2))
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.orders))
@@ -0,0 +1,89 @@
+"""
+Admin order search benchmark on a generated orders collection: the original
+unanchored case-insensitive regex $or against order_search's index-backed
+prefix query. Reports latency percentiles and the winning plan stage.
+
+    python -m benchmarks.order_search --orders 1000000
+"""
+import argparse
+import asyncio
+import json
+import random
+import string
+from datetime import datetime, timedelta
+
+from benchmarks.common import bench_client, bind_database, summarize, timed
+import indexes
+import order_search
+
+FIRST_NAMES = ["Ali", "Ayşe", "İsmail", "Işıl", "Mehmet", "Zeynep", "Şükrü", "Çağla", "Ömer", "Gül"]
+LAST_NAMES = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Yıldız", "Öztürk", "Aydın", "Arslan", "Doğan"]
+
+
+def legacy_query(search):
+    return {"$or": [
+        {"orderId": {"$regex": search, "$options": "i"}},
+        {"trackingCode": {"$regex": search, "$options": "i"}},
+        {"recipient.name": {"$regex": search, "$options": "i"}}
+    ]}
+
+
+def generate_orders(rng, start, count):
+    now = datetime.utcnow()
+    for i in range(start, start + count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        yield {
+            "orderId": f"KRG-{202400 + (i % 12) + 1}-{i:07d}",
+            "trackingCode": "TRK" + "".join(rng.choices(string.ascii_uppercase + string.digits, k=9)) + f"{i:x}",
+            "userId": f"user{i % 500}",
+            "recipient": {"name": name, "city": "istanbul"},
+            "recipientNameKey": order_search.recipient_name_key(name),
+            "status": "created",
+            "createdAt": now - timedelta(minutes=i),
+        }
+
+
+async def winning_stage(db, query):
+    plan = await db.command("explain", {"find": "orders", "filter": query, "limit": 20}, verbosity="executionStats")
+    stats = plan["executionStats"]
+    return {
+        "plan": json.dumps(plan["queryPlanner"]["winningPlan"], default=str)[:200],
+        "totalDocsExamined": stats["totalDocsExamined"],
+        "totalKeysExamined": stats["totalKeysExamined"],
+    }
+
+
+async def run(orders: int, queries: int, seed: int):
+    client, db = bench_client()
+    bind_database(client, db)
+    rng = random.Random(seed)
+
+    if await db.orders.estimated_document_count() != orders:
+        await db.orders.drop()
+        batch = 10_000
+        for start in range(0, orders, batch):
+            await db.orders.insert_many(list(generate_orders(rng, start, min(batch, orders - start))), ordered=False)
+        await indexes.ensure_indexes(db)
+
+    samples_terms = [rng.choice(FIRST_NAMES).upper() for _ in range(queries // 2)]
+    samples_terms += [f"KRG-2024{rng.randint(1, 12):02d}-{rng.randrange(orders):07d}" for _ in range(queries // 2)]
+
+    results = {}
+    for label, build in (("regexScan", legacy_query), ("indexed", order_search.build_order_search_query)):
+        samples = []
+        for term in samples_terms:
+            with timed(samples):
+                await db.orders.find(build(term)).limit(20).to_list(20)
+        results[label] = {**summarize(samples), **await winning_stage(db, build(samples_terms[-1]))}
+
+    print(json.dumps({"orders": orders, "queries": len(samples_terms), **results}, indent=2))
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    asyncio.run(run(args.orders, args.queries, args.seed))
@@ -0,0 +1,259 @@
+"""
+Query-plan regression check. It applies the index registry to a generated
+database and explains every query shape the routes and background jobs issue.
+It fails if a winning plan contains a collection scan (COLLSCAN) or an
+in-memory sort (SORT). A few shapes are exempt on purpose, and each exemption
+states why. Lookups by `_id` alone are left out because they always use the
+_id index.
+
+    python -m benchmarks.query_plans --docs 2000
+
+The script exits with a non-zero status when any shape regresses. The same
+check runs under pytest (tests/test_query_plans.py) when a mongod is reachable.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import bench_client
+import indexes
+from exports import build_export_query
+from order_search import build_order_search_query, recipient_name_key
+from pagination import SORT, _after
+
+FORBIDDEN = {"COLLSCAN", "SORT"}
+STATUSES = ["created", "in_transit", "delivered", "cancelled"]
+
+
+def find(name, collection, filter, sort=None, limit=None, allow=(), why=None):
+    command = {"find": collection, "filter": filter}
+    if sort:
+        command["sort"] = dict(sort)
+    if limit:
+        command["limit"] = limit
+    return {"name": name, "command": command, "allow": set(allow), "why": why}
+
+
+def count(name, collection, query, allow=(), why=None):
+    return {"name": name, "command": {"count": collection, "query": query}, "allow": set(allow), "why": why}
+
+
+def aggregate(name, collection, pipeline, allow=(), why=None):
+    command = {"aggregate": collection, "pipeline": pipeline, "cursor": {}}
+    return {"name": name, "command": command, "allow": set(allow), "why": why}
+
+
+def update(name, collection, query, allow=(), why=None):
+    command = {"update": collection, "updates": [{"q": query, "u": {"$set": {"explained": True}}}]}
+    return {"name": name, "command": command, "allow": set(allow), "why": why}
+
+
+def delete(name, collection, query):
+    command = {"delete": collection, "deletes": [{"q": query, "limit": 0}]}
+    return {"name": name, "command": command, "allow": set(), "why": None}
+
+
+def find_and_modify(name, collection, query):
+    command = {"findAndModify": collection, "query": query, "update": {"$set": {"explained": True}}}
+    return {"name": name, "command": command, "allow": set(), "why": None}
+
+
+def page(name, collection, query, cursor_at=None, limit=21, allow=(), why=None):
+    """pagination.paginate: first page, or the keyset page after `cursor_at`"""
+    if cursor_at is not None:
+        after = _after(*cursor_at)
+        query = {"$and": [query, after]} if query else after
+    return find(name, collection, query, SORT, limit, allow, why)
+
+
+def shapes(now):
+    month = datetime(now.year, now.month, 1)
+    cursor_at = (now - timedelta(days=3), "ffffffffffffffffffffffff")
+    search_sort = "prefix matches are few; sorting them in memory is cheaper than a sort-ordered walk"
+    recount = "periodic full recount in stats_cache, off the request path"
+    return [
+        # users
+        find("login by email", "users", {"email": "user1@example.com"}, limit=1),
+        page("admin users", "users", {"role": "user"}),
+        page("admin users search", "users", {"role": "user", "$or": [
+            {"name": {"$regex": "ali", "$options": "i"}},
+            {"email": {"$regex": "ali", "$options": "i"}},
+            {"company": {"$regex": "ali", "$options": "i"}}
+        ]}),
+        page("admin users next page", "users", {"role": "user"}, cursor_at),
+        count("user total", "users", {"role": "user"}),
+        find("revoked users", "users", {"tokenVersion": {"$gt": 0}}),
+
+        # orders
+        page("user orders", "orders", {"userId": "user1"}),
+        page("user orders by status", "orders", {"userId": "user1", "status": "delivered"}),
+        page("user orders next page", "orders", {"userId": "user1"}, cursor_at),
+        count("user orders total", "orders", {"userId": "user1"}),
+        page("admin orders", "orders", {}),
+        page("admin orders by status", "orders", {"status": "in_transit"}),
+        page("admin orders next page", "orders", {"status": "in_transit"}, cursor_at),
+        page("admin order search", "orders", build_order_search_query("KRG-2024"), allow={"SORT"}, why=search_sort),
+        page("admin order search by name", "orders", build_order_search_query("Ayşe"), allow={"SORT"}, why=search_sort),
+        find("order detail", "orders", {
+            "$or": [{"orderId": "KRG-1"}, {"_id": None}],
+            "userId": "user1"
+        }, limit=1),
+        find("tracking", "orders", {"trackingCode": "TRK1"}, limit=1),
+        find_and_modify("status update", "orders", {"orderId": "KRG-1"}),
+        count("orders this month", "orders", {"createdAt": {"$gte": month}}),
+        aggregate("average delivery", "orders", [
+            {"$match": {"status": "delivered", "deliveredAt": {"$ne": None}}},
+            {"$group": {"_id": None, "avgMs": {"$avg": {"$subtract": ["$deliveredAt", "$createdAt"]}}}}
+        ]),
+        aggregate("status counts", "orders", [
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ], allow={"COLLSCAN"}, why=recount),
+        aggregate("prepaid revenue", "orders", [
+            {"$match": {"paymentType": "prepaid"}},
+            {"$group": {"_id": None, "total": {"$sum": "$price"}}}
+        ], allow={"COLLSCAN"}, why=recount),
+        find("orders export", "orders", build_export_query(now - timedelta(days=30), now), [("createdAt", 1)]),
+        find("orders export by status", "orders", build_export_query(now - timedelta(days=30), now, "delivered"), [("createdAt", 1)]),
+        find("user orders export", "orders", build_export_query(None, None, None, "user1"), [("createdAt", 1)]),
+        find("user orders export by status", "orders", build_export_query(None, now, "delivered", "user1"), [("createdAt", 1)]),
+
+        # notifications
+        find("notifications", "notifications", {"userId": "user1"}, [("createdAt", -1)], 20),
+
+        # wallet
+        page("transactions", "transactions", {"userId": "user1"}),
+        page("transactions next page", "transactions", {"userId": "user1"}, cursor_at),
+        find("transactions export", "transactions", build_export_query(now - timedelta(days=30), now), [("createdAt", 1)]),
+        aggregate("ledger totals", "transactions", [
+            {"$group": {"_id": "$userId", "total": {"$sum": "$amount"}}}
+        ], allow={"COLLSCAN"}, why="admin reconciliation over the whole ledger"),
+        page("deposit requests", "deposit_requests", {"userId": "user1"}),
+        page("admin deposit requests", "deposit_requests", {"status": "pending"}),
+        page("admin deposit requests all", "deposit_requests", {}),
+        find("deposit requests export", "deposit_requests", build_export_query(None, None, "pending"), [("createdAt", 1)]),
+
+        # saved recipients
+        find("recipient search", "saved_recipients", {
+            "userId": "user1", "name": {"$regex": "ali", "$options": "i"}
+        }, [("usageCount", -1)], 10),
+        find("recipients", "saved_recipients", {"userId": "user1"}, [("lastUsedAt", -1)], 50),
+        find("recipient match", "saved_recipients", {"userId": "user1", "name": "Ali Kaya", "phone": "5550000001"}, limit=1),
+        update("recipient upsert", "saved_recipients", {"userId": "user1", "name": "Ali Kaya", "phone": "5550000001"}),
+
+        # profile update requests
+        find("pending profile request", "profile_update_requests", {
+            "userId": "user1", "updateType": "email", "status": "pending"
+        }, limit=1),
+        find("profile requests", "profile_update_requests", {"userId": "user1"}, [("createdAt", -1)], 50),
+        find("admin profile requests", "profile_update_requests", {"status": "pending"}, [("createdAt", -1)], 100),
+        find("admin profile requests all", "profile_update_requests", {}, [("createdAt", -1)], 100),
+
+        # media
+        page("media", "media", {}),
+
+        # chat
+        find("chat latest page", "chat_messages", {"sessionId": "s1"}, [("timestamp", -1), ("_id", -1)], 51),
+        find("chat history", "chat_messages", {"sessionId": "s1", "$or": [
+            {"timestamp": {"$lt": now}}, {"timestamp": now, "_id": {"$lt": "m1"}}
+        ]}, [("timestamp", -1), ("_id", -1)], 51),
+        find("chat sync", "chat_messages", {"sessionId": "s1", "$or": [
+            {"timestamp": {"$gt": now}}, {"timestamp": now, "_id": {"$gt": "m1"}}
+        ]}, [("timestamp", 1), ("_id", 1)], 201),
+        find("waiting queue", "chat_sessions", {"status": "waiting"}, [("startedAt", 1)]),
+        find("agent sessions", "chat_sessions", {"agentId": "agent1", "status": "active"}, [("lastMessageAt", -1)], 5),
+        find("agent capacity", "chat_sessions", {"agentId": "agent1", "status": "active"}),
+        find("open session", "chat_sessions", {"userId": "user1", "status": {"$in": ["waiting", "active"]}}, limit=1),
+
+        # auth
+        delete("refresh family", "refresh_tokens", {"family": "f1"}),
+        find("revocation feed", "token_revocations", {"createdAt": {"$gte": now - timedelta(seconds=10)}}),
+    ]
+
+
+def generate(collection, i, rng, now):
+    created = now - timedelta(minutes=i * 7)
+    user_id = f"user{i % 50}"
+    if collection == "users":
+        return {"email": f"user{i}@example.com", "name": f"User {i}", "role": "admin" if i % 100 == 0 else "user",
+                "createdAt": created, **({"tokenVersion": 1} if i % 40 == 0 else {})}
+    if collection == "orders":
+        name = rng.choice(["Ali Kaya", "Ayşe Demir", "Mehmet Yılmaz", "Zeynep Çelik"])
+        status = rng.choice(STATUSES)
+        return {"orderId": f"KRG-2024{i % 12 + 1:02d}-{i:07d}", "trackingCode": f"TRK{i:09d}", "userId": user_id,
+                "status": status, "recipient": {"name": name}, "recipientNameKey": recipient_name_key(name),
+                "paymentType": rng.choice(["prepaid", "cod"]), "price": 50.0, "createdAt": created,
+                "deliveredAt": created + timedelta(days=2) if status == "delivered" else None}
+    if collection in ("transactions", "deposit_requests", "notifications", "media"):
+        return {"userId": user_id, "status": rng.choice(["pending", "approved", "rejected"]),
+                "amount": 10.0, "createdAt": created}
+    if collection == "saved_recipients":
+        return {"userId": user_id, "name": f"Alıcı {i}", "phone": f"555{i:07d}",
+                "usageCount": i % 9, "lastUsedAt": created}
+    if collection == "profile_update_requests":
+        return {"userId": user_id, "updateType": rng.choice(["email", "phone"]),
+                "status": rng.choice(["pending", "approved"]), "createdAt": created}
+    if collection == "chat_messages":
+        return {"_id": f"m{i}", "sessionId": f"s{i % 20}", "timestamp": created, "message": "merhaba"}
+    if collection == "chat_sessions":
+        return {"_id": f"s{i}", "userId": user_id, "agentId": f"agent{i % 5}",
+                "status": rng.choice(["waiting", "active", "closed"]), "startedAt": created, "lastMessageAt": created}
+    if collection == "refresh_tokens":
+        return {"_id": f"h{i}", "userId": user_id, "family": f"f{i % 30}", "expiresAt": now + timedelta(days=1)}
+    return {"userId": user_id, "createdAt": created}
+
+
+def plan_stages(node, found):
+    """Every stage name in the winning plans of an explain document"""
+    if isinstance(node, dict):
+        if "stage" in node:
+            found.add(node["stage"])
+        for key, value in node.items():
+            if key not in ("rejectedPlans", "parsedQuery"):
+                plan_stages(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            plan_stages(item, found)
+    return found
+
+
+async def check_plans(docs: int, seed: int):
+    """Explain every shape against a generated database; returns (results, failures)"""
+    client, db = bench_client()
+    await client.drop_database(db.name)
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    for collection in indexes.INDEXES:
+        await db[collection].insert_many([generate(collection, i, rng, now) for i in range(docs)])
+    await indexes.ensure_indexes(db)
+
+    results, failures = [], []
+    for shape in shapes(now):
+        explain = await db.command("explain", shape["command"], verbosity="queryPlanner")
+        stages = plan_stages(explain, set())
+        bad = sorted((stages & FORBIDDEN) - shape["allow"])
+        result = {"name": shape["name"], "stages": sorted(stages), "ok": not bad}
+        if shape["why"]:
+            result["exempt"] = shape["why"]
+        results.append(result)
+        if bad:
+            failures.append({"name": shape["name"], "stages": bad})
+    client.close()
+    return results, failures
+
+
+async def run(docs: int, seed: int):
+    results, failures = await check_plans(docs, seed)
+    print(json.dumps({"docs": docs, "shapes": len(results), "failures": failures, "results": results}, indent=2))
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args.docs, args.seed)) else 1)
@@ -0,0 +1,87 @@
+"""
+Refresh-token rotation under concurrency. Many sessions rotate their refresh
+tokens in parallel chains and latency percentiles are reported. It then checks
+two properties. When the same token is presented concurrently, exactly one
+rotation wins. Replaying a consumed token after the grace period revokes the
+whole token family.
+
+    python -m benchmarks.refresh_load --sessions 200 --rotations 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import bench_client, bind_database, summarize, timed
+import auth
+import indexes
+import refresh_tokens
+
+
+async def run(sessions: int, rotations: int, contenders: int):
+    client, db = bench_client()
+    bind_database(client, db)
+    await client.drop_database(db.name)
+    await indexes.ensure_indexes(db)
+
+    result = await db.users.insert_many([
+        {"email": f"refresh{i}@example.com", "role": "user", "tokenVersion": 0}
+        for i in range(sessions)
+    ])
+    user_ids = [str(user_id) for user_id in result.inserted_ids]
+    tokens = [(await refresh_tokens.issue_session(user_id, "user"))["refreshToken"] for user_id in user_ids]
+
+    latencies_ms = []
+
+    async def chain(token):
+        for _ in range(rotations):
+            with timed(latencies_ms):
+                session = await refresh_tokens.rotate_refresh_token(token)
+            assert auth.authenticate_token(session["token"]) is not None
+            token = session["refreshToken"]
+        return token
+
+    started = time.perf_counter()
+    tokens = await asyncio.gather(*(chain(token) for token in tokens))
+    elapsed = time.perf_counter() - started
+
+    # Same token presented by several callers at once
+    async def attempt(token):
+        try:
+            return await refresh_tokens.rotate_refresh_token(token)
+        except refresh_tokens.RefreshError:
+            return None
+
+    outcomes = await asyncio.gather(*(attempt(tokens[0]) for _ in range(contenders)))
+    winners = [outcome for outcome in outcomes if outcome]
+
+    # Replay outside the grace period revokes the family, successor included
+    refresh_tokens.REFRESH_REUSE_GRACE_SECONDS = 0
+    await asyncio.sleep(0.01)
+    replay = await attempt(tokens[0])
+    successor = await attempt(winners[0]["refreshToken"]) if winners else None
+
+    print(json.dumps({
+        "sessions": sessions,
+        "rotations": rotations,
+        "refreshesPerSecond": round(sessions * rotations / elapsed, 1),
+        "refresh": summarize(latencies_ms),
+        "contenders": contenders,
+        "contendedWinners": len(winners),
+        "replayRejected": replay is None,
+        "familyRevoked": successor is None,
+        "storedTokens": await db.refresh_tokens.count_documents({})
+    }, indent=2))
+    client.close()
+
+    assert len(winners) == 1, "a refresh token was rotated more than once"
+    assert replay is None and successor is None, "token reuse did not revoke the family"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--rotations", type=int, default=20)
+    parser.add_argument("--contenders", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.rotations, args.contenders))
@@ -0,0 +1,83 @@
+"""
+Wallet ledger stress run: thousands of parallel debits and credits against a
+few wallets, then checks final balances against the accepted operations and
+the ledger.
+
+    python -m benchmarks.wallet_stress --operations 5000 --users 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.common import bench_client, bind_database
+import wallet_ledger
+
+OPENING_BALANCE = 1000.0
+MINIMUM_BALANCE = 100.0
+
+
+async def run(operations: int, users: int, seed: int):
+    client, db = bench_client()
+    bind_database(client, db)
+    await client.drop_database(db.name)
+
+    user_ids = []
+    for i in range(users):
+        result = await db.users.insert_one({"email": f"stress{i}@example.com", "balance": 0.0})
+        user_ids.append(str(result.inserted_id))
+        await wallet_ledger.apply_balance_change(user_ids[-1], OPENING_BALANCE, "deposit", "Açılış bakiyesi")
+
+    rng = random.Random(seed)
+    plan = [
+        (rng.choice(user_ids), rng.choice([-80.0, -45.5, 25.0, 60.0]))
+        for _ in range(operations)
+    ]
+
+    async def apply(user_id, amount):
+        guard = MINIMUM_BALANCE if amount < 0 else None
+        return await wallet_ledger.apply_balance_change(
+            user_id, amount, "payment" if amount < 0 else "deposit", "stress",
+            min_balance_after=guard
+        )
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(apply(user_id, amount) for user_id, amount in plan))
+    elapsed = time.perf_counter() - started
+
+    expected = {user_id: OPENING_BALANCE for user_id in user_ids}
+    for (user_id, amount), transaction in zip(plan, results):
+        if transaction:
+            expected[user_id] += amount
+
+    failures = []
+    async for user in db.users.find({}, {"balance": 1}):
+        user_id = str(user["_id"])
+        if abs(user["balance"] - expected[user_id]) > 0.005:
+            failures.append({"userId": user_id, "balance": user["balance"], "expected": expected[user_id]})
+        if user["balance"] < MINIMUM_BALANCE - 0.005:
+            failures.append({"userId": user_id, "balance": user["balance"], "belowMinimum": True})
+
+    mismatches = await wallet_ledger.reconcile_balances()
+    print(json.dumps({
+        "operations": operations,
+        "accepted": sum(1 for r in results if r),
+        "rejected": sum(1 for r in results if not r),
+        "opsPerSecond": round(operations / elapsed, 1),
+        "balanceFailures": failures,
+        "ledgerMismatches": mismatches,
+    }, indent=2))
+    client.close()
+
+    assert not failures, "final balances do not match accepted operations"
+    assert not mismatches, "stored balances drifted from the ledger"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args.operations, args.users, args.seed))
@@ -0,0 +1,337 @@
+"""
+Bulk order creation for high-volume merchants.
+
+Rows come from a JSON list of OrderCreate payloads or an uploaded CSV/Excel
+file. They are validated column-wise with pandas, the orders are inserted,
+the wallet is debited once for the prepaid total, and transactions,
+notifications and saved recipients are written with insert_many/bulk_write.
+Without a transaction, a failed debit deletes the orders it was paying for.
+"""
+import io
+import logging
+import uuid
+from datetime import datetime
+from typing import List
+import pandas as pd
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from database import db, run_in_transaction
+from utils import build_order_document, generate_order_id, generate_tracking_code
+from wallet_ledger import apply_balance_changes
+from stats_cache import record_orders_created
+from socket_manager import push_notifications
+from pricing import PricingEngine, get_pricing_engine
+from routes.wallet_routes import MINIMUM_BALANCE
+
+logger = logging.getLogger(__name__)
+
+MAX_BULK_ROWS = 5000
+DUPLICATE_KEY = 11000
+# Fields with a unique index that are generated here, and their generators
+GENERATED_CODES = {"orderId": generate_order_id, "trackingCode": generate_tracking_code}
+INSERT_ATTEMPTS = 3
+
+TEXT_COLUMNS = [
+    "recipientName",
+    "recipientPhone",
+    "recipientCity",
+    "recipientDistrict",
+    "recipientAddress",
+    "shippingCompanyId"
+]
+REQUIRED_COLUMNS = TEXT_COLUMNS + ["weight", "desi"]
+PAYMENT_TYPES = ["prepaid", "cod"]
+
+
+def orders_to_frame(orders: list) -> pd.DataFrame:
+    return pd.DataFrame([order.model_dump() for order in orders])
+
+
+def read_order_file(content: bytes, filename: str) -> pd.DataFrame:
+    name = (filename or "").lower()
+    try:
+        if name.endswith((".xlsx", ".xls")):
+            df = pd.read_excel(io.BytesIO(content), dtype=str)
+        elif name.endswith(".csv"):
+            df = pd.read_csv(io.BytesIO(content), dtype=str, encoding="utf-8-sig")
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Sadece CSV veya Excel dosyaları desteklenir"
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Dosya okunamadı: {str(e)}"
+        )
+    df.columns = [str(column).strip() for column in df.columns]
+    return df
+
+
+def validate_orders(df: pd.DataFrame, companies: dict, pricing: PricingEngine):
+    """
+    Validate and price every row in one column-wise pass. Returns the
+    normalized frame and a Series holding the first error message per row
+    ("" when valid).
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Eksik sütunlar: {', '.join(missing)}"
+        )
+    if len(df) > MAX_BULK_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tek seferde en fazla {MAX_BULK_ROWS} gönderi oluşturulabilir"
+        )
+
+    df = df.reset_index(drop=True).copy()
+    errors = pd.Series("", index=df.index, dtype=object)
+
+    def flag(mask, message):
+        errors[mask & (errors == "")] = message
+
+    for column in TEXT_COLUMNS:
+        df[column] = df[column].fillna("").astype(str).str.strip()
+        flag(df[column] == "", f"{column} zorunlu")
+
+    df["weight"] = pd.to_numeric(df["weight"], errors="coerce")
+    flag(df["weight"].isna() | (df["weight"] <= 0), "Geçersiz ağırlık")
+
+    desi = pd.to_numeric(df["desi"], errors="coerce")
+    flag(desi.isna() | (desi < 0) | (desi % 1 != 0), "Geçersiz desi")
+    df["desi"] = desi.fillna(0).astype(int)
+
+    if "paymentType" not in df.columns:
+        df["paymentType"] = "prepaid"
+    df["paymentType"] = df["paymentType"].fillna("prepaid").astype(str).str.strip().replace("", "prepaid")
+    flag(~df["paymentType"].isin(PAYMENT_TYPES), "Geçersiz ödeme tipi")
+
+    if "codAmount" not in df.columns:
+        df["codAmount"] = None
+    df["codAmount"] = pd.to_numeric(df["codAmount"], errors="coerce")
+    flag((df["paymentType"] == "cod") & (df["codAmount"].isna() | (df["codAmount"] <= 0)), "Kapıda ödeme tutarı gerekli")
+
+    if "description" not in df.columns:
+        df["description"] = ""
+    df["description"] = df["description"].fillna("").astype(str)
+
+    known = df["shippingCompanyId"].isin(list(companies))
+    flag(~known, "Kargo firması bulunamadı")
+    df["price"] = pricing.price_rows(
+        df["shippingCompanyId"].where(known, ""),
+        df["weight"].fillna(0),
+        df["desi"],
+        df["recipientCity"],
+        df["codAmount"].where(df["paymentType"] == "cod", 0.0)
+    )
+
+    return df, errors
+
+
+async def _unique_codes(orders: List[dict]):
+    """Regenerate order IDs and tracking codes that collide inside the batch or with stored orders"""
+    for field, generate in GENERATED_CODES.items():
+        for _ in range(5):
+            seen = set()
+            for order in orders:
+                while order[field] in seen:
+                    order[field] = generate()
+                seen.add(order[field])
+            taken = await db.orders.distinct(field, {field: {"$in": list(seen)}})
+            if not taken:
+                break
+            taken = set(taken)
+            for order in orders:
+                if order[field] in taken:
+                    order[field] = generate()
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Sipariş numarası üretilemedi, lütfen tekrar deneyin"
+            )
+
+
+def _duplicate_rows(error: BulkWriteError) -> List[int]:
+    """Indexes of the rows rejected by a unique index; raises on any other write error"""
+    write_errors = error.details.get("writeErrors", [])
+    if not write_errors or any(e.get("code") != DUPLICATE_KEY for e in write_errors):
+        raise error
+    return [e["index"] for e in write_errors]
+
+
+async def _insert_orders(orders: List[dict], session):
+    """
+    insert_many that survives a code taken between the pre-check and the
+    insert. Outside a transaction the other rows are already written, so only
+    the rejected ones get new codes and go again; inside one the whole
+    transaction is aborted and create_bulk_orders retries it.
+    """
+    pending = orders
+    for _ in range(INSERT_ATTEMPTS):
+        try:
+            await db.orders.insert_many(pending, ordered=False, session=session)
+            return
+        except BulkWriteError as e:
+            rejected = _duplicate_rows(e)
+            if session is not None:
+                raise
+            pending = [pending[index] for index in rejected]
+            for order in pending:
+                for field, generate in GENERATED_CODES.items():
+                    order[field] = generate()
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Sipariş numarası üretilemedi, lütfen tekrar deneyin"
+    )
+
+
+async def _debit(user_id: str, orders: List[dict], session):
+    prepaid_entries = [
+        {
+            "amount": -order["price"],
+            "description": f"Kargo gönderimi - {order['shippingCompany']} - {order['orderId']}",
+            "orderId": order["orderId"]
+        }
+        for order in orders if order["paymentType"] == "prepaid"
+    ]
+    if not prepaid_entries:
+        await db.users.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"totalShipments": len(orders)}},
+            session=session
+        )
+        return
+    transactions = await apply_balance_changes(
+        user_id, prepaid_entries, "payment",
+        min_balance_after=MINIMUM_BALANCE,
+        inc={"totalShipments": len(orders)},
+        session=session
+    )
+    if not transactions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"İşlem sonrası bakiyeniz {MINIMUM_BALANCE} TL'nin altına düşemez. Lütfen bakiye yükleyin."
+        )
+
+
+async def _persist_orders(user_id: str, orders: List[dict], session):
+    # Orders first, so the ledger entries carry their final order IDs
+    try:
+        await _insert_orders(orders, session)
+        await _debit(user_id, orders, session)
+    except Exception:
+        # Without a transaction nothing rolls back the inserted orders
+        if session is None:
+            await db.orders.delete_many({"_id": {"$in": [order["_id"] for order in orders]}})
+        raise
+
+
+async def _record_bulk_side_effects(user_id: str, orders: List[dict]):
+    now = datetime.utcnow()
+    notifications = [{
+        "userId": user_id,
+        "type": "success",
+        "title": "Yeni Gönderi Oluşturuldu",
+        "message": f"{order['orderId']} numaralı gönderiniz oluşturuldu. Takip kodu: {order['trackingCode']}",
+        "read": False,
+        "createdAt": now
+    } for order in orders]
+
+    # One upsert per distinct recipient, counting every use in the batch
+    recipients = {}
+    for order in orders:
+        recipient = order["recipient"]
+        key = (recipient["name"], recipient["phone"])
+        uses = recipients[key][1] + 1 if key in recipients else 1
+        recipients[key] = (recipient, uses)
+    recipient_updates = [
+        UpdateOne(
+            {"userId": user_id, "name": name, "phone": phone},
+            {
+                "$set": {
+                    "city": recipient["city"],
+                    "district": recipient["district"],
+                    "address": recipient["address"],
+                    "lastUsedAt": now
+                },
+                "$inc": {"usageCount": uses},
+                "$setOnInsert": {"_id": str(uuid.uuid4()), "createdAt": now}
+            },
+            upsert=True
+        )
+        for (name, phone), (recipient, uses) in recipients.items()
+    ]
+
+    try:
+        await db.notifications.insert_many(notifications, ordered=False)
+        await push_notifications(user_id, notifications)
+        await db.saved_recipients.bulk_write(recipient_updates, ordered=False)
+    except Exception:
+        logger.exception(f"Bulk side effects failed for user {user_id}")
+
+
+async def create_bulk_orders(df: pd.DataFrame, user_id: str, background_tasks) -> dict:
+    pricing = await get_pricing_engine()
+    companies = {t.company_id: pricing.catalogue[t.company_id] for t in pricing.active}
+    df, errors = validate_orders(df, companies, pricing)
+
+    now = datetime.utcnow()
+    valid = errors == ""
+    orders = [
+        {"_id": ObjectId(), **build_order_document(row, companies[row["shippingCompanyId"]], user_id, now, price=row["price"])}
+        for row in df[valid].to_dict("records")
+    ]
+    rows = df.index[valid].tolist()
+    for order in orders:
+        if pd.isna(order["codAmount"]):
+            order["codAmount"] = None
+
+    if orders:
+        for attempt in range(INSERT_ATTEMPTS):
+            await _unique_codes(orders)
+            try:
+                await run_in_transaction(lambda session: _persist_orders(user_id, orders, session))
+                break
+            except BulkWriteError as e:
+                # Another request took a code after the pre-check; the transaction was rolled back
+                _duplicate_rows(e)
+                if attempt == INSERT_ATTEMPTS - 1:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Sipariş numarası üretilemedi, lütfen tekrar deneyin"
+                    )
+        # Before the response, as for single orders
+        try:
+            await record_orders_created(
+                len(orders), sum(o["price"] for o in orders if o["paymentType"] == "prepaid")
+            )
+        except Exception:
+            logger.exception(f"Stats update failed for bulk orders of user {user_id}")
+        background_tasks.add_task(_record_bulk_side_effects, user_id, orders)
+
+    results = [{"row": int(row), "success": False, "error": error} for row, error in errors[~valid].items()]
+    results += [
+        {
+            "row": int(row),
+            "success": True,
+            "orderId": order["orderId"],
+            "trackingCode": order["trackingCode"],
+            "price": order["price"]
+        }
+        for row, order in zip(rows, orders)
+    ]
+    results.sort(key=lambda result: result["row"])
+
+    return {
+        "success": True,
+        "created": len(orders),
+        "failed": int((~valid).sum()),
+        "totalCharged": round(sum(order["price"] for order in orders if order["paymentType"] == "prepaid"), 2),
+        "results": results
+    }
@@ -0,0 +1,230 @@
+"""
+Live chat dispatch: waiting-session queue and agent assignment.
+
+Waiting sessions are kept in an in-process heap ordered by how long they have
+waited, so agents get the queue without a collection scan. MongoDB stays the
+source of truth: a session is claimed with a conditional find_one_and_update
+on status "waiting", so two agents (on any worker) can never take the same
+chat, and a stale queue entry simply fails its claim and drops out. The heap
+only sees sessions started on its own worker, so agent_join re-reads the
+waiting sessions and claim_next falls back to claiming the oldest one in
+MongoDB when the heap is empty.
+
+Each agent holds at most CHAT_MAX_SESSIONS_PER_AGENT active sessions. A claim
+writes one of the agent's free slot numbers into the session, and a unique
+partial index on (agentId, agentSlot) over active sessions rejects a second
+claim of the same slot, so concurrent claims cannot exceed the cap.
+"""
+import heapq
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import db
+
+CHAT_MAX_SESSIONS_PER_AGENT = int(os.getenv("CHAT_MAX_SESSIONS_PER_AGENT", "5"))
+
+QUEUE_FIELDS = {"userId": 1, "userName": 1, "userEmail": 1, "status": 1, "startedAt": 1}
+QUEUE_SNAPSHOT_LIMIT = 100
+
+
+class AssignmentError(Exception):
+    """Claim rejected; the message is shown to the agent"""
+
+
+class WaitingQueue:
+    """Min-heap on startedAt with lazy deletion"""
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, str]] = []
+        self._entries: Dict[str, dict] = {}
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, session_id):
+        return session_id in self._entries
+
+    def add(self, session: dict):
+        session_id = session["_id"]
+        if session_id in self._entries:
+            return
+        self._entries[session_id] = session
+        heapq.heappush(self._heap, (session["startedAt"], session_id))
+
+    def remove(self, session_id: str) -> Optional[dict]:
+        entry = self._entries.pop(session_id, None)
+        # Drop dead heap entries once they dominate
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [item for item in self._heap if item[1] in self._entries]
+            heapq.heapify(self._heap)
+        return entry
+
+    def oldest(self) -> Optional[dict]:
+        while self._heap and self._heap[0][1] not in self._entries:
+            heapq.heappop(self._heap)
+        return self._entries[self._heap[0][1]] if self._heap else None
+
+    def sync(self, oldest: List[dict], complete: bool):
+        """
+        Match the heap to `oldest`, the oldest waiting sessions in start
+        order; `complete` when that is every waiting session.
+        """
+        listed = {session["_id"] for session in oldest}
+        horizon = None if complete or not oldest else oldest[-1]["startedAt"]
+        for session_id, entry in list(self._entries.items()):
+            if session_id not in listed and (horizon is None or entry["startedAt"] <= horizon):
+                self.remove(session_id)
+        for session in oldest:
+            self.add(session)
+
+    def snapshot(self, limit: int = QUEUE_SNAPSHOT_LIMIT) -> List[dict]:
+        live = [item for item in self._heap if item[1] in self._entries]
+        return [self._entries[session_id] for _, session_id in heapq.nsmallest(limit, live)]
+
+
+waiting_queue = WaitingQueue()
+
+
+def queue_entry(session: dict) -> dict:
+    return {field: session.get(field) for field in ("_id", *QUEUE_FIELDS)}
+
+
+async def load_waiting_queue():
+    """Seed the queue from the database; the heap then follows live events"""
+    cursor = db.chat_sessions.find({"status": "waiting"}, QUEUE_FIELDS).sort("startedAt", 1)
+    async for session in cursor:
+        waiting_queue.add(queue_entry(session))
+    waiting_queue.loaded = True
+
+
+async def refresh_waiting_queue(limit: int = QUEUE_SNAPSHOT_LIMIT) -> List[dict]:
+    """
+    The oldest waiting sessions according to the database. The local heap
+    takes in sessions started on other workers and drops the ones that were
+    claimed or closed there.
+    """
+    cursor = db.chat_sessions.find({"status": "waiting"}, QUEUE_FIELDS).sort("startedAt", 1).limit(limit)
+    sessions = [queue_entry(session) async for session in cursor]
+    waiting_queue.sync(sessions, complete=len(sessions) < limit)
+    waiting_queue.loaded = True
+    return sessions
+
+
+async def prepare_dispatch():
+    if not waiting_queue.loaded:
+        await load_waiting_queue()
+
+
+def enqueue_session(session: dict) -> dict:
+    """Add a new waiting session; returns the delta for the agents room"""
+    entry = queue_entry(session)
+    waiting_queue.add(entry)
+    return {"op": "added", "session": entry, "queueLength": len(waiting_queue)}
+
+
+def dequeue_session(session_id: str, reason: str, agent_name: Optional[str] = None) -> dict:
+    waiting_queue.remove(session_id)
+    delta = {"op": "removed", "sessionId": session_id, "reason": reason, "queueLength": len(waiting_queue)}
+    if agent_name:
+        delta["agentName"] = agent_name
+    return delta
+
+
+async def agent_sessions(agent_id: str) -> List[dict]:
+    """The agent's own active chats followed by the waiting queue"""
+    waiting = await refresh_waiting_queue()
+    own = await db.chat_sessions.find(
+        {"agentId": agent_id, "status": "active"},
+        {**QUEUE_FIELDS, "agentId": 1, "agentName": 1, "lastMessageAt": 1}
+    ).sort("lastMessageAt", -1).to_list(CHAT_MAX_SESSIONS_PER_AGENT)
+    return own + waiting
+
+
+def _capacity_error() -> AssignmentError:
+    return AssignmentError(f"Aynı anda en fazla {CHAT_MAX_SESSIONS_PER_AGENT} sohbet yürütebilirsiniz")
+
+
+def free_slots(active: List[dict]) -> List[int]:
+    """Slot numbers the agent may still claim, given its active sessions"""
+    used = {session.get("agentSlot") for session in active}
+    free = [slot for slot in range(CHAT_MAX_SESSIONS_PER_AGENT) if slot not in used]
+    # Sessions claimed before slots existed still count against the cap
+    return free[:max(CHAT_MAX_SESSIONS_PER_AGENT - len(active), 0)]
+
+
+async def _free_slot(agent_id: str) -> int:
+    active = await db.chat_sessions.find(
+        {"agentId": agent_id, "status": "active"}, {"agentSlot": 1}
+    ).to_list(None)
+    slots = free_slots(active)
+    if not slots:
+        raise _capacity_error()
+    return slots[0]
+
+
+async def _claim_waiting(query: dict, agent_id: str, agent_name: str, sort=None) -> Optional[dict]:
+    """
+    Claim a waiting session matching `query` into one of the agent's free
+    slots; None when no such session is still waiting. Raises AssignmentError
+    when the agent is at capacity.
+    """
+    for _ in range(CHAT_MAX_SESSIONS_PER_AGENT + 1):
+        slot = await _free_slot(agent_id)
+        now = datetime.utcnow()
+        try:
+            return await db.chat_sessions.find_one_and_update(
+                {**query, "status": "waiting"},
+                {"$set": {
+                    "agentId": agent_id,
+                    "agentName": agent_name,
+                    "agentSlot": slot,
+                    "status": "active",
+                    "assignedAt": now,
+                    "lastMessageAt": now
+                }},
+                projection={"_id": 1},
+                sort=sort,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # A concurrent claim by the same agent took this slot; look again
+            continue
+    raise _capacity_error()
+
+
+async def claim_session(session_id: str, agent_id: str, agent_name: str) -> bool:
+    """
+    Assign a waiting session to the agent. Returns False when the agent
+    already holds it (re-opening its own chat), True for a new assignment.
+    Raises AssignmentError when the session is taken or closed, or the agent
+    is at capacity.
+    """
+    owned = await db.chat_sessions.count_documents(
+        {"_id": session_id, "agentId": agent_id, "status": "active"}
+    )
+    if owned:
+        return False
+
+    if await _claim_waiting({"_id": session_id}, agent_id, agent_name) is None:
+        waiting_queue.remove(session_id)
+        raise AssignmentError("Bu sohbet başka bir temsilci tarafından alındı veya kapatıldı")
+    return True
+
+
+async def claim_next(agent_id: str, agent_name: str) -> Optional[str]:
+    """Server-side assignment: give the agent the longest-waiting session"""
+    while True:
+        entry = waiting_queue.oldest()
+        if entry is None:
+            break
+        if await _claim_waiting({"_id": entry["_id"]}, agent_id, agent_name) is not None:
+            return entry["_id"]
+        # Taken on another worker or closed meanwhile
+        waiting_queue.remove(entry["_id"])
+
+    # Sessions started on other workers never entered this heap
+    claimed = await _claim_waiting({}, agent_id, agent_name, sort=[("startedAt", ASCENDING)])
+    return claimed["_id"] if claimed else None
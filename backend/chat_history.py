@@ -0,0 +1,128 @@
+"""
+Chat history reads backed by the (sessionId, timestamp, _id) index.
+
+Joining a session returns only the newest page. Older pages are fetched on
+demand with load_history, and reconnecting clients ask sync_messages for the
+messages after the last one they have. Both walk the index with a
+(timestamp, _id) keyset, so ties on timestamp never skip or repeat a message.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Optional
+from database import db
+from chat_writer import message_buffer
+
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "50"))
+CHAT_SYNC_LIMIT = int(os.getenv("CHAT_SYNC_LIMIT", "200"))
+
+HISTORY_SORT = [("timestamp", 1), ("_id", 1)]
+
+
+def serialize_message(message: dict) -> dict:
+    message = dict(message)
+    message["_id"] = str(message["_id"])
+    if isinstance(message.get("timestamp"), datetime):
+        message["timestamp"] = message["timestamp"].isoformat()
+    return message
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Accept the ISO strings sent to clients; stored timestamps are naive UTC"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+async def _cursor_position(session_id: str, timestamp=None, message_id: Optional[str] = None):
+    """Resolve a client cursor to (timestamp, _id); the message id wins when known"""
+    if message_id:
+        anchor = await db.chat_messages.find_one(
+            {"_id": message_id, "sessionId": session_id}, {"timestamp": 1}
+        )
+        if anchor:
+            return anchor["timestamp"], anchor["_id"]
+    parsed = parse_timestamp(timestamp)
+    if parsed is None:
+        return None
+    return parsed, message_id
+
+
+def _keyset(position, op: str) -> dict:
+    timestamp, message_id = position
+    if message_id is None:
+        return {"timestamp": {op: timestamp}}
+    return {"$or": [
+        {"timestamp": {op: timestamp}},
+        {"timestamp": timestamp, "_id": {op: message_id}}
+    ]}
+
+
+async def latest_messages(session_id: str, limit: int = CHAT_HISTORY_PAGE_SIZE) -> dict:
+    """Newest page of a session, oldest first"""
+    return await messages_before(session_id, limit=limit)
+
+
+async def messages_before(
+    session_id: str,
+    before_timestamp=None,
+    before_id: Optional[str] = None,
+    limit: int = CHAT_HISTORY_PAGE_SIZE
+) -> dict:
+    # Recently sent messages may still be in the write buffer
+    await message_buffer.flush()
+    limit = max(1, min(limit, CHAT_SYNC_LIMIT))
+    query = {"sessionId": session_id}
+    if before_timestamp or before_id:
+        position = await _cursor_position(session_id, before_timestamp, before_id)
+        if position:
+            query.update(_keyset(position, "$lt"))
+
+    messages = await db.chat_messages.find(query).sort(
+        [("timestamp", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    messages.reverse()
+    return {
+        "sessionId": session_id,
+        "messages": [serialize_message(m) for m in messages],
+        "hasMore": has_more
+    }
+
+
+async def messages_since(
+    session_id: str,
+    since_timestamp=None,
+    last_message_id: Optional[str] = None,
+    limit: int = CHAT_SYNC_LIMIT
+) -> dict:
+    """Messages after the client's last one, oldest first"""
+    # The client's last message may still be in the write buffer
+    await message_buffer.flush()
+    position = None
+    if since_timestamp or last_message_id:
+        position = await _cursor_position(session_id, since_timestamp, last_message_id)
+    if position is None:
+        # Nothing usable to sync from: start over from the newest page
+        page = await latest_messages(session_id)
+        return {**page, "reset": True}
+
+    limit = max(1, min(limit, CHAT_SYNC_LIMIT))
+    query = {"sessionId": session_id, **_keyset(position, "$gt")}
+    messages = await db.chat_messages.find(query).sort(HISTORY_SORT).limit(limit + 1).to_list(limit + 1)
+    has_more = len(messages) > limit
+    return {
+        "sessionId": session_id,
+        "messages": [serialize_message(m) for m in messages[:limit]],
+        "hasMore": has_more,
+        "reset": False
+    }
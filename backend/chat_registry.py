@@ -0,0 +1,105 @@
+"""
+Connection registry for live chat.
+
+Keeps sid -> (session, role) and session -> {role: sid} so a disconnect is
+resolved in O(1) and only detaches the side that dropped. A detached side gets
+a grace period to resume the session from a new sid before the other
+participant is told it has left.
+
+The registry and its timers belong to one worker, and a side may resume on
+another one. socket_manager therefore also records the disconnect in the
+session document, but only for the sid the document names as connected, so a
+resume that got there first wins. It clears the record on resume, and the
+expiry callback acts only if the record is still there.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+CHAT_RECONNECT_GRACE_SECONDS = float(os.getenv('CHAT_RECONNECT_GRACE_SECONDS', '30'))
+
+
+class ConnectionRegistry:
+    def __init__(self, grace_seconds: float = CHAT_RECONNECT_GRACE_SECONDS):
+        self.grace_seconds = grace_seconds
+        self._by_sid: Dict[str, Tuple[str, str]] = {}
+        self._by_session: Dict[str, Dict[str, str]] = {}
+        self._expiries: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+
+    def attach(self, session_id: str, role: str, sid: str) -> bool:
+        """
+        Bind `sid` as the `role` side of a session. Returns True when this
+        resumes a side that was detached and still inside its grace period.
+        """
+        expiry = self._expiries.pop((session_id, role), None)
+        if expiry is not None:
+            expiry.cancel()
+
+        sides = self._by_session.setdefault(session_id, {})
+        previous_sid = sides.get(role)
+        if previous_sid and previous_sid != sid:
+            self._by_sid.pop(previous_sid, None)
+
+        # A sid belongs to one session side at a time
+        if sid in self._by_sid and self._by_sid[sid] != (session_id, role):
+            self._forget_sid(sid)
+
+        sides[role] = sid
+        self._by_sid[sid] = (session_id, role)
+        return expiry is not None
+
+    def detach(
+        self,
+        sid: str,
+        on_expire: Optional[Callable[[str, str], Awaitable[None]]] = None
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Detach a disconnected sid and return its (session, role). Unless the
+        side is re-attached within the grace period, `on_expire(session, role)`
+        is scheduled once it runs out.
+        """
+        entry = self._forget_sid(sid)
+        if entry is None:
+            return None
+
+        if on_expire is not None:
+            session_id, role = entry
+            loop = asyncio.get_running_loop()
+            self._expiries[entry] = loop.call_later(
+                self.grace_seconds,
+                lambda: self._expire(session_id, role, on_expire)
+            )
+        return entry
+
+    def _forget_sid(self, sid: str) -> Optional[Tuple[str, str]]:
+        entry = self._by_sid.pop(sid, None)
+        if entry is None:
+            return None
+        session_id, role = entry
+        sides = self._by_session.get(session_id)
+        if sides and sides.get(role) == sid:
+            del sides[role]
+            if not sides:
+                del self._by_session[session_id]
+        return entry
+
+    def _expire(self, session_id: str, role: str, on_expire):
+        self._expiries.pop((session_id, role), None)
+        asyncio.ensure_future(on_expire(session_id, role))
+
+    def sid_for(self, session_id: str, role: str) -> Optional[str]:
+        return self._by_session.get(session_id, {}).get(role)
+
+    def lookup(self, sid: str) -> Optional[Tuple[str, str]]:
+        return self._by_sid.get(sid)
+
+    def drop_session(self, session_id: str):
+        for sid in self._by_session.pop(session_id, {}).values():
+            self._by_sid.pop(sid, None)
+        for role in ('user', 'agent'):
+            expiry = self._expiries.pop((session_id, role), None)
+            if expiry is not None:
+                expiry.cancel()
+
+    def __len__(self):
+        return len(self._by_sid)
@@ -0,0 +1,149 @@
+"""
+Write-behind persistence for chat messages.
+
+send_message emits to the session room first and hands the message to
+`message_buffer`. A background flusher writes pending messages with one
+insert_many and one coalesced lastMessageAt update per session, whenever
+CHAT_FLUSH_BATCH_SIZE messages are pending or CHAT_FLUSH_INTERVAL_MS has
+passed. Once CHAT_MAX_PENDING_MESSAGES are waiting, senders block until the
+database catches up. stop() drains everything before the Mongo client closes.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from database import db
+
+logger = logging.getLogger(__name__)
+
+CHAT_FLUSH_BATCH_SIZE = int(os.getenv("CHAT_FLUSH_BATCH_SIZE", "200"))
+CHAT_FLUSH_INTERVAL_MS = float(os.getenv("CHAT_FLUSH_INTERVAL_MS", "100"))
+CHAT_MAX_PENDING_MESSAGES = int(os.getenv("CHAT_MAX_PENDING_MESSAGES", "5000"))
+
+DUPLICATE_KEY = 11000
+MAX_RETRY_DELAY_SECONDS = 5.0
+
+
+class ChatMessageBuffer:
+    def __init__(
+        self,
+        batch_size: int = CHAT_FLUSH_BATCH_SIZE,
+        interval_ms: float = CHAT_FLUSH_INTERVAL_MS,
+        max_pending: int = CHAT_MAX_PENDING_MESSAGES
+    ):
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._space = None
+        self._wakeup = None
+        self._flush_lock = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.failures = 0
+
+    def _ensure_primitives(self):
+        # Created lazily so they bind to the running loop
+        if self._space is None:
+            self._space = asyncio.Condition()
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def enqueue(self, message: dict):
+        """Queue a message for persistence, waiting while the buffer is full"""
+        self._ensure_primitives()
+        if len(self._pending) >= self.max_pending:
+            async with self._space:
+                await self._space.wait_for(lambda: len(self._pending) < self.max_pending)
+        self._pending.append(message)
+        if self._task is None:
+            # No flusher running (scripts, tests): write through
+            await self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write everything pending right now; raises if the database write fails"""
+        self._ensure_primitives()
+        written = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                try:
+                    await self._write(batch)
+                except BaseException:
+                    # Put the batch back in order so nothing is lost, even on cancellation
+                    self._pending.extendleft(reversed(batch))
+                    raise
+                written += len(batch)
+                self.flushed += len(batch)
+                async with self._space:
+                    self._space.notify_all()
+        return written
+
+    async def _write(self, batch: list):
+        try:
+            await db.chat_messages.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # A retried batch may have been partly written already
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+
+        last_message_at = {}
+        for message in batch:
+            session_id = message["sessionId"]
+            if session_id not in last_message_at or message["timestamp"] > last_message_at[session_id]:
+                last_message_at[session_id] = message["timestamp"]
+        await db.chat_sessions.bulk_write([
+            UpdateOne({"_id": session_id}, {"$max": {"lastMessageAt": timestamp}})
+            for session_id, timestamp in last_message_at.items()
+        ], ordered=False)
+
+    async def _run(self):
+        delay = self.interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                delay = self.interval
+            except Exception:
+                self.failures += 1
+                logger.exception(f"Chat message flush failed, {len(self._pending)} messages pending")
+                delay = min(max(delay, self.interval) * 2, MAX_RETRY_DELAY_SECONDS)
+
+    def start(self):
+        self._ensure_primitives()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, attempts: int = 3):
+        """Stop the flusher and drain the buffer"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for attempt in range(attempts):
+            try:
+                await self.flush()
+                return
+            except Exception:
+                logger.exception(f"Final chat flush attempt {attempt + 1} failed")
+                await asyncio.sleep(0.5)
+        if self._pending:
+            logger.error(f"{len(self._pending)} chat messages could not be persisted on shutdown")
+
+
+message_buffer = ChatMessageBuffer()
@@ -5,6 +5,10 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from pymongo.read_preferences import Nearest, Secondary, SecondaryPreferred
+from pool_metrics import PoolMetrics
+from request_metrics import command_metrics
+from slow_queries import slow_query_log
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -13,5 +17,112 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.getenv('MONGO_URL', os.getenv('MONGODB_URI', 'mongodb://localhost:27017'))
 db_name = os.getenv('DB_NAME', 'kargo_db')
 
-client = AsyncIOMotorClient(mongo_url)
+# Pool and server selection; unset values keep the driver defaults
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_CONNECTING = int(os.getenv('MONGO_MAX_CONNECTING', '2'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+MONGO_MAX_IDLE_TIME_MS = os.getenv('MONGO_MAX_IDLE_TIME_MS')
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '20000'))
+MONGO_SOCKET_TIMEOUT_MS = os.getenv('MONGO_SOCKET_TIMEOUT_MS')
+# e.g. "zstd,snappy,zlib"; zstd needs `zstandard` and snappy `python-snappy`,
+# the driver skips any that are not installed and the server picks the first it supports
+MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', '')
+MONGO_ZLIB_COMPRESSION_LEVEL = int(os.getenv('MONGO_ZLIB_COMPRESSION_LEVEL', '-1'))
+
+# Read-heavy paths that may be served by secondaries, e.g. "admin,stats,exports"
+READ_CLASSES = ('admin', 'stats', 'exports', 'tracking')
+MONGO_SECONDARY_READS = {
+    name.strip() for name in os.getenv('MONGO_SECONDARY_READS', '').split(',') if name.strip()
+}
+if MONGO_SECONDARY_READS - set(READ_CLASSES):
+    raise ValueError(f'Unknown MONGO_SECONDARY_READS classes: {sorted(MONGO_SECONDARY_READS - set(READ_CLASSES))}')
+MONGO_SECONDARY_READ_MODE = os.getenv('MONGO_SECONDARY_READ_MODE', 'secondaryPreferred')
+# Servers reject values below 90 seconds; -1 means no staleness bound
+MONGO_MAX_STALENESS_SECONDS = int(os.getenv('MONGO_MAX_STALENESS_SECONDS', '90'))
+
+
+def _client_options() -> dict:
+    options = {
+        'maxPoolSize': MONGO_MAX_POOL_SIZE,
+        'minPoolSize': MONGO_MIN_POOL_SIZE,
+        'maxConnecting': MONGO_MAX_CONNECTING,
+        'serverSelectionTimeoutMS': MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'connectTimeoutMS': MONGO_CONNECT_TIMEOUT_MS
+    }
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options['waitQueueTimeoutMS'] = int(MONGO_WAIT_QUEUE_TIMEOUT_MS)
+    if MONGO_MAX_IDLE_TIME_MS:
+        options['maxIdleTimeMS'] = int(MONGO_MAX_IDLE_TIME_MS)
+    if MONGO_SOCKET_TIMEOUT_MS:
+        options['socketTimeoutMS'] = int(MONGO_SOCKET_TIMEOUT_MS)
+    if MONGO_COMPRESSORS:
+        options['compressors'] = MONGO_COMPRESSORS
+        options['zlibCompressionLevel'] = MONGO_ZLIB_COMPRESSION_LEVEL
+    return options
+
+
+pool_metrics = PoolMetrics(MONGO_MAX_POOL_SIZE)
+
+client = AsyncIOMotorClient(mongo_url, event_listeners=[pool_metrics, command_metrics, slow_query_log], **_client_options())
 db = client[db_name]
+
+
+def _secondary_preference():
+    modes = {'secondaryPreferred': SecondaryPreferred, 'secondary': Secondary, 'nearest': Nearest}
+    if MONGO_SECONDARY_READ_MODE not in modes:
+        raise ValueError(f'Unsupported MONGO_SECONDARY_READ_MODE: {MONGO_SECONDARY_READ_MODE}')
+    return modes[MONGO_SECONDARY_READ_MODE](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+
+_secondary_db = None
+
+
+def read_db(read_class: str):
+    """
+    Database handle for a read-only path. Classes listed in
+    MONGO_SECONDARY_READS read from secondaries within the staleness bound;
+    everything else, and anything that feeds a write, stays on the primary.
+    """
+    global _secondary_db
+    if read_class not in MONGO_SECONDARY_READS:
+        return db
+    if _secondary_db is None or _secondary_db.client is not client:
+        _secondary_db = client.get_database(db.name, read_preference=_secondary_preference())
+    return _secondary_db
+
+
+def pool_stats() -> dict:
+    return {
+        'maxPoolSize': MONGO_MAX_POOL_SIZE,
+        'compressors': MONGO_COMPRESSORS or None,
+        'secondaryReads': sorted(MONGO_SECONDARY_READS),
+        'readMode': MONGO_SECONDARY_READ_MODE if MONGO_SECONDARY_READS else 'primary',
+        'servers': pool_metrics.snapshot()
+    }
+
+# Multi-document transactions need a replica set or mongos
+_transactions_supported = None
+
+async def transactions_supported() -> bool:
+    global _transactions_supported
+    if _transactions_supported is None:
+        hello = await client.admin.command("ismaster")
+        _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
+
+async def run_in_transaction(callback):
+    """
+    Run `callback(session)` inside a transaction when the deployment supports
+    it; on standalone servers it runs with `session=None`.
+
+    The driver retries the whole callback on TransientTransactionError (e.g.
+    a write conflict between two debits of the same wallet) and the commit on
+    UnknownTransactionCommitResult, so callbacks must be safe to run again:
+    everything they write goes through `session` and is discarded on abort.
+    """
+    if not await transactions_supported():
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback)
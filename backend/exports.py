@@ -0,0 +1,116 @@
+"""
+Streaming CSV/NDJSON exports.
+
+Rows are read from a Motor cursor with a fixed batch size and written out in
+small chunks, so memory stays flat no matter how many documents match.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from bson import ObjectId
+from database import read_db
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+ROWS_PER_CHUNK = 500
+
+EXPORTS = {
+    "orders": {
+        "collection": "orders",
+        "columns": [
+            "orderId", "trackingCode", "userId", "status", "shippingCompany",
+            "recipient.name", "recipient.phone", "recipient.city", "recipient.district",
+            "weight", "desi", "price", "paymentType", "codAmount",
+            "createdAt", "deliveredAt"
+        ]
+    },
+    "transactions": {
+        "collection": "transactions",
+        "columns": [
+            "_id", "userId", "type", "amount", "balanceBefore", "balanceAfter",
+            "description", "orderId", "depositRequestId", "createdAt"
+        ]
+    },
+    "deposit-requests": {
+        "collection": "deposit_requests",
+        "columns": [
+            "_id", "userId", "userName", "userEmail", "amount", "senderName",
+            "description", "status", "adminNote", "paymentDate", "createdAt", "updatedAt"
+        ]
+    }
+}
+
+
+def _value(doc: dict, column: str):
+    value = doc
+    for part in column.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _format(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def build_export_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> dict:
+    query = {}
+    if user_id:
+        query["userId"] = user_id
+    if status:
+        query["status"] = status
+    if start or end:
+        query["createdAt"] = {}
+        if start:
+            query["createdAt"]["$gte"] = start
+        if end:
+            query["createdAt"]["$lt"] = end
+    return query
+
+
+async def stream_export(kind: str, query: dict, fmt: str = "csv") -> AsyncIterator[bytes]:
+    spec = EXPORTS[kind]
+    columns = spec["columns"]
+    projection = {column: 1 for column in columns}
+    if "_id" not in projection:
+        projection["_id"] = 0
+
+    cursor = read_db("exports")[spec["collection"]].find(
+        query, projection, allow_disk_use=True
+    ).sort("createdAt", 1).batch_size(EXPORT_BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        # BOM so Excel opens Turkish characters correctly
+        buffer.write("\ufeff")
+        writer.writerow(columns)
+
+    rows = 0
+    async for doc in cursor:
+        values = [_format(_value(doc, column)) for column in columns]
+        if writer is not None:
+            writer.writerow(["" if v is None else v for v in values])
+        else:
+            buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+            buffer.write("\n")
+        rows += 1
+        if rows % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
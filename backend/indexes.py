@@ -0,0 +1,125 @@
+"""
+Declarative index registry.
+
+Every index the application relies on is listed here, next to the query that
+needs it. ensure_indexes() runs at startup and from seed_data. createIndexes is
+a no-op for an index that already exists, so applying the registry again is
+safe. A conflicting definition left over from an older deployment (same keys,
+different options) is logged and skipped instead of blocking startup.
+`python -m benchmarks.query_plans` explains every query shape the routes issue
+against this registry.
+
+List endpoints sort on pagination.SORT (createdAt desc, _id desc), so their
+indexes end in that pair and the sort comes straight from the index.
+"""
+import asyncio
+import logging
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from database import db
+from session_versions import REVOCATION_RETENTION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+NEWEST_FIRST = [("createdAt", DESCENDING), ("_id", DESCENDING)]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        # Admin user list (role filter, regex search applied on the index walk)
+        IndexModel([("role", ASCENDING), *NEWEST_FIRST]),
+        # Revoked users loaded by session_versions at startup
+        IndexModel([("tokenVersion", ASCENDING)], sparse=True),
+    ],
+    "orders": [
+        IndexModel([("orderId", ASCENDING)], unique=True),
+        IndexModel([("trackingCode", ASCENDING)], unique=True),
+        IndexModel([("recipientNameKey", ASCENDING)]),
+        # User order list, with and without a status filter; exports by user
+        IndexModel([("userId", ASCENDING), *NEWEST_FIRST]),
+        IndexModel([("userId", ASCENDING), ("status", ASCENDING), *NEWEST_FIRST]),
+        # Admin order list and status filter; monthly growth and export ranges
+        IndexModel(NEWEST_FIRST),
+        IndexModel([("status", ASCENDING), *NEWEST_FIRST]),
+    ],
+    "notifications": [
+        IndexModel([("userId", ASCENDING), *NEWEST_FIRST]),
+    ],
+    "transactions": [
+        IndexModel([("userId", ASCENDING), *NEWEST_FIRST]),
+        IndexModel(NEWEST_FIRST),
+    ],
+    "deposit_requests": [
+        IndexModel([("userId", ASCENDING), *NEWEST_FIRST]),
+        IndexModel([("status", ASCENDING), *NEWEST_FIRST]),
+        IndexModel(NEWEST_FIRST),
+    ],
+    "saved_recipients": [
+        # Exact match on save and the bulk upsert key
+        IndexModel([("userId", ASCENDING), ("name", ASCENDING), ("phone", ASCENDING)]),
+        IndexModel([("userId", ASCENDING), ("lastUsedAt", DESCENDING)]),
+        IndexModel([("userId", ASCENDING), ("usageCount", DESCENDING)]),
+    ],
+    "profile_update_requests": [
+        IndexModel([("userId", ASCENDING), ("updateType", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("createdAt", DESCENDING)]),
+        IndexModel([("createdAt", DESCENDING)]),
+    ],
+    "media": [
+        IndexModel(NEWEST_FIRST),
+    ],
+    "chat_messages": [
+        IndexModel([("sessionId", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "chat_sessions": [
+        # Waiting queue, oldest first
+        IndexModel([("status", ASCENDING), ("startedAt", ASCENDING)]),
+        # An agent's active chats, most recent first, and its capacity count
+        IndexModel([("agentId", ASCENDING), ("status", ASCENDING), ("lastMessageAt", DESCENDING)]),
+        # One active session per agent slot caps concurrent claims
+        IndexModel(
+            [("agentId", ASCENDING), ("agentSlot", ASCENDING)], unique=True,
+            partialFilterExpression={"status": "active", "agentSlot": {"$exists": True}}
+        ),
+        # A user's open session on start_chat
+        IndexModel([("userId", ASCENDING), ("status", ASCENDING)]),
+    ],
+    "refresh_tokens": [
+        IndexModel([("expiresAt", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("userId", ASCENDING)]),
+        IndexModel([("family", ASCENDING)]),
+    ],
+    "token_revocations": [
+        IndexModel([("createdAt", ASCENDING)], expireAfterSeconds=REVOCATION_RETENTION_SECONDS),
+    ],
+}
+
+
+async def _ensure_collection(collection, models: List[IndexModel]) -> List[str]:
+    created = []
+    for model in models:
+        try:
+            created += await collection.create_indexes([model])
+        except OperationFailure as e:
+            # 85/86: an index on the same keys exists with other options or name
+            if e.code not in (85, 86):
+                raise
+            logger.warning(f"Skipping index {model.document['name']} on {collection.name}: {e}")
+    return created
+
+
+async def ensure_indexes(database=None) -> Dict[str, List[str]]:
+    """Apply the registry to `database` (the app database by default)"""
+    database = db if database is None else database
+    names = list(INDEXES)
+    results = await asyncio.gather(*(_ensure_collection(database[name], INDEXES[name]) for name in names))
+    return dict(zip(names, results))
+
+
+async def ensure_indexes_logged():
+    try:
+        await ensure_indexes()
+    except Exception:
+        logger.exception("Index provisioning failed")
@@ -126,11 +126,23 @@ class Order(BaseModel):
         json_encoders = {ObjectId: str, datetime: lambda v: v.isoformat()}
 
 # Shipping Company Models
+class TariffBand(BaseModel):
+    upTo: float  # billable desi/kg, inclusive
+    price: float
+
+class Tariff(BaseModel):
+    bands: List[TariffBand]
+    extraPerUnit: float = 0.0  # per desi/kg above the last band
+    zoneMultipliers: Dict[str, float] = {"local": 1.0, "regional": 1.0, "national": 1.0}
+    codFee: float = 0.0
+    codRate: float = 0.0  # share of the collected amount
+
 class ShippingCompanyCreate(BaseModel):
     name: str
     logo: str
     price: float
     deliveryTime: str
+    tariff: Optional[Tariff] = None
 
 class ShippingCompanyUpdate(BaseModel):
     name: Optional[str] = None
@@ -138,6 +150,7 @@ class ShippingCompanyUpdate(BaseModel):
     price: Optional[float] = None
     deliveryTime: Optional[str] = None
     isActive: Optional[bool] = None
+    tariff: Optional[Tariff] = None
 
 class ShippingCompany(BaseModel):
     id: str = Field(alias="_id")
@@ -146,12 +159,26 @@ class ShippingCompany(BaseModel):
     price: float
     deliveryTime: str
     isActive: bool = True
+    tariff: Optional[Tariff] = None
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
         populate_by_name = True
         json_encoders = {ObjectId: str}
 
+# Quote Models
+class QuoteParcel(BaseModel):
+    weight: float = Field(gt=0)
+    desi: int = Field(ge=0)
+    recipientCity: str
+    paymentType: str = "prepaid"
+    codAmount: Optional[float] = None
+
+class QuoteRequest(BaseModel):
+    parcels: List[QuoteParcel]
+    originCity: Optional[str] = None
+    includeAll: bool = False
+
 # Notification Models
 class NotificationCreate(BaseModel):
     userId: str
@@ -178,9 +205,11 @@ class Stats(BaseModel):
     activeShipments: int
     deliveredShipments: int
     totalRevenue: float
+    totalUsers: int = 0
     monthlyGrowth: float
     averageDeliveryTime: float
-    customerSatisfaction: float
+    customerSatisfaction: Optional[float] = None
+    refreshedAt: Optional[datetime] = None
 
 # Token Models
 class Token(BaseModel):
@@ -190,6 +219,9 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+class RefreshRequest(BaseModel):
+    refreshToken: str
+
 # Update Balance
 class BalanceUpdate(BaseModel):
     amount: float
@@ -0,0 +1,67 @@
+"""
+Index-backed admin order search.
+
+Order and tracking codes are matched by anchored prefix on their unique
+indexes. Recipient names are matched by prefix on `recipientNameKey`, a
+Turkish case-folded copy of `recipient.name` written when the order is
+created. Every clause of the resulting $or can be answered from an index.
+"""
+import logging
+import re
+from pymongo import UpdateOne
+from database import db
+
+logger = logging.getLogger(__name__)
+
+_TURKISH_FOLD = str.maketrans({"I": "ı", "İ": "i"})
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fold_turkish(text: str) -> str:
+    """Lowercase with Turkish dotted/dotless i rules and collapsed whitespace"""
+    return _WHITESPACE.sub(" ", (text or "").translate(_TURKISH_FOLD).lower()).strip()
+
+
+def recipient_name_key(name: str) -> str:
+    return fold_turkish(name)
+
+
+def build_order_search_query(search: str) -> dict:
+    search = search.strip()
+    code_prefix = "^" + re.escape(search.upper().replace("İ", "I"))
+    name_prefix = "^" + re.escape(fold_turkish(search))
+    return {"$or": [
+        {"orderId": {"$regex": code_prefix}},
+        {"trackingCode": {"$regex": code_prefix}},
+        {"recipientNameKey": {"$regex": name_prefix}}
+    ]}
+
+
+async def backfill_recipient_name_keys(batch_size: int = 1000) -> int:
+    """Add recipientNameKey to orders created before it existed"""
+    updated = 0
+    batch = []
+    cursor = db.orders.find(
+        {"recipientNameKey": {"$exists": False}},
+        {"recipient.name": 1}
+    ).batch_size(batch_size)
+    async for order in cursor:
+        name = (order.get("recipient") or {}).get("name", "")
+        batch.append(UpdateOne({"_id": order["_id"]}, {"$set": {"recipientNameKey": recipient_name_key(name)}}))
+        if len(batch) >= batch_size:
+            await db.orders.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await db.orders.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
+
+
+async def prepare_order_search():
+    try:
+        updated = await backfill_recipient_name_keys()
+        if updated:
+            logger.info(f"Backfilled recipientNameKey on {updated} orders")
+    except Exception:
+        logger.exception("Order search preparation failed")
@@ -0,0 +1,128 @@
+"""
+Keyset pagination on (createdAt, _id) for list endpoints.
+
+Clients pass back the opaque `nextCursor` from the previous page instead of a
+page number, so deep pages cost the same as the first. The legacy `page`
+parameter still works (skip based) and also returns a `nextCursor`. Totals are
+optional and served from a short-lived count cache.
+"""
+import base64
+import json
+import os
+import time
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+
+SORT = [("createdAt", -1), ("_id", -1)]
+
+COUNT_CACHE_TTL_SECONDS = float(os.getenv("COUNT_CACHE_TTL_SECONDS", "15"))
+COUNT_CACHE_MAX_ENTRIES = 1024
+
+_count_cache = {}  # {(collection, query): (expires_at, total)}
+
+
+def encode_cursor(doc: dict) -> str:
+    created_at = doc.get("createdAt")
+    payload = {
+        "t": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "id": str(doc["_id"]),
+        "oid": isinstance(doc["_id"], ObjectId)
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["t"]) if payload["t"] else None
+        doc_id = ObjectId(payload["id"]) if payload["oid"] else payload["id"]
+        return created_at, doc_id
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Geçersiz sayfa imleci"
+        )
+
+
+def _after(created_at: Optional[datetime], doc_id) -> dict:
+    """Filter for documents that sort after the cursor position"""
+    if created_at is None:
+        # Documents without createdAt sort last; only the _id tie-break is left
+        return {"createdAt": None, "_id": {"$lt": doc_id}}
+    return {"$or": [
+        {"createdAt": {"$lt": created_at}},
+        {"createdAt": created_at, "_id": {"$lt": doc_id}},
+        {"createdAt": None}
+    ]}
+
+
+async def count_cached(collection, query: dict) -> int:
+    key = (collection.name, json.dumps(query, sort_keys=True, default=str))
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    if query:
+        total = await collection.count_documents(query)
+    else:
+        total = await collection.estimated_document_count()
+
+    if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+        _count_cache.clear()
+    _count_cache[key] = (now + COUNT_CACHE_TTL_SECONDS, total)
+    return total
+
+
+async def paginate(
+    collection,
+    query: dict,
+    limit: int,
+    key: str = "items",
+    cursor: Optional[str] = None,
+    page: int = 1,
+    projection: Optional[dict] = None,
+    include_total: bool = True
+) -> dict:
+    """
+    Fetch one page sorted newest first. Returns the documents under `key`
+    with `_id` stringified, the `nextCursor` (None on the last page) and, when
+    requested, the cached `total`/`totalPages`.
+    """
+    find_query = query
+    skip = 0
+    if cursor:
+        after = _after(*decode_cursor(cursor))
+        find_query = {"$and": [query, after]} if query else after
+    else:
+        skip = (page - 1) * limit
+
+    docs_cursor = collection.find(find_query, projection).sort(SORT)
+    if skip:
+        docs_cursor = docs_cursor.skip(skip)
+    # One extra document tells us whether another page exists
+    docs = await docs_cursor.limit(limit + 1).to_list(length=limit + 1)
+
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1]) if has_more else None
+
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+
+    result = {
+        key: docs,
+        "nextCursor": next_cursor,
+        "page": page,
+        "total": None,
+        "totalPages": None
+    }
+    if include_total:
+        total = await count_cached(collection, query)
+        result["total"] = total
+        result["totalPages"] = (total + limit - 1) // limit
+    return result
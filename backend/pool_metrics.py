@@ -0,0 +1,128 @@
+"""
+Connection pool saturation metrics.
+
+A pymongo ConnectionPoolListener registered on the Motor client. Motor runs
+pymongo on executor threads, so the events arrive off the event loop and the
+counters are guarded by a lock. Per server it tracks open and checked-out
+connections, callers waiting for a connection, checkout failures by reason
+and the time spent waiting for a checkout.
+"""
+import threading
+import time
+from collections import defaultdict
+from pymongo import monitoring
+
+
+class _ServerPool:
+    def __init__(self):
+        self.max_pool_size = None
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.peak_in_use = 0
+        self.peak_waiting = 0
+        self.checkouts = 0
+        self.failures = defaultdict(int)
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.cleared = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "maxPoolSize": self.max_pool_size,
+            "open": self.open,
+            "inUse": self.in_use,
+            "waiting": self.waiting,
+            "peakInUse": self.peak_in_use,
+            "peakWaiting": self.peak_waiting,
+            "utilization": round(self.in_use / self.max_pool_size, 3) if self.max_pool_size else None,
+            "checkouts": self.checkouts,
+            "checkoutFailures": dict(self.failures),
+            "avgWaitMs": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "maxWaitMs": round(self.wait_max_ms, 3),
+            "cleared": self.cleared
+        }
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._servers = {}
+        self._lock = threading.Lock()
+        # Checkout start times, per executor thread
+        self._local = threading.local()
+
+    def _server(self, address) -> _ServerPool:
+        key = f"{address[0]}:{address[1]}"
+        server = self._servers.get(key)
+        if server is None:
+            server = self._servers[key] = _ServerPool()
+            server.max_pool_size = self.max_pool_size
+        return server
+
+    def _end_wait(self, server: _ServerPool):
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        server.waiting = max(server.waiting - 1, 0)
+        if started is not None:
+            waited = (time.perf_counter() - started) * 1000
+            server.wait_total_ms += waited
+            server.wait_max_ms = max(server.wait_max_ms, waited)
+
+    def pool_created(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server.max_pool_size = event.options.get("maxPoolSize", self.max_pool_size)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event.address).cleared += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._servers.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._server(event.address).open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server.open = max(server.open - 1, 0)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            server = self._server(event.address)
+            server.waiting += 1
+            server.peak_waiting = max(server.peak_waiting, server.waiting)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            self._end_wait(server)
+            server.failures[event.reason] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            self._end_wait(server)
+            server.checkouts += 1
+            server.in_use += 1
+            server.peak_in_use = max(server.peak_in_use, server.in_use)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server.in_use = max(server.in_use - 1, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {address: server.snapshot() for address, server in self._servers.items()}
@@ -0,0 +1,201 @@
+"""
+Carrier pricing engine.
+
+Each shipping company may carry a `tariff`:
+    bands            [{upTo, price}] sorted by billable desi/kg (inclusive)
+    extraPerUnit     per started desi/kg above the last band
+    zoneMultipliers  {local, regional, national}
+    codFee, codRate  cash-on-delivery surcharge (fixed + share of codAmount)
+Companies without one are priced at their flat `price`, as before.
+
+Billable size is max(weight, desi). The zone comes from the origin and
+destination cities: the same province is local, the same geographic region
+is regional, and anything else is national. Tariffs are compiled into NumPy
+arrays whenever the catalogue reloads. A batch of parcels is then priced per
+carrier with one np.searchsorted over the band limits.
+"""
+import os
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+from shipping_catalogue import get_catalogue
+
+PRICING_ORIGIN_CITY = os.getenv("PRICING_ORIGIN_CITY", "İstanbul")
+
+ZONES = ("local", "regional", "national")
+LOCAL, REGIONAL, NATIONAL = range(3)
+
+REGIONS = {
+    "marmara": [
+        "Balıkesir", "Bilecik", "Bursa", "Çanakkale", "Edirne", "İstanbul",
+        "Kırklareli", "Kocaeli", "Sakarya", "Tekirdağ", "Yalova"
+    ],
+    "ege": ["Afyonkarahisar", "Aydın", "Denizli", "İzmir", "Kütahya", "Manisa", "Muğla", "Uşak"],
+    "akdeniz": ["Adana", "Antalya", "Burdur", "Hatay", "Isparta", "Kahramanmaraş", "Mersin", "Osmaniye"],
+    "ic_anadolu": [
+        "Aksaray", "Ankara", "Çankırı", "Eskişehir", "Karaman", "Kayseri", "Kırıkkale",
+        "Kırşehir", "Konya", "Nevşehir", "Niğde", "Sivas", "Yozgat"
+    ],
+    "karadeniz": [
+        "Amasya", "Artvin", "Bartın", "Bayburt", "Bolu", "Çorum", "Düzce", "Giresun", "Gümüşhane",
+        "Karabük", "Kastamonu", "Ordu", "Rize", "Samsun", "Sinop", "Tokat", "Trabzon", "Zonguldak"
+    ],
+    "dogu_anadolu": [
+        "Ağrı", "Ardahan", "Bingöl", "Bitlis", "Elazığ", "Erzincan", "Erzurum",
+        "Hakkari", "Iğdır", "Kars", "Malatya", "Muş", "Tunceli", "Van"
+    ],
+    "guneydogu": ["Adıyaman", "Batman", "Diyarbakır", "Gaziantep", "Kilis", "Mardin", "Siirt", "Şanlıurfa", "Şırnak"]
+}
+# Forms and CSV uploads often spell cities in ASCII ("Istanbul", "Mugla"),
+# so every i variant folds to "i" and the other Turkish letters lose their marks
+_CITY_FOLD = str.maketrans({
+    "I": "i", "İ": "i", "ı": "i", "\u0307": None,
+    "Ç": "c", "ç": "c", "Ğ": "g", "ğ": "g", "Ö": "o", "ö": "o",
+    "Ş": "s", "ş": "s", "Ü": "u", "ü": "u", "Â": "a", "â": "a", "Î": "i", "î": "i", "Û": "u", "û": "u"
+})
+
+
+def city_key(city: str) -> str:
+    """Spelling-insensitive city name: "İzmir", "Izmir" and "izmir" match"""
+    return " ".join((city or "").translate(_CITY_FOLD).lower().split())
+
+
+CITY_REGIONS = {city_key(city): region for region, cities in REGIONS.items() for city in cities}
+
+
+def zones_for(origin: str, destinations) -> np.ndarray:
+    origin = city_key(origin)
+    origin_region = CITY_REGIONS.get(origin)
+    zones = np.empty(len(destinations), dtype=np.intp)
+    for i, destination in enumerate(destinations):
+        destination = city_key(destination)
+        if destination == origin:
+            zones[i] = LOCAL
+        elif origin_region is not None and CITY_REGIONS.get(destination) == origin_region:
+            zones[i] = REGIONAL
+        else:
+            zones[i] = NATIONAL
+    return zones
+
+
+class CarrierTariff(NamedTuple):
+    company_id: str
+    name: str
+    active: bool
+    limits: np.ndarray
+    prices: np.ndarray
+    extra_per_unit: float
+    zone_multipliers: np.ndarray
+    cod_fee: float
+    cod_rate: float
+
+
+def compile_tariff(company: dict) -> CarrierTariff:
+    tariff = company.get("tariff") or {}
+    bands = sorted(tariff.get("bands") or [], key=lambda band: band["upTo"])
+    if bands:
+        limits = np.array([band["upTo"] for band in bands], dtype=float)
+        prices = np.array([band["price"] for band in bands], dtype=float)
+    else:
+        limits = np.array([np.inf])
+        prices = np.array([float(company["price"])])
+    multipliers = tariff.get("zoneMultipliers") or {}
+    return CarrierTariff(
+        company_id=company["_id"],
+        name=company["name"],
+        active=company.get("isActive", True),
+        limits=limits,
+        prices=prices,
+        extra_per_unit=float(tariff.get("extraPerUnit", 0.0)),
+        zone_multipliers=np.array([float(multipliers.get(zone, 1.0)) for zone in ZONES]),
+        cod_fee=float(tariff.get("codFee", 0.0)),
+        cod_rate=float(tariff.get("codRate", 0.0))
+    )
+
+
+def carrier_prices(tariff: CarrierTariff, billable: np.ndarray, zones: np.ndarray, cod_amounts: np.ndarray) -> np.ndarray:
+    """Prices of N parcels with one carrier"""
+    last = len(tariff.limits) - 1
+    index = np.searchsorted(tariff.limits, billable, side="left")
+    base = tariff.prices[np.minimum(index, last)]
+    over = np.ceil(np.maximum(billable - tariff.limits[last], 0.0))
+    base = np.where(index <= last, base, tariff.prices[last] + over * tariff.extra_per_unit)
+    price = base * tariff.zone_multipliers[zones]
+    price = price + np.where(cod_amounts > 0, tariff.cod_fee + cod_amounts * tariff.cod_rate, 0.0)
+    return np.round(price, 2)
+
+
+class PricingEngine:
+    def __init__(self, catalogue: Dict[str, dict]):
+        self.catalogue = catalogue
+        self.tariffs = {company_id: compile_tariff(company) for company_id, company in catalogue.items()}
+        self.active = [t for t in self.tariffs.values() if t.active]
+
+    @staticmethod
+    def _inputs(weights, desis, cities, cod_amounts, origin):
+        billable = np.maximum(np.asarray(weights, dtype=float), np.asarray(desis, dtype=float))
+        zones = zones_for(origin or PRICING_ORIGIN_CITY, list(cities))
+        cod = np.nan_to_num(np.asarray(cod_amounts, dtype=float))
+        return billable, zones, cod
+
+    def quote_matrix(self, weights, desis, cities, cod_amounts, origin: Optional[str] = None) -> np.ndarray:
+        """(active carriers x parcels) price matrix"""
+        billable, zones, cod = self._inputs(weights, desis, cities, cod_amounts, origin)
+        if not self.active:
+            return np.empty((0, len(billable)))
+        return np.vstack([carrier_prices(t, billable, zones, cod) for t in self.active])
+
+    def price_rows(self, company_ids, weights, desis, cities, cod_amounts, origin: Optional[str] = None) -> np.ndarray:
+        """Price each parcel with its own carrier; NaN where the carrier is unknown"""
+        billable, zones, cod = self._inputs(weights, desis, cities, cod_amounts, origin)
+        company_ids = np.asarray(company_ids, dtype=object)
+        prices = np.full(len(billable), np.nan)
+        for company_id in set(company_ids.tolist()):
+            tariff = self.tariffs.get(company_id)
+            if tariff is None:
+                continue
+            mask = company_ids == company_id
+            prices[mask] = carrier_prices(tariff, billable[mask], zones[mask], cod[mask])
+        return prices
+
+    def price_one(self, company_id: str, weight: float, desi: float, city: str, cod_amount: Optional[float] = None) -> float:
+        return float(self.price_rows([company_id], [weight], [desi], [city], [cod_amount or 0.0])[0])
+
+    def cheapest(self, parcels: List[dict], origin: Optional[str] = None, include_all: bool = False) -> List[dict]:
+        matrix = self.quote_matrix(
+            [p["weight"] for p in parcels],
+            [p["desi"] for p in parcels],
+            [p["recipientCity"] for p in parcels],
+            [(p.get("codAmount") or 0.0) if p.get("paymentType") == "cod" else 0.0 for p in parcels],
+            origin
+        )
+        if not self.active:
+            return [{"index": i, "cheapest": None} for i in range(len(parcels))]
+
+        best = matrix.argmin(axis=0)
+        results = []
+        for i, carrier in enumerate(best.tolist()):
+            tariff = self.active[carrier]
+            result = {
+                "index": i,
+                "cheapest": {"shippingCompanyId": tariff.company_id, "name": tariff.name, "price": float(matrix[carrier, i])}
+            }
+            if include_all:
+                order = np.argsort(matrix[:, i], kind="stable")
+                result["quotes"] = [
+                    {"shippingCompanyId": self.active[c].company_id, "name": self.active[c].name, "price": float(matrix[c, i])}
+                    for c in order.tolist()
+                ]
+            results.append(result)
+        return results
+
+
+_engine: Optional[PricingEngine] = None
+
+
+async def get_pricing_engine() -> PricingEngine:
+    """Engine for the current catalogue, recompiled when the catalogue reloads"""
+    global _engine
+    catalogue = await get_catalogue()
+    if _engine is None or _engine.catalogue is not catalogue:
+        _engine = PricingEngine(catalogue)
+    return _engine
@@ -0,0 +1,130 @@
+"""
+Opt-in sampling profiler.
+
+A background thread reads sys._current_frames() every PROFILER_INTERVAL_MS
+and counts the stacks it sees. By default it samples only the event loop
+thread, where request handlers and socket events run; all_threads also
+covers the executor threads (Motor, bcrypt). The output is the folded stack
+format ("frame;frame;frame count" per line), which flamegraph.pl and
+speedscope read directly.
+
+The sampler needs the GIL to take a sample, so it tends to land where the
+loop thread gives the GIL up: in select() or in the middle of CPU work that
+runs for more than a switch interval. Handlers that block the loop for
+milliseconds (the stalls worth finding) show up clearly. Very short bursts
+between awaits are under-represented.
+
+The profiler belongs to one worker process. Admins start and stop it
+through /api/admin/profiler, and the response names the worker's pid.
+A run stops itself after PROFILER_MAX_SECONDS.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "120"))
+PROFILER_MAX_DEPTH = 64
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _fold(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < PROFILER_MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.interval = PROFILER_INTERVAL_MS / 1000
+        self.all_threads = False
+        self._target: Optional[int] = None
+        self._deadline = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = PROFILER_INTERVAL_MS, duration: float = PROFILER_MAX_SECONDS, all_threads: bool = False):
+        """Start sampling; call from the event loop thread, which becomes the target"""
+        if self.running:
+            raise RuntimeError("Profiler is already running")
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+        self.interval = max(interval_ms, 1.0) / 1000
+        self.all_threads = all_threads
+        self._target = threading.get_ident()
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._deadline = time.monotonic() + min(duration, PROFILER_MAX_SECONDS)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval) and time.monotonic() < self._deadline:
+            frames = sys._current_frames()
+            if self.all_threads:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            else:
+                frames = {self._target: frames[self._target]} if self._target in frames else {}
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    stack = _fold(frame)
+                    if self.all_threads:
+                        stack = f"{names.get(ident, ident)};{stack}"
+                    self.stacks[stack] += 1
+                self.samples += 1
+        self.stopped_at = time.time()
+
+    def folded(self) -> str:
+        """Flamegraph input: one "stack count" line per distinct stack"""
+        with self._lock:
+            items = self.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self) -> dict:
+        with self._lock:
+            distinct = len(self.stacks)
+            samples = self.samples
+        return {
+            "pid": os.getpid(),
+            "running": self.running,
+            "intervalMs": self.interval * 1000,
+            "allThreads": self.all_threads,
+            "samples": samples,
+            "distinctStacks": distinct,
+            "startedAt": self.started_at,
+            "stoppedAt": self.stopped_at
+        }
+
+
+profiler = SamplingProfiler()
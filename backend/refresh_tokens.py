@@ -0,0 +1,93 @@
+"""
+Refresh tokens with rotation.
+
+Access tokens are short-lived and validated statelessly. The state lives
+here: a refresh token is an opaque random string stored only as a SHA-256
+hash in `refresh_tokens`, and a TTL index removes it once it expires. Each
+refresh consumes the token with a conditional update and issues its
+successor in the same family. Presenting an already consumed token after
+REFRESH_REUSE_GRACE_SECONDS is treated as theft and revokes the whole family.
+Within the grace period the reuse is still refused, but the family survives:
+tabs share one refresh token through localStorage, so the tab that loses a
+simultaneous refresh gets a 401 and picks up the pair the winning tab stored
+(see frontend/src/services/api.js). Refresh tokens
+record the session version they were issued under, so revoking a user's
+sessions (see session_versions) retires them too.
+"""
+import hashlib
+import os
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from database import db
+from auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_session_token
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REFRESH_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "10"))
+
+
+class RefreshError(Exception):
+    pass
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def issue_refresh_token(user_id: str, version: int = 0, family: Optional[str] = None) -> str:
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db.refresh_tokens.insert_one({
+        "_id": _hash(token),
+        "userId": user_id,
+        "tokenVersion": version,
+        "family": family or str(uuid.uuid4()),
+        "createdAt": now,
+        "expiresAt": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "usedAt": None
+    })
+    return token
+
+
+async def rotate_refresh_token(token: str) -> dict:
+    """Consume a refresh token and return a new access/refresh pair"""
+    now = datetime.utcnow()
+    token_hash = _hash(token)
+    consumed = await db.refresh_tokens.find_one_and_update(
+        {"_id": token_hash, "usedAt": None, "expiresAt": {"$gt": now}},
+        {"$set": {"usedAt": now}}
+    )
+    if consumed is None:
+        stale = await db.refresh_tokens.find_one({"_id": token_hash}, {"family": 1, "usedAt": 1})
+        if stale and stale["usedAt"] and now - stale["usedAt"] > timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+            await db.refresh_tokens.delete_many({"family": stale["family"]})
+        raise RefreshError("Oturum yenilenemedi, lütfen tekrar giriş yapın")
+
+    user = await db.users.find_one(
+        {"_id": ObjectId(consumed["userId"])},
+        {"role": 1, "tokenVersion": 1}
+    )
+    if user is None or user.get("tokenVersion", 0) > consumed.get("tokenVersion", 0):
+        await db.refresh_tokens.delete_many({"family": consumed["family"]})
+        raise RefreshError("Oturum sonlandırılmış, lütfen tekrar giriş yapın")
+
+    return await issue_session(
+        consumed["userId"], user.get("role", "user"), user.get("tokenVersion", 0), consumed["family"]
+    )
+
+
+async def issue_session(user_id: str, role: str, version: int = 0, family: Optional[str] = None) -> dict:
+    """Access and refresh token pair as returned by the auth endpoints"""
+    return {
+        "token": create_session_token(user_id, role, version),
+        "refreshToken": await issue_refresh_token(user_id, version, family),
+        "expiresIn": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+
+async def revoke_refresh_family(token: str):
+    stale = await db.refresh_tokens.find_one({"_id": _hash(token)}, {"family": 1})
+    if stale:
+        await db.refresh_tokens.delete_many({"family": stale["family"]})
@@ -0,0 +1,281 @@
+"""
+Request-level performance metrics.
+
+MetricsMiddleware records, for every HTTP request:
+- latency, response size and in-flight count, labelled by route template
+- status code
+
+A Motor command listener attributes MongoDB time and round trips to the
+request that issued them. Motor copies the caller's context onto its executor
+threads, so the listener finds the request's timing through a contextvar.
+Responses carry a Server-Timing header that splits the total into db and app
+time. render_prometheus() produces the Prometheus text format served at
+/api/metrics.
+
+Metrics are per worker process; scrape each worker, or sum across them.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from pymongo import monitoring
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, labels: Tuple = (), value: float = 0.0):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], buckets: Iterable[float]):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    bucket = _labels(self.labels, labels, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+                bucket = _labels(self.labels, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{bucket} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labels, labels)} {series[-1]}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served")
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "MongoDB time per HTTP request", ("method", "route"), LATENCY_BUCKETS
+)
+REQUEST_ROUND_TRIPS = Histogram(
+    "http_request_db_round_trips", "MongoDB commands per HTTP request", ("method", "route"), ROUND_TRIP_BUCKETS
+)
+COMMAND_SECONDS = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("command",), DB_BUCKETS
+)
+COMMAND_FAILURES = Counter("mongodb_command_failures_total", "Failed MongoDB commands", ("command",))
+
+POOL_GAUGES = (
+    ("open", Gauge("mongodb_pool_connections_open", "Open pooled connections", ("server",))),
+    ("inUse", Gauge("mongodb_pool_connections_in_use", "Checked-out connections", ("server",))),
+    ("waiting", Gauge("mongodb_pool_checkouts_waiting", "Callers waiting for a connection", ("server",))),
+    ("maxPoolSize", Gauge("mongodb_pool_max_size", "Configured pool size", ("server",))),
+)
+
+
+class RequestTiming:
+    __slots__ = ("db_seconds", "round_trips", "scope", "_lock")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.db_seconds = 0.0
+        self.round_trips = 0
+        # The router fills in scope["route"] once the request is matched
+        self.scope = scope
+        self._lock = threading.Lock()
+
+    def route(self) -> str:
+        route = self.scope.get("route") if self.scope else None
+        return getattr(route, "path", "unmatched")
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.db_seconds += seconds
+            self.round_trips += 1
+
+    def server_timing(self, total_seconds: float) -> str:
+        db_ms = self.db_seconds * 1000
+        total_ms = total_seconds * 1000
+        return (
+            f'db;dur={db_ms:.1f};desc="{self.round_trips} queries", '
+            f"app;dur={max(total_ms - db_ms, 0.0):.1f}, total;dur={total_ms:.1f}"
+        )
+
+
+_current: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar("request_timing", default=None)
+# Name of a non-HTTP operation in progress, e.g. a Socket.IO event
+_operation: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("operation", default=None)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    return _current.get()
+
+
+def set_operation(name: str) -> contextvars.Token:
+    return _operation.set(name)
+
+
+def reset_operation(token: contextvars.Token):
+    _operation.reset(token)
+
+
+def current_origin() -> str:
+    """Label for what issued the current work: a route, a socket event or background"""
+    timing = _current.get()
+    if timing is not None and timing.scope is not None:
+        return f"{timing.scope['method']} {timing.route()}"
+    return _operation.get() or "background"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Registered on the Motor client; runs on driver threads"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1_000_000
+        COMMAND_SECONDS.observe((event.command_name,), seconds)
+        timing = _current.get()
+        if timing is not None:
+            timing.add(seconds)
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1_000_000
+        COMMAND_FAILURES.inc((event.command_name,))
+        timing = _current.get()
+        if timing is not None:
+            timing.add(seconds)
+
+
+command_metrics = CommandMetrics()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are measured to the last byte"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming(scope)
+        token = _current.set(timing)
+        started = time.perf_counter()
+        status_code = 500
+        size = 0
+        recorded = False
+        IN_FLIGHT.inc()
+
+        def record():
+            # Background tasks run inside the app call after the body is sent;
+            # they are not part of the request's latency
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.inc(amount=-1)
+            # Route templates keep label cardinality bounded
+            labels = (scope["method"], timing.route())
+            REQUESTS.inc((*labels, str(status_code)))
+            REQUEST_SECONDS.observe(labels, elapsed)
+            RESPONSE_BYTES.observe(labels, size)
+            REQUEST_DB_SECONDS.observe(labels, timing.db_seconds)
+            REQUEST_ROUND_TRIPS.observe(labels, timing.round_trips)
+
+        async def send_with_metrics(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    header = timing.server_timing(time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _current.reset(token)
+            # No final body was sent (the app raised or the client went away)
+            record()
+
+
+def render_prometheus(pool: Optional[Dict[str, dict]] = None) -> str:
+    for field, gauge in POOL_GAUGES:
+        for server, stats in (pool or {}).items():
+            if stats.get(field) is not None:
+                gauge.set((server,), stats[field])
+
+    metrics = [
+        REQUESTS, REQUEST_SECONDS, RESPONSE_BYTES, IN_FLIGHT, REQUEST_DB_SECONDS, REQUEST_ROUND_TRIPS,
+        COMMAND_SECONDS, COMMAND_FAILURES, *(gauge for _, gauge in POOL_GAUGES)
+    ]
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
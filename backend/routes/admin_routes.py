@@ -1,49 +1,90 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, BackgroundTasks, Response
 from typing import Optional
 from bson import ObjectId
+from pymongo import ReturnDocument
 from models import StatusUpdate
 from auth import get_current_admin
 from utils import get_status_text
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
-from database import db
+from database import db, read_db, pool_stats
+from stats_cache import get_dashboard_stats, record_status_change
+from pagination import paginate
+from order_search import build_order_search_query
+from tracking_cache import invalidate_tracking, tracking_cache
+from socket_manager import publish_order_status, push_notification
+from session_versions import revoke_user_sessions
+from slow_queries import slow_query_log
+from profiler import profiler, PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS
+
+async def _push_status_update(order: dict, order_id: str, changes: dict, timeline_event: dict, notification: dict):
+    """Live updates to tracking subscribers and the merchant, after the response"""
+    try:
+        await publish_order_status(order["userId"], order_id, order["trackingCode"], changes, timeline_event)
+        await push_notification(notification)
+    except Exception:
+        logger.exception(f"Live update failed for order {order_id}")
 
 @router.get("/stats", response_model=dict)
 async def get_stats(current_user: dict = Depends(get_current_admin)):
-    # Get total shipments
-    total_shipments = await db.orders.count_documents({})
-    
-    # Get active shipments
-    active_shipments = await db.orders.count_documents({
-        "status": {"$in": ["created", "picked", "in_transit", "out_for_delivery"]}
-    })
-    
-    # Get delivered shipments
-    delivered_shipments = await db.orders.count_documents({"status": "delivered"})
-    
-    # Calculate total revenue
-    pipeline = [
-        {"$match": {"paymentType": "prepaid"}},
-        {"$group": {"_id": None, "total": {"$sum": "$price"}}}
-    ]
-    revenue_result = await db.orders.aggregate(pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
-    
-    # Get user count
-    total_users = await db.users.count_documents({"role": "user"})
-    
-    return {
-        "totalShipments": total_shipments,
-        "activeShipments": active_shipments,
-        "deliveredShipments": delivered_shipments,
-        "totalRevenue": total_revenue,
-        "totalUsers": total_users,
-        "monthlyGrowth": 15.3,
-        "averageDeliveryTime": 2.4,
-        "customerSatisfaction": 4.7
-    }
+    return await get_dashboard_stats()
+
+@router.get("/tracking-cache", response_model=dict)
+async def get_tracking_cache_metrics(current_user: dict = Depends(get_current_admin)):
+    return tracking_cache.metrics()
+
+@router.get("/db-pool", response_model=dict)
+async def get_db_pool_metrics(current_user: dict = Depends(get_current_admin)):
+    return pool_stats()
+
+@router.get("/slow-queries", response_model=dict)
+async def get_slow_queries(
+    current_user: dict = Depends(get_current_admin),
+    limit: int = Query(50, ge=1, le=500)
+):
+    return slow_query_log.recent(limit)
+
+# The profiler runs in the worker that serves the request; responses carry its pid
+@router.get("/profiler", response_model=dict)
+async def get_profiler_status(current_user: dict = Depends(get_current_admin)):
+    return profiler.status()
+
+@router.post("/profiler/start", response_model=dict)
+async def start_profiler(
+    current_user: dict = Depends(get_current_admin),
+    interval_ms: float = Query(PROFILER_INTERVAL_MS, ge=1, le=1000),
+    duration_seconds: float = Query(PROFILER_MAX_SECONDS, gt=0, le=PROFILER_MAX_SECONDS),
+    all_threads: bool = False
+):
+    if profiler.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Profil oluşturucu zaten çalışıyor"
+        )
+    profiler.start(interval_ms, duration_seconds, all_threads)
+    return profiler.status()
+
+@router.post("/profiler/stop", response_model=dict)
+async def stop_profiler(current_user: dict = Depends(get_current_admin)):
+    profiler.stop()
+    return profiler.status()
+
+@router.get("/profiler/folded")
+async def get_profiler_output(current_user: dict = Depends(get_current_admin)):
+    status_info = profiler.status()
+    return Response(
+        content=profiler.folded(),
+        media_type="text/plain; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{status_info["pid"]}.folded"',
+            "X-Profiler-Pid": str(status_info["pid"])
+        }
+    )
 
 @router.get("/orders", response_model=dict)
 async def get_all_orders(
@@ -51,48 +92,31 @@ async def get_all_orders(
     status: Optional[str] = None,
     search: Optional[str] = None,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
-    skip = (page - 1) * limit
-    
     # Build query
     query = {}
     if status:
         query["status"] = status
     if search:
-        query["$or"] = [
-            {"orderId": {"$regex": search, "$options": "i"}},
-            {"trackingCode": {"$regex": search, "$options": "i"}},
-            {"recipient.name": {"$regex": search, "$options": "i"}}
-        ]
-    
-    # Get orders
-    orders_cursor = db.orders.find(query).sort("createdAt", -1).skip(skip).limit(limit)
-    orders = await orders_cursor.to_list(length=limit)
-    
-    # Get total count
-    total = await db.orders.count_documents(query)
+        query.update(build_order_search_query(search))
     
-    # Convert ObjectId to string
-    for order in orders:
-        order["_id"] = str(order["_id"])
-    
-    return {
-        "orders": orders,
-        "total": total,
-        "page": page,
-        "totalPages": (total + limit - 1) // limit
-    }
+    return await paginate(
+        read_db("admin").orders, query, limit, key="orders",
+        cursor=cursor, page=page, include_total=include_total
+    )
 
 @router.get("/users", response_model=dict)
 async def get_all_users(
     current_user: dict = Depends(get_current_admin),
     search: Optional[str] = None,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
-    skip = (page - 1) * limit
-    
     # Build query
     query = {"role": "user"}
     if search:
@@ -102,38 +126,35 @@ async def get_all_users(
             {"company": {"$regex": search, "$options": "i"}}
         ]
     
-    # Get users
-    users_cursor = db.users.find(query, {"password": 0}).sort("createdAt", -1).skip(skip).limit(limit)
-    users = await users_cursor.to_list(length=limit)
-    
-    # Get total count
-    total = await db.users.count_documents(query)
+    return await paginate(
+        read_db("admin").users, query, limit, key="users", projection={"password": 0},
+        cursor=cursor, page=page, include_total=include_total
+    )
+
+@router.post("/users/{user_id}/revoke-sessions", response_model=dict)
+async def revoke_sessions(user_id: str, current_user: dict = Depends(get_current_admin)):
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Geçersiz kullanıcı ID"
+        )
     
-    # Convert ObjectId to string
-    for user in users:
-        user["_id"] = str(user["_id"])
+    version = await revoke_user_sessions(user_id, "admin")
+    if not version:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Kullanıcı bulunamadı"
+        )
     
-    return {
-        "users": users,
-        "total": total,
-        "page": page,
-        "totalPages": (total + limit - 1) // limit
-    }
+    return {"success": True, "message": "Kullanıcının tüm oturumları sonlandırıldı"}
 
 @router.put("/orders/{order_id}/status", response_model=dict)
 async def update_order_status(
     order_id: str,
     status_update: StatusUpdate,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_admin)
 ):
-    # Find order
-    order = await db.orders.find_one({"orderId": order_id})
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Sipariş bulunamadı"
-        )
-    
     # Update status
     status_text = get_status_text(status_update.status)
     update_data = {
@@ -146,6 +167,10 @@ async def update_order_status(
     if status_update.location:
         update_data["currentLocation"] = status_update.location.model_dump()
     
+    # If delivered, update deliveredAt
+    if status_update.status == "delivered":
+        update_data["deliveredAt"] = datetime.utcnow()
+    
     # Add to timeline
     timeline_event = {
         "date": datetime.utcnow(),
@@ -153,30 +178,37 @@ async def update_order_status(
         "description": status_text
     }
     
-    # Update order
-    await db.orders.update_one(
+    # Update order, reading back the previous status in the same round trip
+    order = await db.orders.find_one_and_update(
         {"orderId": order_id},
         {
             "$set": update_data,
             "$push": {"timeline": timeline_event}
-        }
+        },
+        projection={"userId": 1, "status": 1, "trackingCode": 1},
+        return_document=ReturnDocument.BEFORE
     )
-    
-    # If delivered, update deliveredAt
-    if status_update.status == "delivered":
-        await db.orders.update_one(
-            {"orderId": order_id},
-            {"$set": {"deliveredAt": datetime.utcnow()}}
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sipariş bulunamadı"
         )
     
+    await invalidate_tracking(order["trackingCode"])
+    await record_status_change(order["status"], status_update.status)
+    
     # Create notification
-    await db.notifications.insert_one({
+    notification = {
         "userId": order["userId"],
         "type": "info" if status_update.status != "delivered" else "success",
         "title": status_text,
         "message": f"{order_id} numaralı gönderiniz: {status_text}",
         "read": False,
         "createdAt": datetime.utcnow()
-    })
+    }
+    await db.notifications.insert_one(notification)
+    
+    # Push to open tracking pages and the merchant instead of waiting for a poll
+    background_tasks.add_task(_push_status_update, order, order_id, update_data, timeline_event, notification)
     
     return {"success": True, "message": "Durum güncellendi"}
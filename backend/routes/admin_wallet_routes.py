@@ -1,11 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 from models import DepositRequestApprove, ManualBalanceAdjustment, Transaction
 from auth import get_current_admin
-from database import db
-import uuid
+from database import db, read_db, run_in_transaction
+from wallet_ledger import LedgerNotMigrated, apply_balance_change, reconcile_balances, record_opening_balances
+from pagination import paginate
 
 router = APIRouter(prefix="/api/admin/wallet", tags=["admin-wallet"])
 
@@ -15,25 +16,16 @@ async def get_all_deposit_requests(
     status_filter: str = "pending",  # 'pending', 'approved', 'rejected', 'all'
     page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: dict = Depends(get_current_admin)
 ):
-    skip = (page - 1) * limit
-    
     query = {} if status_filter == "all" else {"status": status_filter}
     
-    requests_cursor = db.deposit_requests.find(query).sort("createdAt", -1).skip(skip).limit(limit)
-    requests = await requests_cursor.to_list(length=limit)
-    total = await db.deposit_requests.count_documents(query)
-    
-    for req in requests:
-        req["_id"] = str(req["_id"])
-    
-    return {
-        "requests": requests,
-        "total": total,
-        "page": page,
-        "totalPages": (total + limit - 1) // limit
-    }
+    return await paginate(
+        read_db("admin").deposit_requests, query, limit, key="requests",
+        cursor=cursor, page=page, include_total=include_total
+    )
 
 # Approve deposit request
 @router.post("/approve-deposit/{request_id}", response_model=dict)
@@ -57,48 +49,50 @@ async def approve_deposit_request(
         )
     
     # Get user
-    user = await db.users.find_one({"_id": ObjectId(deposit_request["userId"])})
+    user = await db.users.find_one({"_id": ObjectId(deposit_request["userId"])}, {"_id": 1})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Kullanıcı bulunamadı"
         )
     
-    old_balance = user.get("balance", 0.0)
-    new_balance = old_balance + deposit_request["amount"]
-    
-    # Update user balance
-    await db.users.update_one(
-        {"_id": ObjectId(deposit_request["userId"])},
-        {"$set": {"balance": new_balance}}
-    )
-    
-    # Create transaction record
-    transaction = {
-        "_id": str(uuid.uuid4()),
-        "userId": deposit_request["userId"],
-        "type": "deposit",
-        "amount": deposit_request["amount"],
-        "balanceBefore": old_balance,
-        "balanceAfter": new_balance,
-        "description": f"Ödeme bildirimi onaylandı - {deposit_request['description']}",
-        "depositRequestId": request_id,
-        "createdAt": datetime.utcnow()
-    }
-    await db.transactions.insert_one(transaction)
+    async def approve(session):
+        # Claim the request first so concurrent approvals credit only once
+        claimed = await db.deposit_requests.find_one_and_update(
+            {"_id": request_id, "status": "pending"},
+            {
+                "$set": {
+                    "status": "approved",
+                    "adminNote": approval.adminNote,
+                    "approvedBy": current_user["userId"],
+                    "updatedAt": datetime.utcnow()
+                }
+            },
+            session=session
+        )
+        if not claimed:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Bu bildirim zaten işleme alınmış"
+            )
+        
+        transaction = await apply_balance_change(
+            deposit_request["userId"],
+            deposit_request["amount"],
+            "deposit",
+            f"Ödeme bildirimi onaylandı - {deposit_request['description']}",
+            session=session,
+            depositRequestId=request_id
+        )
+        if not transaction:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Kullanıcı bulunamadı"
+            )
+        return transaction
     
-    # Update deposit request
-    await db.deposit_requests.update_one(
-        {"_id": request_id},
-        {
-            "$set": {
-                "status": "approved",
-                "adminNote": approval.adminNote,
-                "approvedBy": current_user["userId"],
-                "updatedAt": datetime.utcnow()
-            }
-        }
-    )
+    transaction = await run_in_transaction(approve)
+    new_balance = transaction["balanceAfter"]
     
     # TODO: Send email notification to user
     # send_email(user["email"], "Ödeme Onayı", f"{deposit_request['amount']} TL bakiyenize yüklendi")
@@ -155,40 +149,28 @@ async def manual_balance_adjustment(
     current_user: dict = Depends(get_current_admin)
 ):
     # Get user
-    user = await db.users.find_one({"_id": ObjectId(adjustment.userId)})
+    user = await db.users.find_one({"_id": ObjectId(adjustment.userId)}, {"_id": 1})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Kullanıcı bulunamadı"
         )
     
-    old_balance = user.get("balance", 0.0)
-    new_balance = old_balance + adjustment.amount
-    
-    if new_balance < 0:
+    # Guarded in the update filter so concurrent adjustments cannot go negative
+    transaction = await apply_balance_change(
+        adjustment.userId,
+        adjustment.amount,
+        "admin_adjustment",
+        f"Admin düzeltmesi: {adjustment.description}",
+        min_balance_after=0.0
+    )
+    if not transaction:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Bakiye negatif olamaz"
         )
-    
-    # Update user balance
-    await db.users.update_one(
-        {"_id": ObjectId(adjustment.userId)},
-        {"$set": {"balance": new_balance}}
-    )
-    
-    # Create transaction record
-    transaction = {
-        "_id": str(uuid.uuid4()),
-        "userId": adjustment.userId,
-        "type": "admin_adjustment",
-        "amount": adjustment.amount,
-        "balanceBefore": old_balance,
-        "balanceAfter": new_balance,
-        "description": f"Admin düzeltmesi: {adjustment.description}",
-        "createdAt": datetime.utcnow()
-    }
-    await db.transactions.insert_one(transaction)
+    old_balance = transaction["balanceBefore"]
+    new_balance = transaction["balanceAfter"]
     
     return {
         "success": True,
@@ -203,28 +185,20 @@ async def get_user_transactions(
     user_id: str,
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: dict = Depends(get_current_admin)
 ):
-    skip = (page - 1) * limit
-    
-    transactions_cursor = db.transactions.find(
-        {"userId": user_id}
-    ).sort("createdAt", -1).skip(skip).limit(limit)
-    
-    transactions = await transactions_cursor.to_list(length=limit)
-    total = await db.transactions.count_documents({"userId": user_id})
-    
-    for transaction in transactions:
-        transaction["_id"] = str(transaction["_id"])
+    result = await paginate(
+        read_db("admin").transactions, {"userId": user_id}, limit, key="transactions",
+        cursor=cursor, page=page, include_total=include_total
+    )
     
     # Get user info
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     
     return {
-        "transactions": transactions,
-        "total": total,
-        "page": page,
-        "totalPages": (total + limit - 1) // limit,
+        **result,
         "user": {
             "id": user_id,
             "name": user.get("name", "") if user else "",
@@ -232,3 +206,35 @@ async def get_user_transactions(
             "balance": user.get("balance", 0.0) if user else 0.0
         }
     }
+
+# Recompute balances from the transaction ledger
+@router.post("/reconcile", response_model=dict)
+async def reconcile_wallets(
+    fix: bool = False,
+    current_user: dict = Depends(get_current_admin)
+):
+    try:
+        mismatches = await reconcile_balances(fix=fix)
+    except LedgerNotMigrated:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Açılış bakiyeleri henüz deftere aktarılmadı; önce geçişi çalıştırın"
+        )
+    
+    return {
+        "success": True,
+        "fixed": fix,
+        "mismatches": mismatches
+    }
+
+# One-off: move balances credited before the ledger existed into it
+@router.post("/opening-balances", response_model=dict)
+async def migrate_opening_balances(
+    current_user: dict = Depends(get_current_admin)
+):
+    written = await record_opening_balances()
+    
+    return {
+        "success": True,
+        "entries": written
+    }
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import UserCreate, UserLogin, User, Token
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
-from datetime import timedelta
+from bson import ObjectId
+from models import UserCreate, UserLogin, User, Token, RefreshRequest
+from auth import get_password_hash_async, verify_password_async, get_current_user
+from datetime import datetime, timedelta
 import os
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 # Database dependency
 from database import db
+from stats_cache import record_user_registered
+from refresh_tokens import RefreshError, issue_session, revoke_refresh_family, rotate_refresh_token
 
 @router.post("/register", response_model=dict)
 async def register(user_data: UserCreate):
@@ -21,7 +24,7 @@ async def register(user_data: UserCreate):
         )
     
     # Hash password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     # Create user document
     user_dict = user_data.model_dump()
@@ -29,15 +32,15 @@ async def register(user_data: UserCreate):
     user_dict["role"] = "user"
     user_dict["balance"] = 0.0
     user_dict["totalShipments"] = 0
+    user_dict["createdAt"] = datetime.utcnow()
     
     # Insert user
     result = await db.users.insert_one(user_dict)
     user_dict["_id"] = str(result.inserted_id)
+    await record_user_registered()
     
-    # Create token
-    access_token = create_access_token(
-        data={"sub": user_data.email, "userId": str(result.inserted_id), "role": "user"}
-    )
+    # Create access and refresh tokens
+    session = await issue_session(str(result.inserted_id), "user")
     
     # Remove password from response
     user_dict.pop("password")
@@ -45,7 +48,7 @@ async def register(user_data: UserCreate):
     return {
         "success": True,
         "user": user_dict,
-        "token": access_token
+        **session
     }
 
 @router.post("/login", response_model=dict)
@@ -59,16 +62,14 @@ async def login(credentials: UserLogin):
         )
     
     # Verify password
-    if not verify_password(credentials.password, user["password"]):
+    if not await verify_password_async(credentials.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Geçersiz email veya şifre"
         )
     
-    # Create token
-    access_token = create_access_token(
-        data={"sub": user["email"], "userId": str(user["_id"]), "role": user.get("role", "user")}
-    )
+    # Create access and refresh tokens
+    session = await issue_session(str(user["_id"]), user.get("role", "user"), user.get("tokenVersion", 0))
     
     # Remove password from response
     user.pop("password")
@@ -77,12 +78,28 @@ async def login(credentials: UserLogin):
     return {
         "success": True,
         "user": user,
-        "token": access_token
+        **session
     }
 
+@router.post("/refresh", response_model=dict)
+async def refresh(request: RefreshRequest):
+    try:
+        session = await rotate_refresh_token(request.refreshToken)
+    except RefreshError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        )
+    return {"success": True, **session}
+
+@router.post("/logout", response_model=dict)
+async def logout(request: RefreshRequest):
+    await revoke_refresh_family(request.refreshToken)
+    return {"success": True}
+
 @router.get("/me", response_model=dict)
 async def get_me(current_user: dict = Depends(get_current_user)):
-    user = await db.users.find_one({"email": current_user["email"]})
+    user = await db.users.find_one({"_id": ObjectId(current_user["userId"])})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
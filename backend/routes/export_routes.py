@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+from auth import get_current_user
+from exports import build_export_query, stream_export
+
+router = APIRouter(prefix="/api/exports", tags=["exports"])
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson"
+}
+
+def _export_response(kind: str, query: dict, fmt: str) -> StreamingResponse:
+    filename = f"{kind}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    return StreamingResponse(
+        stream_export(kind, query, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _scoped_user(current_user: dict, user_id: Optional[str]) -> Optional[str]:
+    # Merchants can only export their own data; admins may filter by user
+    if current_user.get("role") == "admin":
+        return user_id
+    return current_user["userId"]
+
+@router.get("/orders")
+async def export_orders(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = build_export_query(start, end, status, _scoped_user(current_user, user_id))
+    return _export_response("orders", query, format)
+
+@router.get("/transactions")
+async def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = build_export_query(start, end, None, _scoped_user(current_user, user_id))
+    if type:
+        query["type"] = type
+    return _export_response("transactions", query, format)
+
+@router.get("/deposit-requests")
+async def export_deposit_requests(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    query = build_export_query(start, end, status, _scoped_user(current_user, user_id))
+    return _export_response("deposit-requests", query, format)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
-from typing import List
+from typing import List, Optional
 from bson import ObjectId
 from auth import get_current_admin
 from datetime import datetime
@@ -10,6 +10,7 @@ from pathlib import Path
 router = APIRouter(prefix="/api/media", tags=["media"])
 
 from database import db
+from pagination import paginate
 
 # Upload multiple images
 @router.post("/upload", response_model=dict)
@@ -65,24 +66,14 @@ async def upload_media(
 async def get_media(
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: dict = Depends(get_current_admin)
 ):
-    skip = (page - 1) * limit
-    
-    media_cursor = db.media.find().sort("createdAt", -1).skip(skip).limit(limit)
-    media_files = await media_cursor.to_list(length=limit)
-    
-    total = await db.media.count_documents({})
-    
-    for media in media_files:
-        media["_id"] = str(media["_id"])
-    
-    return {
-        "media": media_files,
-        "total": total,
-        "page": page,
-        "totalPages": (total + limit - 1) // limit
-    }
+    return await paginate(
+        db.media, {}, limit, key="media",
+        cursor=cursor, page=page, include_total=include_total
+    )
 
 # Delete media
 @router.delete("/{media_id}", response_model=dict)
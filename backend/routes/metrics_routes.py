@@ -0,0 +1,24 @@
+import hmac
+import os
+from fastapi import APIRouter, Depends, Response
+from fastapi.security import HTTPAuthorizationCredentials
+from auth import security, get_current_admin, get_current_user
+from database import pool_metrics
+from request_metrics import render_prometheus
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+# Static bearer token for Prometheus; admin access tokens are too short-lived to scrape with
+METRICS_SCRAPE_TOKEN = os.getenv("METRICS_SCRAPE_TOKEN", "")
+
+async def get_metrics_reader(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    if METRICS_SCRAPE_TOKEN and hmac.compare_digest(credentials.credentials, METRICS_SCRAPE_TOKEN):
+        return {"role": "scraper"}
+    return await get_current_admin(await get_current_user(credentials))
+
+@router.get("")
+async def get_metrics(reader: dict = Depends(get_metrics_reader)):
+    return Response(
+        content=render_prometheus(pool_metrics.snapshot()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
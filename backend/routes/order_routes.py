@@ -1,217 +1,243 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, BackgroundTasks, Request, Response, UploadFile, File
+from typing import List, Optional
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from models import OrderCreate, Order, TimelineEvent, Recipient, Location
 from auth import get_current_user
-from utils import generate_order_id, generate_tracking_code, get_status_text, get_default_location
+from utils import build_order_document
 from datetime import datetime
+import asyncio
+import logging
+import uuid
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
+logger = logging.getLogger(__name__)
 
-from database import db
+from database import db, run_in_transaction
+from wallet_ledger import apply_balance_change
+from stats_cache import record_order_created
+from pagination import paginate
+from tracking_cache import get_tracking
+from bulk_orders import GENERATED_CODES, INSERT_ATTEMPTS, create_bulk_orders, orders_to_frame, read_order_file
+from socket_manager import push_notification
+from pricing import get_pricing_engine
+from routes.wallet_routes import MINIMUM_BALANCE
+
+
+async def _record_order_side_effects(user_id: str, order_id: str, tracking_code: str, order_data: OrderCreate):
+    """Notification and saved recipient upsert, run after the response is sent"""
+    now = datetime.utcnow()
+    notification = {
+        "userId": user_id,
+        "type": "success",
+        "title": "Yeni Gönderi Oluşturuldu",
+        "message": f"{order_id} numaralı gönderiniz oluşturuldu. Takip kodu: {tracking_code}",
+        "read": False,
+        "createdAt": now
+    }
+    try:
+        await asyncio.gather(
+            db.notifications.insert_one(notification),
+            # Save recipient for future autocomplete
+            db.saved_recipients.update_one(
+                {
+                    "userId": user_id,
+                    "name": order_data.recipientName,
+                    "phone": order_data.recipientPhone
+                },
+                {
+                    "$set": {
+                        "city": order_data.recipientCity,
+                        "district": order_data.recipientDistrict,
+                        "address": order_data.recipientAddress,
+                        "lastUsedAt": now
+                    },
+                    "$inc": {"usageCount": 1},
+                    "$setOnInsert": {"_id": str(uuid.uuid4()), "createdAt": now}
+                },
+                upsert=True
+            )
+        )
+        await push_notification(notification)
+    except Exception:
+        logger.exception(f"Side effects failed for order {order_id}")
+
+async def _persist_order(order_dict: dict, price: float, prepaid: bool, session=None) -> Optional[dict]:
+    """
+    Order insert, then the debit and its transaction record. Returns the
+    transaction record, or raises if the minimum balance guard rejects the
+    debit. Without a transaction the order is deleted again when the debit fails.
+    """
+    user_id = order_dict["userId"]
+    transaction = None
+    
+    await db.orders.insert_one(order_dict, session=session)
+    try:
+        if prepaid:
+            transaction = await apply_balance_change(
+                user_id,
+                -price,
+                "payment",
+                f"Kargo gönderimi - {order_dict['shippingCompany']} - {order_dict['orderId']}",
+                min_balance_after=MINIMUM_BALANCE,
+                inc={"totalShipments": 1},
+                session=session,
+                orderId=order_dict["orderId"]
+            )
+            if not transaction:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"İşlem sonrası bakiyeniz {MINIMUM_BALANCE} TL'nin altına düşemez. Lütfen bakiye yükleyin."
+                )
+        else:
+            await db.users.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$inc": {"totalShipments": 1}},
+                session=session
+            )
+    except Exception:
+        if session is None:
+            await db.orders.delete_one({"_id": order_dict["_id"]})
+        raise
+    return transaction
+
+async def _create_order_records(order_dict: dict, price: float, prepaid: bool) -> Optional[dict]:
+    """_persist_order with fresh codes when orderId or trackingCode is already taken"""
+    for attempt in range(INSERT_ATTEMPTS):
+        try:
+            return await run_in_transaction(
+                lambda session: _persist_order(order_dict, price, prepaid, session=session)
+            )
+        except DuplicateKeyError:
+            # The insert failed first, so nothing else was written
+            if attempt == INSERT_ATTEMPTS - 1:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Sipariş numarası üretilemedi, lütfen tekrar deneyin"
+                )
+            for field, generate in GENERATED_CODES.items():
+                order_dict[field] = generate()
 
 @router.post("", response_model=dict)
-async def create_order(order_data: OrderCreate, current_user: dict = Depends(get_current_user)):
-    # Get shipping company
-    shipping_company = await db.shipping_companies.find_one({"_id": ObjectId(order_data.shippingCompanyId)})
+async def create_order(
+    order_data: OrderCreate,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    # The carrier comes from the in-memory catalogue; only the balance is read
+    pricing = await get_pricing_engine()
+    shipping_company = pricing.catalogue.get(order_data.shippingCompanyId)
     if not shipping_company:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Kargo firması bulunamadı"
         )
     
-    # Get user
-    user = await db.users.find_one({"_id": ObjectId(current_user["userId"])})
+    user = await db.users.find_one({"_id": ObjectId(current_user["userId"])}, {"balance": 1})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Kullanıcı bulunamadı"
         )
     
-    # Check balance for prepaid orders
-    MINIMUM_BALANCE = 100.0
-    if order_data.paymentType == "prepaid":
+    # Fail fast on an obviously insufficient balance; the debit itself is guarded again
+    prepaid = order_data.paymentType == "prepaid"
+    price = pricing.price_one(
+        order_data.shippingCompanyId,
+        order_data.weight,
+        order_data.desi,
+        order_data.recipientCity,
+        order_data.codAmount if order_data.paymentType == "cod" else None
+    )
+    if prepaid:
         current_balance = user.get("balance", 0)
-        if current_balance < shipping_company["price"]:
+        if current_balance < price:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Yetersiz bakiye"
             )
         
-        # Check if balance will fall below minimum after payment
-        balance_after = current_balance - shipping_company["price"]
-        if balance_after < MINIMUM_BALANCE:
+        if current_balance - price < MINIMUM_BALANCE:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"İşlem sonrası bakiyeniz {MINIMUM_BALANCE} TL'nin altına düşemez. Lütfen bakiye yükleyin."
             )
     
-    # Generate order ID and tracking code
-    order_id = generate_order_id()
-    tracking_code = generate_tracking_code()
-    
-    # Get location coordinates
-    location_coords = get_default_location(order_data.recipientCity)
-    
     # Create order document
-    order_dict = {
-        "orderId": order_id,
-        "userId": current_user["userId"],
-        "trackingCode": tracking_code,
-        "recipient": {
-            "name": order_data.recipientName,
-            "phone": order_data.recipientPhone,
-            "city": order_data.recipientCity,
-            "district": order_data.recipientDistrict,
-            "address": order_data.recipientAddress
-        },
-        "shippingCompanyId": order_data.shippingCompanyId,
-        "shippingCompany": shipping_company["name"],
-        "status": "created",
-        "statusText": "Sipariş Oluşturuldu",
-        "weight": order_data.weight,
-        "desi": order_data.desi,
-        "price": shipping_company["price"],
-        "paymentType": order_data.paymentType,
-        "codAmount": order_data.codAmount,
-        "description": order_data.description,
-        "currentLocation": {
-            "lat": location_coords["lat"],
-            "lng": location_coords["lng"],
-            "city": order_data.recipientCity,
-            "district": order_data.recipientDistrict
-        },
-        "timeline": [
-            {
-                "date": datetime.utcnow(),
-                "status": "created",
-                "description": "Sipariş oluşturuldu"
-            }
-        ],
-        "createdAt": datetime.utcnow(),
-        "updatedAt": datetime.utcnow()
-    }
+    order_dict = build_order_document(
+        order_data.model_dump(), shipping_company, current_user["userId"], datetime.utcnow(), price=price
+    )
     
-    # Insert order
-    result = await db.orders.insert_one(order_dict)
-    order_dict["_id"] = str(result.inserted_id)
+    # Order, debit and transaction commit together
+    order_dict["_id"] = ObjectId()
+    await _create_order_records(order_dict, price, prepaid)
+    order_dict["_id"] = str(order_dict["_id"])
+    order_id = order_dict["orderId"]
+    tracking_code = order_dict["trackingCode"]
     
-    # Update user balance and shipment count
-    if order_data.paymentType == "prepaid":
-        old_balance = user.get("balance", 0.0)
-        new_balance = old_balance - shipping_company["price"]
-        
-        await db.users.update_one(
-            {"_id": ObjectId(current_user["userId"])},
-            {
-                "$set": {"balance": new_balance},
-                "$inc": {"totalShipments": 1}
-            }
-        )
-        
-        # Create transaction record
-        import uuid
-        transaction = {
-            "_id": str(uuid.uuid4()),
-            "userId": current_user["userId"],
-            "type": "payment",
-            "amount": -shipping_company["price"],
-            "balanceBefore": old_balance,
-            "balanceAfter": new_balance,
-            "description": f"Kargo gönderimi - {shipping_company['name']} - {order_id}",
-            "orderId": order_id,
-            "createdAt": datetime.utcnow()
-        }
-        await db.transactions.insert_one(transaction)
-    else:
-        await db.users.update_one(
-            {"_id": ObjectId(current_user["userId"])},
-            {"$inc": {"totalShipments": 1}}
-        )
+    # Before the response: a recount between the insert and a late $inc
+    # would count this order twice
+    try:
+        await record_order_created(price, prepaid)
+    except Exception:
+        logger.exception(f"Stats update failed for order {order_id}")
     
-    # Create notification
-    await db.notifications.insert_one({
-        "userId": current_user["userId"],
-        "type": "success",
-        "title": "Yeni Gönderi Oluşturuldu",
-        "message": f"{order_id} numaralı gönderiniz oluşturuldu. Takip kodu: {tracking_code}",
-        "read": False,
-        "createdAt": datetime.utcnow()
-    })
-    
-    # Save recipient for future autocomplete
-    existing_recipient = await db.saved_recipients.find_one({
-        "userId": current_user["userId"],
-        "name": order_data.recipientName,
-        "phone": order_data.recipientPhone
-    })
-    
-    if existing_recipient:
-        # Update existing recipient
-        await db.saved_recipients.update_one(
-            {"_id": existing_recipient["_id"]},
-            {
-                "$set": {
-                    "city": order_data.recipientCity,
-                    "district": order_data.recipientDistrict,
-                    "address": order_data.recipientAddress,
-                    "lastUsedAt": datetime.utcnow()
-                },
-                "$inc": {"usageCount": 1}
-            }
-        )
-    else:
-        # Create new recipient
-        import uuid
-        await db.saved_recipients.insert_one({
-            "_id": str(uuid.uuid4()),
-            "userId": current_user["userId"],
-            "name": order_data.recipientName,
-            "phone": order_data.recipientPhone,
-            "city": order_data.recipientCity,
-            "district": order_data.recipientDistrict,
-            "address": order_data.recipientAddress,
-            "usageCount": 1,
-            "lastUsedAt": datetime.utcnow(),
-            "createdAt": datetime.utcnow()
-        })
+    background_tasks.add_task(
+        _record_order_side_effects, current_user["userId"], order_id, tracking_code, order_data
+    )
     
     return {
         "success": True,
         "order": order_dict
     }
 
+@router.post("/bulk", response_model=dict)
+async def create_orders_bulk(
+    orders: List[OrderCreate],
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    if not orders:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Gönderi listesi boş"
+        )
+    
+    return await create_bulk_orders(orders_to_frame(orders), current_user["userId"], background_tasks)
+
+@router.post("/bulk/upload", response_model=dict)
+async def upload_orders_bulk(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    df = read_order_file(await file.read(), file.filename)
+    if df.empty:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Dosyada gönderi bulunamadı"
+        )
+    
+    return await create_bulk_orders(df, current_user["userId"], background_tasks)
+
 @router.get("", response_model=dict)
 async def get_orders(
     current_user: dict = Depends(get_current_user),
     status: Optional[str] = None,
     page: int = Query(1, ge=1),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
-    skip = (page - 1) * limit
-    
     # Build query
     query = {"userId": current_user["userId"]}
     if status:
         query["status"] = status
     
-    # Get orders
-    orders_cursor = db.orders.find(query).sort("createdAt", -1).skip(skip).limit(limit)
-    orders = await orders_cursor.to_list(length=limit)
-    
-    # Get total count
-    total = await db.orders.count_documents(query)
-    
-    # Convert ObjectId to string
-    for order in orders:
-        order["_id"] = str(order["_id"])
-    
-    return {
-        "orders": orders,
-        "total": total,
-        "page": page,
-        "totalPages": (total + limit - 1) // limit
-    }
+    return await paginate(
+        db.orders, query, limit, key="orders",
+        cursor=cursor, page=page, include_total=include_total
+    )
 
 @router.get("/{order_id}", response_model=dict)
 async def get_order(order_id: str, current_user: dict = Depends(get_current_user)):
@@ -235,15 +261,27 @@ async def get_order(order_id: str, current_user: dict = Depends(get_current_user
     return {"order": order}
 
 @router.get("/tracking/{tracking_code}", response_model=dict)
-async def track_order(tracking_code: str):
-    order = await db.orders.find_one({"trackingCode": tracking_code})
+async def track_order(tracking_code: str, request: Request):
+    entry = await get_tracking(tracking_code)
     
-    if not order:
+    if not entry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Gönderi bulunamadı"
         )
     
-    order["_id"] = str(order["_id"])
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": entry.last_modified,
+        "Cache-Control": "no-cache"
+    }
     
-    return {"order": order}
+    # Conditional requests: If-None-Match wins over If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if entry.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    elif request.headers.get("if-modified-since") == entry.last_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -3,15 +3,14 @@ from typing import List
 from datetime import datetime
 from bson import ObjectId
 import uuid
-from passlib.context import CryptContext
 from models import ProfileUpdateRequestCreate, ProfileUpdateReview, PasswordChangeRequest
-from auth import get_current_user, get_current_admin
+from auth import get_current_user, get_current_admin, get_password_hash_async, verify_password_async
+from session_versions import revoke_user_sessions
+from refresh_tokens import issue_session
 from database import db
 
 router = APIRouter(prefix="/api/profile", tags=["profile"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 @router.post("/change-password")
 async def change_password(
     request: PasswordChangeRequest,
@@ -30,14 +29,14 @@ async def change_password(
             )
         
         # Verify current password
-        if not pwd_context.verify(request.currentPassword, user["password"]):
+        if not await verify_password_async(request.currentPassword, user["password"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Mevcut şifre yanlış"
             )
         
         # Hash new password
-        hashed_password = pwd_context.hash(request.newPassword)
+        hashed_password = await get_password_hash_async(request.newPassword)
         
         # Update password
         await db.users.update_one(
@@ -45,7 +44,11 @@ async def change_password(
             {"$set": {"password": hashed_password}}
         )
         
-        return {"message": "Şifre başarıyla değiştirildi"}
+        # Sign out every other device; this one gets a fresh token
+        version = await revoke_user_sessions(current_user["userId"], "password_change")
+        session = await issue_session(current_user["userId"], user.get("role", "user"), version)
+        
+        return {"message": "Şifre başarıyla değiştirildi", **session}
     
     except HTTPException:
         raise
@@ -201,6 +204,11 @@ async def approve_update_request(
             {"$set": update_field}
         )
         
+        # Tokens carry the userId, so they stay valid; signing out everywhere
+        # after an email change is a policy choice
+        if update_request["updateType"] == "email":
+            await revoke_user_sessions(update_request["userId"], "email_change")
+        
         # Update request status
         await db.profile_update_requests.update_one(
             {"_id": request_id},
@@ -0,0 +1,65 @@
+import os
+import time
+from typing import Dict, Tuple
+from fastapi import APIRouter, HTTPException, status, Depends
+from models import QuoteRequest
+from auth import get_current_user
+from pricing import get_pricing_engine
+
+router = APIRouter(prefix="/api/quotes", tags=["quotes"])
+
+MAX_QUOTE_PARCELS = int(os.getenv("MAX_QUOTE_PARCELS", "5000"))
+# Parcels each user may price per window, across requests (per worker)
+QUOTE_PARCELS_PER_WINDOW = int(os.getenv("QUOTE_PARCELS_PER_WINDOW", "20000"))
+QUOTE_RATE_WINDOW_SECONDS = int(os.getenv("QUOTE_RATE_WINDOW_SECONDS", "60"))
+
+# userId -> (window start, parcels priced in it)
+_quote_usage: Dict[str, Tuple[float, int]] = {}
+
+def _consume_quota(user_id: str, parcels: int) -> int:
+    """Charge `parcels` to the user's window; seconds to wait if over budget, else 0"""
+    now = time.monotonic()
+    if len(_quote_usage) > 10000:
+        for key, (start, _) in list(_quote_usage.items()):
+            if now - start >= QUOTE_RATE_WINDOW_SECONDS:
+                del _quote_usage[key]
+    
+    start, used = _quote_usage.get(user_id, (now, 0))
+    if now - start >= QUOTE_RATE_WINDOW_SECONDS:
+        start, used = now, 0
+    if used + parcels > QUOTE_PARCELS_PER_WINDOW:
+        return max(1, int(start + QUOTE_RATE_WINDOW_SECONDS - now + 0.999))
+    _quote_usage[user_id] = (start, used + parcels)
+    return 0
+
+@router.post("", response_model=dict)
+async def quote_parcels(
+    request: QuoteRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    if not request.parcels:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="En az bir gönderi gerekli"
+        )
+    if len(request.parcels) > MAX_QUOTE_PARCELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tek seferde en fazla {MAX_QUOTE_PARCELS} gönderi fiyatlandırılabilir"
+        )
+    retry_after = _consume_quota(current_user["userId"], len(request.parcels))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Çok fazla fiyat sorgusu yapıldı, lütfen biraz sonra tekrar deneyin",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
+    # Every parcel against every active carrier in one vectorized pass
+    pricing = await get_pricing_engine()
+    quotes = pricing.cheapest(
+        [parcel.model_dump() for parcel in request.parcels],
+        request.originCity,
+        request.includeAll
+    )
+    return {"quotes": quotes}
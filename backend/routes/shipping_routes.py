@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from bson import ObjectId
 from models import ShippingCompanyCreate, ShippingCompanyUpdate
 from auth import get_current_admin
@@ -7,21 +7,23 @@ from datetime import datetime
 router = APIRouter(prefix="/api/shipping-companies", tags=["shipping-companies"])
 
 from database import db
+from shipping_catalogue import get_company, invalidate_catalogue, list_body
 
 @router.get("", response_model=dict)
-async def get_shipping_companies(include_inactive: bool = False):
-    query = {} if include_inactive else {"isActive": True}
-    companies_cursor = db.shipping_companies.find(query)
-    companies = await companies_cursor.to_list(length=100)
+async def get_shipping_companies(request: Request, include_inactive: bool = False):
+    # Served from the in-memory catalogue
+    body, etag = await list_body(include_inactive)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
     
-    for company in companies:
-        company["_id"] = str(company["_id"])
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    return {"companies": companies}
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/{company_id}", response_model=dict)
 async def get_shipping_company(company_id: str):
-    company = await db.shipping_companies.find_one({"_id": ObjectId(company_id)})
+    company = await get_company(company_id)
     
     if not company:
         raise HTTPException(
@@ -29,7 +31,6 @@ async def get_shipping_company(company_id: str):
             detail="Kargo firması bulunamadı"
         )
     
-    company["_id"] = str(company["_id"])
     return {"company": company}
 
 @router.post("", response_model=dict)
@@ -43,6 +44,7 @@ async def create_shipping_company(
     
     result = await db.shipping_companies.insert_one(company_dict)
     company_dict["_id"] = str(result.inserted_id)
+    await invalidate_catalogue()
     
     return {
         "success": True,
@@ -74,8 +76,8 @@ async def update_shipping_company(
             detail="Kargo firması bulunamadı"
         )
     
-    company = await db.shipping_companies.find_one({"_id": ObjectId(company_id)})
-    company["_id"] = str(company["_id"])
+    await invalidate_catalogue()
+    company = await get_company(company_id)
     
     return {
         "success": True,
@@ -94,5 +96,6 @@ async def delete_shipping_company(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Kargo firması bulunamadı"
         )
+    await invalidate_catalogue()
     
     return {"success": True, "message": "Kargo firması silindi"}
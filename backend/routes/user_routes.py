@@ -6,6 +6,7 @@ from auth import get_current_user
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 from database import db
+from wallet_ledger import apply_balance_change
 
 @router.get("/{user_id}", response_model=dict)
 async def get_user(user_id: str, current_user: dict = Depends(get_current_user)):
@@ -40,22 +41,21 @@ async def update_balance(
             detail="Yetkiniz yok"
         )
     
-    # Update balance
-    result = await db.users.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$inc": {"balance": balance_update.amount}}
+    # Update balance through the ledger so the change is recorded
+    transaction = await apply_balance_change(
+        user_id,
+        balance_update.amount,
+        "deposit" if balance_update.amount >= 0 else "payment",
+        "Bakiye güncellemesi"
     )
     
-    if result.modified_count == 0:
+    if not transaction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Kullanıcı bulunamadı"
         )
     
-    # Get updated user
-    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"balance": 1})
-    
     return {
         "success": True,
-        "balance": user["balance"]
+        "balance": transaction["balanceAfter"]
     }
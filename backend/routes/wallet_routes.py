@@ -1,10 +1,11 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 from models import DepositRequestCreate, DepositRequest, Transaction
 from auth import get_current_user
 from database import db
+from pagination import paginate
 import uuid
 
 router = APIRouter(prefix="/api/wallet", tags=["wallet"])
@@ -32,26 +33,14 @@ async def get_balance(current_user: dict = Depends(get_current_user)):
 async def get_transactions(
     page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: dict = Depends(get_current_user)
 ):
-    skip = (page - 1) * limit
-    
-    transactions_cursor = db.transactions.find(
-        {"userId": current_user["userId"]}
-    ).sort("createdAt", -1).skip(skip).limit(limit)
-    
-    transactions = await transactions_cursor.to_list(length=limit)
-    total = await db.transactions.count_documents({"userId": current_user["userId"]})
-    
-    for transaction in transactions:
-        transaction["_id"] = str(transaction["_id"])
-    
-    return {
-        "transactions": transactions,
-        "total": total,
-        "page": page,
-        "totalPages": (total + limit - 1) // limit
-    }
+    return await paginate(
+        db.transactions, {"userId": current_user["userId"]}, limit, key="transactions",
+        cursor=cursor, page=page, include_total=include_total
+    )
 
 # Create deposit request
 @router.post("/deposit-request", response_model=dict)
@@ -104,23 +93,11 @@ async def create_deposit_request(
 async def get_deposit_requests(
     page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: dict = Depends(get_current_user)
 ):
-    skip = (page - 1) * limit
-    
-    requests_cursor = db.deposit_requests.find(
-        {"userId": current_user["userId"]}
-    ).sort("createdAt", -1).skip(skip).limit(limit)
-    
-    requests = await requests_cursor.to_list(length=limit)
-    total = await db.deposit_requests.count_documents({"userId": current_user["userId"]})
-    
-    for req in requests:
-        req["_id"] = str(req["_id"])
-    
-    return {
-        "requests": requests,
-        "total": total,
-        "page": page,
-        "totalPages": (total + limit - 1) // limit
-    }
+    return await paginate(
+        db.deposit_requests, {"userId": current_user["userId"]}, limit, key="requests",
+        cursor=cursor, page=page, include_total=include_total
+    )
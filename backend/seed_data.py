@@ -4,8 +4,10 @@ Seed data script to initialize the database with shipping companies and admin us
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from auth import get_password_hash
+from indexes import ensure_indexes
 from datetime import datetime
 import os
+import uuid
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -75,6 +77,8 @@ async def seed_database():
             }
         ]
         await db.shipping_companies.insert_many(shipping_companies)
+        # Running servers reload their catalogue cache
+        await db.catalogue_versions.update_one({"_id": "shipping_companies"}, {"$inc": {"version": 1}}, upsert=True)
         print(f"✅ Added {len(shipping_companies)} shipping companies")
     else:
         print(f"ℹ️  Shipping companies already exist ({existing_companies} found)")
@@ -138,18 +142,25 @@ async def seed_database():
                 "totalShipments": 0,
                 "createdAt": datetime.utcnow()
             }
-            await db.users.insert_one(user_data)
+            result = await db.users.insert_one(user_data)
+            # Opening balance goes through the ledger so reconciliation matches
+            await db.transactions.insert_one({
+                "_id": str(uuid.uuid4()),
+                "userId": str(result.inserted_id),
+                "type": "deposit",
+                "amount": user_data["balance"],
+                "balanceBefore": 0.0,
+                "balanceAfter": user_data["balance"],
+                "description": "Açılış bakiyesi",
+                "createdAt": datetime.utcnow()
+            })
             print(f"✅ Demo user created: {demo_user['email']} (password: demo123)")
         else:
             print(f"ℹ️  Demo user already exists: {demo_user['email']}")
     
     # Create indexes
     print("📑 Creating indexes...")
-    await db.users.create_index("email", unique=True)
-    await db.orders.create_index("orderId", unique=True)
-    await db.orders.create_index("trackingCode", unique=True)
-    await db.orders.create_index("userId")
-    await db.notifications.create_index("userId")
+    await ensure_indexes(db)
     print("✅ Indexes created")
     
     print("🎉 Database seeding completed!")
@@ -4,6 +4,7 @@ from fastapi.responses import FileResponse, HTMLResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import socketio
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -24,11 +25,24 @@ from routes import (
     wallet_routes, 
     admin_wallet_routes,
     recipient_routes,
-    profile_routes
+    profile_routes,
+    export_routes,
+    quote_routes,
+    metrics_routes
 )
 
 # Import socket manager
-from socket_manager import sio
+from socket_manager import sio, start_queue_listener
+from request_metrics import MetricsMiddleware
+
+# Import background jobs
+from stats_cache import start_stats_refresher, stop_stats_refresher
+from order_search import prepare_order_search
+from chat_writer import message_buffer
+from chat_dispatch import prepare_dispatch
+from indexes import ensure_indexes_logged
+from session_versions import start_session_version_poller, stop_session_version_poller
+from shipping_catalogue import start_catalogue_watcher, stop_catalogue_watcher
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -68,6 +82,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency, DB time and Server-Timing; outermost so CORS is included
+app.add_middleware(MetricsMiddleware)
+
 # Include all routers with /api prefix
 app.include_router(auth_routes.router)
 app.include_router(order_routes.router)
@@ -81,6 +98,9 @@ app.include_router(wallet_routes.router)
 app.include_router(admin_wallet_routes.router)
 app.include_router(recipient_routes.router)
 app.include_router(profile_routes.router)
+app.include_router(export_routes.router)
+app.include_router(quote_routes.router)
+app.include_router(metrics_routes.router)
 
 # Serve React frontend build files
 frontend_build_dir = Path(__file__).parent.parent / "frontend" / "build"
@@ -169,8 +189,24 @@ else:
         </html>
         """
 
+@app.on_event("startup")
+async def start_background_jobs():
+    start_stats_refresher()
+    start_session_version_poller()
+    start_catalogue_watcher()
+    message_buffer.start()
+    start_queue_listener()
+    app.state.indexes = asyncio.create_task(ensure_indexes_logged())
+    app.state.order_search_prep = asyncio.create_task(prepare_order_search())
+    app.state.chat_dispatch = asyncio.create_task(prepare_dispatch())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await stop_stats_refresher()
+    await stop_session_version_poller()
+    await stop_catalogue_watcher()
+    # Persist buffered chat messages before the connection goes away
+    await message_buffer.stop()
     client.close()
 
 # Export socket_app for uvicorn
@@ -0,0 +1,111 @@
+"""
+Token revocation through per-user session versions.
+
+Every access token carries the user's `tokenVersion` as its `ver` claim.
+Revoking a user's sessions (password change, email change, admin action)
+increments the stored version, so tokens minted before it stop validating.
+Request handling never reads the user document: each worker keeps the versions
+of revoked users in memory. It loads them at startup and follows a small
+`token_revocations` feed every SESSION_VERSION_POLL_SECONDS, so a revocation
+made on another worker takes effect within that interval. The worker that
+revokes applies it immediately.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from database import db
+
+logger = logging.getLogger(__name__)
+
+SESSION_VERSION_POLL_SECONDS = float(os.getenv("SESSION_VERSION_POLL_SECONDS", "2"))
+# Feed entries only need to outlive the longest-lived token
+REVOCATION_RETENTION_SECONDS = int(os.getenv("REVOCATION_RETENTION_SECONDS", str(8 * 24 * 3600)))
+# Catch-up overlap for clock skew between workers; applying a version is idempotent
+POLL_OVERLAP = timedelta(seconds=5)
+
+_versions: Dict[str, int] = {}
+_last_polled: Optional[datetime] = None
+_poller_task = None
+
+
+def _apply(user_id: str, version: int):
+    if version > _versions.get(user_id, 0):
+        _versions[user_id] = version
+
+
+def current_version(user_id: str) -> int:
+    return _versions.get(user_id, 0)
+
+
+def is_current(user_id: str, token_version: int) -> bool:
+    """O(1) check for the request path; tokens without `ver` count as version 0"""
+    return token_version >= _versions.get(user_id, 0)
+
+
+async def revoke_user_sessions(user_id: str, reason: str) -> int:
+    """Invalidate every token issued to the user so far; returns the new version"""
+    user = await db.users.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$inc": {"tokenVersion": 1}},
+        projection={"tokenVersion": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if user is None:
+        return 0
+    version = user["tokenVersion"]
+    await db.token_revocations.insert_one({
+        "userId": user_id,
+        "version": version,
+        "reason": reason,
+        "createdAt": datetime.utcnow()
+    })
+    _apply(user_id, version)
+    return version
+
+
+async def load_session_versions():
+    global _last_polled
+    _last_polled = datetime.utcnow()
+    async for user in db.users.find({"tokenVersion": {"$gt": 0}}, {"tokenVersion": 1}):
+        _apply(str(user["_id"]), user["tokenVersion"])
+
+
+async def poll_revocations():
+    global _last_polled
+    since = _last_polled - POLL_OVERLAP
+    _last_polled = datetime.utcnow()
+    async for entry in db.token_revocations.find({"createdAt": {"$gte": since}}, {"userId": 1, "version": 1}):
+        _apply(entry["userId"], entry["version"])
+
+
+async def _poll_loop():
+    while True:
+        try:
+            if _last_polled is None:
+                await load_session_versions()
+            else:
+                await poll_revocations()
+        except Exception:
+            logger.exception("Session version refresh failed")
+        await asyncio.sleep(SESSION_VERSION_POLL_SECONDS)
+
+
+def start_session_version_poller():
+    global _poller_task
+    if _poller_task is None:
+        _poller_task = asyncio.create_task(_poll_loop())
+
+
+async def stop_session_version_poller():
+    global _poller_task
+    if _poller_task is not None:
+        _poller_task.cancel()
+        try:
+            await _poller_task
+        except asyncio.CancelledError:
+            pass
+        _poller_task = None
@@ -0,0 +1,130 @@
+"""
+In-process shipping company catalogue.
+
+The catalogue changes rarely, but quoting, order creation and the public list
+read it constantly. The companies are held in memory, together with a
+pre-encoded list body and its ETag, and tagged with the catalogue version
+stored in `catalogue_versions`. Admin writes bump that version and drop the
+local copy at once. Other workers notice through a change stream on
+`shipping_companies` where the deployment supports one, and otherwise by
+polling the version every CATALOGUE_POLL_SECONDS.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from database import db, transactions_supported
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_POLL_SECONDS = float(os.getenv("CATALOGUE_POLL_SECONDS", "5"))
+CATALOGUE_ID = "shipping_companies"
+
+_companies: Optional[Dict[str, dict]] = None
+_version: Optional[int] = None
+_bodies: Dict[bool, Tuple[bytes, str]] = {}
+_load_lock = asyncio.Lock()
+_watcher_task = None
+
+
+async def _stored_version() -> int:
+    doc = await db.catalogue_versions.find_one({"_id": CATALOGUE_ID})
+    return doc["version"] if doc else 0
+
+
+def _drop_local():
+    global _companies, _version
+    _companies = None
+    _version = None
+    _bodies.clear()
+
+
+async def get_catalogue() -> Dict[str, dict]:
+    """All companies by id, inactive ones included; treat as read-only"""
+    global _companies, _version
+    if _companies is not None:
+        return _companies
+    async with _load_lock:
+        if _companies is None:
+            # Version first: a write racing the load triggers another reload
+            version = await _stored_version()
+            companies = {}
+            async for company in db.shipping_companies.find({}):
+                company["_id"] = str(company["_id"])
+                companies[company["_id"]] = company
+            _companies, _version = companies, version
+    return _companies
+
+
+async def get_company(company_id: str) -> Optional[dict]:
+    return (await get_catalogue()).get(company_id)
+
+
+async def active_companies() -> Dict[str, dict]:
+    return {company_id: c for company_id, c in (await get_catalogue()).items() if c.get("isActive", True)}
+
+
+async def list_body(include_inactive: bool = False) -> Tuple[bytes, str]:
+    """Encoded GET /api/shipping-companies body and its ETag"""
+    cached = _bodies.get(include_inactive)
+    if cached is not None and _companies is not None:
+        return cached
+    companies = list((await get_catalogue() if include_inactive else await active_companies()).values())
+    body = json.dumps(jsonable_encoder({"companies": companies}), ensure_ascii=False).encode("utf-8")
+    etag = f'W/"{hashlib.sha1(body).hexdigest()[:16]}"'
+    _bodies[include_inactive] = (body, etag)
+    return body, etag
+
+
+async def invalidate_catalogue():
+    """Call after any write to shipping_companies"""
+    await db.catalogue_versions.update_one({"_id": CATALOGUE_ID}, {"$inc": {"version": 1}}, upsert=True)
+    _drop_local()
+
+
+async def _watch_changes():
+    async with db.shipping_companies.watch() as stream:
+        async for _ in stream:
+            _drop_local()
+
+
+async def _poll_version():
+    while True:
+        await asyncio.sleep(CATALOGUE_POLL_SECONDS)
+        if _version is not None and await _stored_version() != _version:
+            _drop_local()
+
+
+async def _watch_loop():
+    while True:
+        try:
+            if await transactions_supported():
+                await _watch_changes()
+            else:
+                await _poll_version()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Catalogue watcher failed, retrying")
+            _drop_local()
+            await asyncio.sleep(CATALOGUE_POLL_SECONDS)
+
+
+def start_catalogue_watcher():
+    global _watcher_task
+    if _watcher_task is None:
+        _watcher_task = asyncio.create_task(_watch_loop())
+
+
+async def stop_catalogue_watcher():
+    global _watcher_task
+    if _watcher_task is not None:
+        _watcher_task.cancel()
+        try:
+            await _watcher_task
+        except asyncio.CancelledError:
+            pass
+        _watcher_task = None
@@ -0,0 +1,133 @@
+"""
+Slow MongoDB command log.
+
+A pymongo CommandListener on the Motor client. It remembers each command's
+filter shape and origin when the command starts. If the command takes longer
+than SLOW_QUERY_MS, it logs a warning and keeps the entry in a ring buffer
+served at GET /api/admin/slow-queries.
+
+The origin is the route template, socket event or "background" that issued
+the command (see request_metrics.current_origin). The shape keeps field names
+and operators but replaces values with their type, so entries group by query
+pattern and no user data reaches the log.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from pymongo import monitoring
+from request_metrics import current_origin
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+
+# Where each command keeps its filter, and its sort where it has one
+FILTER_FIELDS = {
+    "find": ("filter", "sort"),
+    "count": ("query", None),
+    "distinct": ("query", None),
+    "findAndModify": ("query", "sort"),
+    "aggregate": ("pipeline", None),
+}
+SKIPPED_COMMANDS = {"getMore", "endSessions", "killCursors", "hello", "isMaster", "ismaster", "ping"}
+MAX_SHAPE_ITEMS = 10
+
+
+def query_shape(value):
+    """Field names and operators only; values become their type name"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in list(value.items())[:MAX_SHAPE_ITEMS]}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value[:MAX_SHAPE_ITEMS]]
+        return f"[{len(value)}]"
+    return type(value).__name__
+
+
+def command_shape(name: str, command: dict) -> dict:
+    shape = {}
+    if name in FILTER_FIELDS:
+        filter_field, sort_field = FILTER_FIELDS[name]
+        shape["filter"] = query_shape(command.get(filter_field) or {})
+        if sort_field and command.get(sort_field):
+            shape["sort"] = dict(command[sort_field])
+    elif name in ("update", "delete"):
+        statements = command.get("updates" if name == "update" else "deletes") or []
+        shape["filter"] = [query_shape(statement.get("q", {})) for statement in statements[:MAX_SHAPE_ITEMS]]
+        shape["statements"] = len(statements)
+    elif name == "insert":
+        shape["documents"] = len(command.get("documents") or [])
+    if command.get("limit"):
+        shape["limit"] = command["limit"]
+    return shape
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float, size: int):
+        self.threshold_ms = threshold_ms
+        self.entries = deque(maxlen=size)
+        self.total = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        if self.threshold_ms < 0 or event.command_name in SKIPPED_COMMANDS:
+            return
+        # The command document may be reused by the driver; capture what we need now
+        collection = event.command.get(event.command_name)
+        pending = (
+            collection if isinstance(collection, str) else None,
+            command_shape(event.command_name, event.command),
+            current_origin()
+        )
+        with self._lock:
+            self._pending[self._key(event)] = pending
+
+    def _finish(self, event, failure=None):
+        with self._lock:
+            pending = self._pending.pop(self._key(event), None)
+        duration_ms = event.duration_micros / 1000
+        if pending is None or duration_ms < self.threshold_ms:
+            return
+        collection, shape, origin = pending
+        entry = {
+            "at": datetime.utcnow(),
+            "command": event.command_name,
+            "collection": collection,
+            "database": event.database_name,
+            "durationMs": round(duration_ms, 2),
+            "shape": shape,
+            "origin": origin,
+            "server": f"{event.connection_id[0]}:{event.connection_id[1]}"
+        }
+        if failure is not None:
+            entry["failure"] = str(failure.get("errmsg", failure)) if isinstance(failure, dict) else str(failure)
+        with self._lock:
+            self.entries.append(entry)
+            self.total += 1
+        logger.warning(
+            f"Slow {event.command_name} on {collection} took {duration_ms:.1f} ms "
+            f"from {origin}: {shape}"
+        )
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, event.failure)
+
+    def recent(self, limit: int = 50) -> dict:
+        with self._lock:
+            entries = list(self.entries)[-limit:]
+        entries.reverse()
+        return {"thresholdMs": self.threshold_ms, "total": self.total, "entries": entries}
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_LOG_SIZE)
@@ -1,7 +1,30 @@
 import socketio
 import os
+import json
+from fastapi.encoders import jsonable_encoder
 from database import db
-from datetime import datetime
+from auth import authenticate_token
+from tracking_cache import get_tracking, set_invalidation_broadcast, tracking_cache
+from socket_queue import create_client_manager
+from chat_registry import ConnectionRegistry
+from chat_writer import message_buffer
+from request_metrics import set_operation, reset_operation
+from chat_dispatch import (
+    AssignmentError,
+    agent_sessions,
+    claim_next,
+    claim_session,
+    dequeue_session,
+    enqueue_session
+)
+from chat_history import (
+    CHAT_HISTORY_PAGE_SIZE,
+    CHAT_SYNC_LIMIT,
+    latest_messages,
+    messages_before,
+    messages_since
+)
+from datetime import datetime, timedelta
 import uuid
 
 # Get allowed origins from environment
@@ -9,28 +32,177 @@ cors_origins = os.getenv('CORS_ORIGINS', '*')
 if cors_origins != '*':
     cors_origins = cors_origins.split(',')
 
-# Create Socket.IO server
-sio = socketio.AsyncServer(
+class InstrumentedServer(socketio.AsyncServer):
+    """Tags work done inside an event handler with the event name for the slow query log"""
+
+    async def _trigger_event(self, event, namespace, *args):
+        token = set_operation(f'socket:{event}')
+        try:
+            return await super()._trigger_event(event, namespace, *args)
+        finally:
+            reset_operation(token)
+
+# Create Socket.IO server; the client manager routes emits across workers
+sio = InstrumentedServer(
     async_mode='asgi',
     cors_allowed_origins=cors_origins,
+    client_manager=create_client_manager(),
     logger=True,
     engineio_logger=True
 )
 
-# Store active connections
-active_sessions = {}  # {session_id: {'user_sid': sid, 'agent_sid': sid}}
+# Status changes on one worker must not leave stale tracking entries on the others
+if hasattr(sio.manager, 'broadcast'):
+    sio.manager.on_broadcast('tracking_invalidated', lambda data: tracking_cache.invalidate(data['trackingCode']))
+    set_invalidation_broadcast(
+        lambda tracking_code: sio.manager.broadcast('tracking_invalidated', {'trackingCode': tracking_code})
+    )
+
+def start_queue_listener():
+    """
+    Listen on the message queue from startup; Socket.IO would otherwise start
+    it on the first client connection, and a worker without clients would
+    miss broadcasts
+    """
+    if hasattr(sio.manager, 'broadcast') and not sio.manager_initialized:
+        sio.manager_initialized = True
+        sio.manager.initialize()
+
+# Which sid is each side of a chat on this worker
+registry = ConnectionRegistry()
+
+def chat_room(session_id):
+    """Room holding both participants of a chat session, on any worker"""
+    return f'chat:{session_id}'
+
+# Clock slack between the local grace timer and the stored disconnect time
+GRACE_SLACK = timedelta(milliseconds=500)
+
+async def mark_disconnected(session_id, role, sid):
+    """
+    Record the disconnect unless the side has already resumed from another sid,
+    possibly on another worker. Returns whether it was recorded.
+    """
+    result = await db.chat_sessions.update_one(
+        # No connectedSid: the side connected before sids were recorded
+        {'_id': session_id, f'connectedSid.{role}': {'$in': [sid, None]}},
+        {
+            '$set': {f'disconnectedAt.{role}': datetime.utcnow()},
+            '$unset': {f'connectedSid.{role}': ''}
+        }
+    )
+    return result.modified_count > 0
+
+async def mark_connected(session_id, role, sid):
+    await db.chat_sessions.update_one(
+        {'_id': session_id},
+        {
+            '$set': {f'connectedSid.{role}': sid},
+            '$unset': {f'disconnectedAt.{role}': ''}
+        }
+    )
+
+async def participant_left(session_id, role):
+    """Grace period ran out without the side reconnecting"""
+    # The side may have resumed on another worker, which clears disconnectedAt;
+    # a later disconnect has its own, later deadline
+    deadline = datetime.utcnow() - timedelta(seconds=registry.grace_seconds) + GRACE_SLACK
+    expired = await db.chat_sessions.find_one_and_update(
+        {'_id': session_id, f'disconnectedAt.{role}': {'$lte': deadline}},
+        {'$unset': {f'disconnectedAt.{role}': ''}},
+        projection={'_id': 1}
+    )
+    if expired is None:
+        return
+    await sio.emit('participant_left', {
+        'sessionId': session_id,
+        'role': role
+    }, room=chat_room(session_id))
+
+def tracking_room(tracking_code):
+    """Everyone following a shipment, merchants and recipients alike"""
+    return f'tracking:{tracking_code.strip().upper()}'
+
+def user_room(user_id):
+    """All sockets of a signed-in user, for order updates and notifications"""
+    return f'user:{user_id}'
+
+async def join_user_room(sid, token):
+    principal = authenticate_token(token) if token else None
+    if not principal or not principal.get('userId'):
+        return False
+    await sio.enter_room(sid, user_room(principal['userId']))
+    return True
 
 @sio.event
-async def connect(sid, environ):
+async def connect(sid, environ, auth=None):
     print(f"Client connected: {sid}")
+    # Clients may pass their JWT as {auth: {token}} to get live updates
+    if isinstance(auth, dict):
+        await join_user_room(sid, auth.get('token'))
 
 @sio.event
 async def disconnect(sid):
+    # Socket.IO drops the sid from its rooms on its own; only this side is detached
     print(f"Client disconnected: {sid}")
-    # Remove from active sessions
-    for session_id, sids in list(active_sessions.items()):
-        if sids.get('user_sid') == sid or sids.get('agent_sid') == sid:
-            del active_sessions[session_id]
+    entry = registry.detach(sid, on_expire=participant_left)
+    if entry:
+        session_id, role = entry
+        if not await mark_disconnected(session_id, role, sid):
+            return
+        await sio.emit('participant_disconnected', {
+            'sessionId': session_id,
+            'role': role,
+            'graceSeconds': registry.grace_seconds
+        }, room=chat_room(session_id), skip_sid=sid)
+
+# Signed in after connecting
+@sio.event
+async def subscribe_notifications(sid, data):
+    if not await join_user_room(sid, data.get('token')):
+        await sio.emit('error', {'message': 'Oturum doğrulanamadı'}, room=sid)
+
+# Follow a shipment by tracking code; replaces polling /api/orders/track
+@sio.event
+async def subscribe_tracking(sid, data):
+    try:
+        tracking_code = (data.get('trackingCode') or '').strip().upper()
+        entry = await get_tracking(tracking_code) if tracking_code else None
+        if not entry:
+            await sio.emit('error', {'message': 'Gönderi bulunamadı'}, room=sid)
+            return
+        
+        await sio.enter_room(sid, tracking_room(tracking_code))
+        await sio.emit('tracking_snapshot', json.loads(entry.body), room=sid)
+        
+    except Exception as e:
+        print(f"Error in subscribe_tracking: {e}")
+        await sio.emit('error', {'message': str(e)}, room=sid)
+
+@sio.event
+async def unsubscribe_tracking(sid, data):
+    await sio.leave_room(sid, tracking_room(data.get('trackingCode') or ''))
+
+async def publish_order_status(user_id, order_id, tracking_code, changes, timeline_event):
+    """Push a status/location delta to the order's followers and its owner"""
+    payload = jsonable_encoder({
+        'orderId': order_id,
+        'trackingCode': tracking_code,
+        **changes,
+        'timelineEvent': timeline_event
+    })
+    await sio.emit('order_status', payload, room=[tracking_room(tracking_code), user_room(user_id)])
+
+def _serialize_notification(notification):
+    return jsonable_encoder({**notification, '_id': str(notification.get('_id', ''))})
+
+async def push_notification(notification):
+    await sio.emit('notification', _serialize_notification(notification), room=user_room(notification['userId']))
+
+async def push_notifications(user_id, notifications):
+    await sio.emit('notifications', {
+        'notifications': [_serialize_notification(n) for n in notifications]
+    }, room=user_room(user_id))
 
 # User starts chat
 @sio.event
@@ -61,7 +233,8 @@ async def start_chat(sid, data):
                 'status': 'waiting',
                 'startedAt': datetime.utcnow(),
                 'endedAt': None,
-                'lastMessageAt': datetime.utcnow()
+                'lastMessageAt': datetime.utcnow(),
+                'connectedSid': {'user': sid}
             }
             await db.chat_sessions.insert_one(session)
             
@@ -79,28 +252,18 @@ async def start_chat(sid, data):
             await db.chat_messages.insert_one(bot_message)
             bot_message['_id'] = bot_message_id
             
-            # Notify all agents about new session
-            await sio.emit('new_session', {
-                'sessionId': session_id,
-                'userName': user_name,
-                'userEmail': user_email
-            }, room='agents')
+            # Tell agents the queue grew by one
+            await sio.emit('queue_delta', jsonable_encoder(enqueue_session(session)), room='agents')
         
-        # Add user to active sessions
-        if session_id not in active_sessions:
-            active_sessions[session_id] = {}
-        active_sessions[session_id]['user_sid'] = sid
-        
-        # Get messages
-        messages_cursor = db.chat_messages.find({'sessionId': session_id}).sort('timestamp', 1)
-        messages = await messages_cursor.to_list(length=100)
-        for msg in messages:
-            msg['_id'] = str(msg['_id'])
+        # Join the session room
+        await sio.enter_room(sid, chat_room(session_id))
+        registry.attach(session_id, 'user', sid)
+        if existing_session:
+            await mark_connected(session_id, 'user', sid)
         
-        await sio.emit('chat_started', {
-            'sessionId': session_id,
-            'messages': messages
-        }, room=sid)
+        # Newest page only; older pages come from load_history
+        page = await latest_messages(session_id)
+        await sio.emit('chat_started', {**page}, room=sid)
         
     except Exception as e:
         print(f"Error in start_chat: {e}")
@@ -116,14 +279,8 @@ async def agent_join(sid, data):
         # Join agents room
         await sio.enter_room(sid, 'agents')
         
-        # Get all active sessions
-        sessions_cursor = db.chat_sessions.find({
-            'status': {'$in': ['waiting', 'active']}
-        }).sort('lastMessageAt', -1)
-        sessions = await sessions_cursor.to_list(length=100)
-        
-        for session in sessions:
-            session['_id'] = str(session['_id'])
+        # Own chats plus the waiting queue; later changes arrive as queue_delta
+        sessions = jsonable_encoder(await agent_sessions(agent_id))
         
         await sio.emit('agent_sessions', {'sessions': sessions}, room=sid)
         
@@ -131,7 +288,20 @@ async def agent_join(sid, data):
         print(f"Error in agent_join: {e}")
         await sio.emit('error', {'message': str(e)}, room=sid)
 
-# Agent takes session
+async def open_agent_session(sid, session_id, agent_name):
+    """Put the agent in the session room and send it the latest messages"""
+    await sio.enter_room(sid, chat_room(session_id))
+    registry.attach(session_id, 'agent', sid)
+    await mark_connected(session_id, 'agent', sid)
+    await sio.emit('agent_joined', {
+        'agentName': agent_name
+    }, room=chat_room(session_id), skip_sid=sid)
+    
+    # Newest page only; older pages come from load_history
+    page = await latest_messages(session_id)
+    await sio.emit('session_taken', {**page}, room=sid)
+
+# Agent takes a specific session
 @sio.event
 async def agent_take_session(sid, data):
     try:
@@ -139,44 +309,126 @@ async def agent_take_session(sid, data):
         agent_id = data.get('agentId')
         agent_name = data.get('agentName')
         
-        # Update session
-        await db.chat_sessions.update_one(
-            {'_id': session_id},
-            {
-                '$set': {
-                    'agentId': agent_id,
-                    'agentName': agent_name,
-                    'status': 'active',
-                    'lastMessageAt': datetime.utcnow()
-                }
-            }
+        # Only a waiting session can be claimed, and only under the agent's cap
+        try:
+            assigned = await claim_session(session_id, agent_id, agent_name)
+        except AssignmentError as e:
+            await sio.emit('error', {'message': str(e)}, room=sid)
+            return
+        
+        if assigned:
+            await sio.emit('queue_delta', dequeue_session(session_id, 'assigned', agent_name), room='agents', skip_sid=sid)
+        await open_agent_session(sid, session_id, agent_name)
+        
+    except Exception as e:
+        print(f"Error in agent_take_session: {e}")
+        await sio.emit('error', {'message': str(e)}, room=sid)
+
+# Agent asks for the longest-waiting session
+@sio.event
+async def agent_take_next(sid, data):
+    try:
+        agent_id = data.get('agentId')
+        agent_name = data.get('agentName')
+        
+        try:
+            session_id = await claim_next(agent_id, agent_name)
+        except AssignmentError as e:
+            await sio.emit('error', {'message': str(e)}, room=sid)
+            return
+        
+        if session_id is None:
+            await sio.emit('queue_empty', {}, room=sid)
+            return
+        
+        await sio.emit('queue_delta', dequeue_session(session_id, 'assigned', agent_name), room='agents', skip_sid=sid)
+        await open_agent_session(sid, session_id, agent_name)
+        
+    except Exception as e:
+        print(f"Error in agent_take_next: {e}")
+        await sio.emit('error', {'message': str(e)}, room=sid)
+
+# Reconnected client picks its session back up
+@sio.event
+async def resume_session(sid, data):
+    try:
+        session_id = data.get('sessionId')
+        role = data.get('role')
+        if role not in ('user', 'agent'):
+            await sio.emit('error', {'message': 'Geçersiz rol'}, room=sid)
+            return
+        
+        owner_field = 'userId' if role == 'user' else 'agentId'
+        session = await db.chat_sessions.find_one(
+            {'_id': session_id, owner_field: data.get(owner_field)},
+            {'status': 1}
         )
+        if not session or session['status'] == 'closed':
+            await sio.emit('session_closed', {'sessionId': session_id}, room=sid)
+            return
         
-        # Add agent to active sessions
-        if session_id not in active_sessions:
-            active_sessions[session_id] = {}
-        active_sessions[session_id]['agent_sid'] = sid
-        
-        # Notify user
-        user_sid = active_sessions.get(session_id, {}).get('user_sid')
-        if user_sid:
-            await sio.emit('agent_joined', {
-                'agentName': agent_name
-            }, room=user_sid)
-        
-        # Get messages
-        messages_cursor = db.chat_messages.find({'sessionId': session_id}).sort('timestamp', 1)
-        messages = await messages_cursor.to_list(length=100)
-        for msg in messages:
-            msg['_id'] = str(msg['_id'])
-        
-        await sio.emit('session_taken', {
+        await sio.enter_room(sid, chat_room(session_id))
+        if role == 'agent':
+            await sio.enter_room(sid, 'agents')
+        registry.attach(session_id, role, sid)
+        await mark_connected(session_id, role, sid)
+        
+        await sio.emit('participant_reconnected', {
             'sessionId': session_id,
-            'messages': messages
-        }, room=sid)
+            'role': role
+        }, room=chat_room(session_id), skip_sid=sid)
+        
+        # Only what the client missed while it was away
+        if data.get('lastMessageId') or data.get('sinceTimestamp'):
+            page = await messages_since(session_id, data.get('sinceTimestamp'), data.get('lastMessageId'))
+        else:
+            page = await latest_messages(session_id)
+        await sio.emit('session_resumed', {**page, 'status': session['status']}, room=sid)
         
     except Exception as e:
-        print(f"Error in agent_take_session: {e}")
+        print(f"Error in resume_session: {e}")
+        await sio.emit('error', {'message': str(e)}, room=sid)
+
+# Messages after the client's last one
+@sio.event
+async def sync_messages(sid, data):
+    try:
+        session_id = data.get('sessionId')
+        if chat_room(session_id) not in sio.rooms(sid):
+            await sio.emit('error', {'message': 'Bu sohbete erişim yetkiniz yok'}, room=sid)
+            return
+        
+        page = await messages_since(
+            session_id,
+            data.get('sinceTimestamp'),
+            data.get('lastMessageId'),
+            limit=int(data.get('limit') or CHAT_SYNC_LIMIT)
+        )
+        await sio.emit('messages_synced', page, room=sid)
+        
+    except Exception as e:
+        print(f"Error in sync_messages: {e}")
+        await sio.emit('error', {'message': str(e)}, room=sid)
+
+# Older history, one page at a time
+@sio.event
+async def load_history(sid, data):
+    try:
+        session_id = data.get('sessionId')
+        if chat_room(session_id) not in sio.rooms(sid):
+            await sio.emit('error', {'message': 'Bu sohbete erişim yetkiniz yok'}, room=sid)
+            return
+        
+        page = await messages_before(
+            session_id,
+            data.get('beforeTimestamp'),
+            data.get('beforeId'),
+            limit=int(data.get('limit') or CHAT_HISTORY_PAGE_SIZE)
+        )
+        await sio.emit('history_loaded', page, room=sid)
+        
+    except Exception as e:
+        print(f"Error in load_history: {e}")
         await sio.emit('error', {'message': str(e)}, room=sid)
 
 # Send message
@@ -188,7 +440,6 @@ async def send_message(sid, data):
         sender_name = data.get('senderName')
         text = data.get('text')
         
-        # Save message
         message_id = str(uuid.uuid4())
         message = {
             '_id': message_id,
@@ -199,25 +450,13 @@ async def send_message(sid, data):
             'timestamp': datetime.utcnow(),
             'read': False
         }
-        await db.chat_messages.insert_one(message)
-        
-        # Update session last message time
-        await db.chat_sessions.update_one(
-            {'_id': session_id},
-            {'$set': {'lastMessageAt': datetime.utcnow()}}
-        )
-        
-        message['_id'] = message_id
-        
-        # Send to both user and agent
-        session_sids = active_sessions.get(session_id, {})
-        user_sid = session_sids.get('user_sid')
-        agent_sid = session_sids.get('agent_sid')
         
-        if user_sid:
-            await sio.emit('new_message', message, room=user_sid)
-        if agent_sid:
-            await sio.emit('new_message', message, room=agent_sid)
+        # Send to both user and agent, then persist in the background
+        await sio.emit('new_message', {
+            **message,
+            'timestamp': message['timestamp'].isoformat()
+        }, room=chat_room(session_id))
+        await message_buffer.enqueue(message)
         
     except Exception as e:
         print(f"Error in send_message: {e}")
@@ -230,29 +469,27 @@ async def close_session(sid, data):
         session_id = data.get('sessionId')
         
         # Update session
-        await db.chat_sessions.update_one(
+        previous = await db.chat_sessions.find_one_and_update(
             {'_id': session_id},
             {
                 '$set': {
                     'status': 'closed',
                     'endedAt': datetime.utcnow()
                 }
-            }
+            },
+            projection={'status': 1}
         )
         
+        # Closed before any agent took it
+        if previous and previous['status'] == 'waiting':
+            await sio.emit('queue_delta', dequeue_session(session_id, 'closed'), room='agents')
+        
         # Notify both parties
-        session_sids = active_sessions.get(session_id, {})
-        user_sid = session_sids.get('user_sid')
-        agent_sid = session_sids.get('agent_sid')
-        
-        if user_sid:
-            await sio.emit('session_closed', {'sessionId': session_id}, room=user_sid)
-        if agent_sid:
-            await sio.emit('session_closed', {'sessionId': session_id}, room=agent_sid)
-        
-        # Remove from active sessions
-        if session_id in active_sessions:
-            del active_sessions[session_id]
+        await sio.emit('session_closed', {'sessionId': session_id}, room=chat_room(session_id))
+        
+        # Remove everyone from the session room
+        await sio.close_room(chat_room(session_id))
+        registry.drop_session(session_id)
         
     except Exception as e:
         print(f"Error in close_session: {e}")
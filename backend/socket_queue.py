@@ -0,0 +1,152 @@
+"""
+Socket.IO client managers for running chat across several workers.
+
+SOCKETIO_MESSAGE_QUEUE selects the backend:
+  (unset)              single process, in-memory rooms (default)
+  unix:///path/to/dir  brokerless pub/sub between workers on one host
+  redis://...          python-socketio's Redis manager (needs `redis`)
+  amqp://...           python-socketio's AMQP manager (needs `aio_pika`)
+
+Chat routing uses rooms, so any backend delivers emits to participants
+connected to other workers. The same channel carries server-to-server
+broadcasts (e.g. cache invalidations) on an internal namespace that no client
+can join.
+"""
+import asyncio
+import contextlib
+import os
+import pickle
+import struct
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+_FRAME_HEADER = struct.Struct("!I")
+INTERNAL_NAMESPACE = "/_internal"
+
+
+class BroadcastMixin:
+    """
+    Worker-to-worker messages over the manager's pub/sub channel. They travel
+    as ordinary emit messages on INTERNAL_NAMESPACE, so every backend carries
+    them, and are handed to the registered handler instead of to clients.
+    """
+
+    def on_broadcast(self, event, handler):
+        if not hasattr(self, "_broadcast_handlers"):
+            self._broadcast_handlers = {}
+        self._broadcast_handlers[event] = handler
+
+    async def broadcast(self, event, data):
+        """Deliver to the other workers; the caller applies it locally"""
+        await self._publish({
+            "method": "emit", "event": event, "data": data, "namespace": INTERNAL_NAMESPACE,
+            "room": None, "skip_sid": None, "callback": None, "host_id": self.host_id
+        })
+
+    async def _handle_emit(self, message):
+        if message.get("namespace") != INTERNAL_NAMESPACE:
+            return await super()._handle_emit(message)
+        handler = getattr(self, "_broadcast_handlers", {}).get(message["event"])
+        if handler is not None:
+            result = handler(message["data"])
+            if asyncio.iscoroutine(result):
+                await result
+
+
+class AsyncUnixSocketManager(BroadcastMixin, AsyncPubSubManager):
+    """
+    Pub/sub over Unix domain sockets. Every worker listens on
+    <dir>/<channel>/<host_id>.sock and publishes by writing length-prefixed
+    pickled messages to the other workers' sockets. The directory is created
+    0700 so only the service user can publish.
+    """
+    name = "unixsocket"
+
+    PEER_REFRESH_SECONDS = 1.0
+
+    def __init__(self, url="unix:///tmp/kanal-socketio", channel="socketio", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.directory = Path(urlparse(url).path) / channel
+        self.directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self.socket_path = self.directory / f"{self.host_id}.sock"
+        self._writers = {}
+        self._peers = []
+        self._peers_listed_at = 0.0
+
+    def _peer_paths(self):
+        now = time.monotonic()
+        if now - self._peers_listed_at > self.PEER_REFRESH_SECONDS:
+            self._peers = [p for p in self.directory.glob("*.sock") if p != self.socket_path]
+            self._peers_listed_at = now
+        return self._peers
+
+    async def _send(self, path: Path, frame: bytes):
+        writer = self._writers.get(path)
+        try:
+            if writer is None or writer.is_closing():
+                _, writer = await asyncio.open_unix_connection(str(path))
+                self._writers[path] = writer
+            writer.write(frame)
+            await writer.drain()
+        except ConnectionRefusedError:
+            # Nobody listens there any more: the worker exited without cleanup
+            self._writers.pop(path, None)
+            with contextlib.suppress(OSError):
+                path.unlink()
+            self._peers_listed_at = 0.0
+        except (ConnectionError, FileNotFoundError):
+            self._writers.pop(path, None)
+            self._peers_listed_at = 0.0
+
+    async def _publish(self, data):
+        payload = pickle.dumps(data)
+        frame = _FRAME_HEADER.pack(len(payload)) + payload
+        peers = self._peer_paths()
+        if peers:
+            await asyncio.gather(*(self._send(path, frame) for path in peers))
+
+    async def _listen(self):
+        queue = asyncio.Queue()
+
+        async def receive(reader, writer):
+            try:
+                while True:
+                    (size,) = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+                    await queue.put(await reader.readexactly(size))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        with contextlib.suppress(FileNotFoundError):
+            self.socket_path.unlink()
+        server = await asyncio.start_unix_server(receive, path=str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            server.close()
+            with contextlib.suppress(FileNotFoundError):
+                self.socket_path.unlink()
+
+
+def _with_broadcast(manager_class):
+    return type(manager_class.__name__, (BroadcastMixin, manager_class), {})
+
+
+def create_client_manager(url=None, write_only=False):
+    url = url if url is not None else os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+    channel = os.getenv("SOCKETIO_CHANNEL", "socketio")
+    if not url:
+        return None
+    if url.startswith("unix://"):
+        return AsyncUnixSocketManager(url, channel=channel, write_only=write_only)
+    if url.startswith(("redis://", "rediss://")):
+        return _with_broadcast(socketio.AsyncRedisManager)(url, channel=channel, write_only=write_only)
+    if url.startswith(("amqp://", "amqps://")):
+        return _with_broadcast(socketio.AsyncAioPikaManager)(url, channel=channel, write_only=write_only)
+    raise ValueError(f"Unsupported SOCKETIO_MESSAGE_QUEUE: {url}")
@@ -0,0 +1,205 @@
+"""
+Materialized admin dashboard stats.
+
+Counters live in a single `stats` document that order creation, status updates
+and registration keep current with $inc. A background refresher fills in the
+derived figures (monthly growth, average delivery time) and periodically
+recounts everything to correct any drift. Every counter update also bumps
+`counterVersion`, and a recount is only written if the version has not moved
+since it started, so it never overwrites increments it did not see. Writers
+record their increments before responding, not in background tasks, so the
+gap in which a recount can see an order but not its increment stays one round
+trip. GET /api/admin/stats reads an in-process snapshot that is at most
+STATS_MAX_STALENESS_SECONDS old.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from pymongo import ReturnDocument
+from database import db, read_db
+
+logger = logging.getLogger(__name__)
+
+STATS_DOC_ID = "dashboard"
+ACTIVE_STATUSES = ["created", "picked", "in_transit", "out_for_delivery"]
+
+STATS_MAX_STALENESS_SECONDS = float(os.getenv("STATS_MAX_STALENESS_SECONDS", "30"))
+STATS_REFRESH_INTERVAL_SECONDS = float(os.getenv("STATS_REFRESH_INTERVAL_SECONDS", "300"))
+
+_snapshot = None
+_snapshot_at = 0.0
+_refresher_task = None
+
+
+async def _increment(inc: dict):
+    await db.stats.update_one(
+        {"_id": STATS_DOC_ID}, {"$inc": {**inc, "counterVersion": 1}}, upsert=True
+    )
+
+
+def _status_delta(status: str, step: int) -> dict:
+    delta = {f"statusCounts.{status}": step}
+    if status in ACTIVE_STATUSES:
+        delta["activeShipments"] = step
+    if status == "delivered":
+        delta["deliveredShipments"] = step
+    return delta
+
+
+async def record_order_created(price: float, prepaid: bool):
+    await record_orders_created(1, price if prepaid else 0.0)
+
+
+async def record_orders_created(count: int, prepaid_revenue: float):
+    inc = {"totalShipments": count, **_status_delta("created", count)}
+    if prepaid_revenue:
+        inc["totalRevenue"] = prepaid_revenue
+    await _increment(inc)
+
+
+async def record_status_change(old_status: str, new_status: str):
+    if old_status == new_status:
+        return
+    inc = _status_delta(old_status, -1)
+    for key, step in _status_delta(new_status, 1).items():
+        inc[key] = inc.get(key, 0) + step
+    await _increment(inc)
+
+
+async def record_user_registered():
+    await _increment({"totalUsers": 1})
+
+
+async def _monthly_growth(now: datetime) -> float:
+    this_month = datetime(now.year, now.month, 1)
+    last_month = datetime(now.year - 1, 12, 1) if now.month == 1 else datetime(now.year, now.month - 1, 1)
+    orders = read_db("stats").orders
+    current, previous = await asyncio.gather(
+        orders.count_documents({"createdAt": {"$gte": this_month}}),
+        orders.count_documents({"createdAt": {"$gte": last_month, "$lt": this_month}})
+    )
+    if previous == 0:
+        return 0.0
+    return round((current - previous) / previous * 100, 1)
+
+
+async def _average_delivery_days() -> float:
+    result = await read_db("stats").orders.aggregate([
+        {"$match": {"status": "delivered", "deliveredAt": {"$ne": None}}},
+        {"$group": {
+            "_id": None,
+            "avgMs": {"$avg": {"$subtract": ["$deliveredAt", "$createdAt"]}}
+        }}
+    ]).to_list(1)
+    if not result or result[0]["avgMs"] is None:
+        return 0.0
+    return round(result[0]["avgMs"] / 86_400_000, 1)
+
+
+async def _recount() -> dict:
+    # Stays on the primary: the result replaces the $inc-maintained counters
+    status_rows, revenue_rows, total_users = await asyncio.gather(
+        db.orders.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]).to_list(None),
+        db.orders.aggregate([
+            {"$match": {"paymentType": "prepaid"}},
+            {"$group": {"_id": None, "total": {"$sum": "$price"}}}
+        ]).to_list(1),
+        db.users.count_documents({"role": "user"})
+    )
+    status_counts = {row["_id"]: row["count"] for row in status_rows if row["_id"]}
+    return {
+        "statusCounts": status_counts,
+        "totalShipments": sum(status_counts.values()),
+        "activeShipments": sum(status_counts.get(s, 0) for s in ACTIVE_STATUSES),
+        "deliveredShipments": status_counts.get("delivered", 0),
+        "totalRevenue": revenue_rows[0]["total"] if revenue_rows else 0,
+        "totalUsers": total_users
+    }
+
+
+async def refresh_stats(recount: bool = True):
+    """Recompute derived figures, and optionally all counters, from the collections"""
+    global _snapshot_at
+    now = datetime.utcnow()
+    fields = {}
+    if recount:
+        # $inc by 0 creates the document and the version field if missing
+        doc = await db.stats.find_one_and_update(
+            {"_id": STATS_DOC_ID}, {"$inc": {"counterVersion": 0}},
+            projection={"counterVersion": 1}, upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        version = doc["counterVersion"]
+        counters = await _recount()
+    fields["monthlyGrowth"], fields["averageDeliveryTime"] = await asyncio.gather(
+        _monthly_growth(now), _average_delivery_days()
+    )
+    fields["refreshedAt"] = now
+
+    written = False
+    if recount:
+        result = await db.stats.update_one(
+            {"_id": STATS_DOC_ID, "counterVersion": version},
+            {"$set": {**counters, **fields}}
+        )
+        written = result.matched_count > 0
+        if not written:
+            logger.info("Counters changed during the recount; keeping the incremental values")
+    if not written:
+        await db.stats.update_one({"_id": STATS_DOC_ID}, {"$set": fields}, upsert=True)
+    _snapshot_at = 0.0
+
+
+async def get_dashboard_stats() -> dict:
+    """O(1) read of the materialized stats, cached for the staleness bound"""
+    global _snapshot, _snapshot_at
+    if _snapshot is not None and time.monotonic() - _snapshot_at < STATS_MAX_STALENESS_SECONDS:
+        return _snapshot
+
+    doc = await db.stats.find_one({"_id": STATS_DOC_ID})
+    if doc is None or "refreshedAt" not in doc:
+        await refresh_stats()
+        doc = await db.stats.find_one({"_id": STATS_DOC_ID})
+
+    _snapshot = {
+        "totalShipments": doc.get("totalShipments", 0),
+        "activeShipments": doc.get("activeShipments", 0),
+        "deliveredShipments": doc.get("deliveredShipments", 0),
+        "totalRevenue": round(doc.get("totalRevenue", 0), 2),
+        "totalUsers": doc.get("totalUsers", 0),
+        "monthlyGrowth": doc.get("monthlyGrowth", 0.0),
+        "averageDeliveryTime": doc.get("averageDeliveryTime", 0.0),
+        # No rating data is collected yet
+        "customerSatisfaction": None,
+        "refreshedAt": doc.get("refreshedAt")
+    }
+    _snapshot_at = time.monotonic()
+    return _snapshot
+
+
+async def _refresh_loop():
+    while True:
+        try:
+            await refresh_stats()
+        except Exception:
+            logger.exception("Stats refresh failed")
+        await asyncio.sleep(STATS_REFRESH_INTERVAL_SECONDS)
+
+
+def start_stats_refresher():
+    global _refresher_task
+    if _refresher_task is None:
+        _refresher_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop_stats_refresher():
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        try:
+            await _refresher_task
+        except asyncio.CancelledError:
+            pass
+        _refresher_task = None
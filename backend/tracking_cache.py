@@ -0,0 +1,148 @@
+"""
+Read model for the public tracking endpoint.
+
+Tracking lookups return a slim projection of the order (no sender or contact
+data) served from an in-process LRU with a TTL. Entries are dropped as soon as
+the order status is updated. Other workers hear about it through the Socket.IO
+message queue (see socket_manager); the TTL only bounds staleness when no
+queue is configured or a broadcast is lost. With secondary tracking reads enabled
+(MONGO_SECONDARY_READS) a refill may lag by up to the replica staleness bound
+as well. Each entry carries a pre-encoded body plus
+ETag/Last-Modified values so clients can revalidate with a 304.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Awaitable, Callable, NamedTuple, Optional
+from fastapi.encoders import jsonable_encoder
+from database import read_db
+
+TRACKING_CACHE_MAX_ENTRIES = int(os.getenv("TRACKING_CACHE_MAX_ENTRIES", "10000"))
+TRACKING_CACHE_TTL_SECONDS = float(os.getenv("TRACKING_CACHE_TTL_SECONDS", "30"))
+
+TRACKING_PROJECTION = {
+    "orderId": 1,
+    "trackingCode": 1,
+    "shippingCompany": 1,
+    "status": 1,
+    "statusText": 1,
+    "weight": 1,
+    "desi": 1,
+    "price": 1,
+    "paymentType": 1,
+    "codAmount": 1,
+    "recipient.name": 1,
+    "recipient.city": 1,
+    "recipient.district": 1,
+    "currentLocation": 1,
+    "timeline": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+    "deliveredAt": 1
+}
+
+
+class TrackingEntry(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: str
+    expires_at: float
+
+
+class TrackingCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so in-flight loads can detect they went stale
+        self.generation = 0
+
+    def get(self, tracking_code: str) -> Optional[TrackingEntry]:
+        entry = self._entries.get(tracking_code)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                del self._entries[tracking_code]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(tracking_code)
+        self.hits += 1
+        return entry
+
+    def put(self, tracking_code: str, entry: TrackingEntry):
+        self._entries[tracking_code] = entry
+        self._entries.move_to_end(tracking_code)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tracking_code: str):
+        self.generation += 1
+        if self._entries.pop(tracking_code, None) is not None:
+            self.invalidations += 1
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+tracking_cache = TrackingCache(TRACKING_CACHE_MAX_ENTRIES, TRACKING_CACHE_TTL_SECONDS)
+
+
+def _build_entry(order: dict) -> TrackingEntry:
+    order["_id"] = str(order["_id"])
+    updated = order.get("updatedAt") or order.get("createdAt") or datetime.utcnow()
+    version = hashlib.sha1(f"{updated.isoformat()}|{len(order.get('timeline', []))}".encode()).hexdigest()[:16]
+    return TrackingEntry(
+        body=json.dumps(jsonable_encoder({"order": order}), ensure_ascii=False).encode("utf-8"),
+        etag=f'W/"{version}"',
+        last_modified=format_datetime(updated.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True),
+        expires_at=time.monotonic() + tracking_cache.ttl
+    )
+
+
+async def get_tracking(tracking_code: str) -> Optional[TrackingEntry]:
+    entry = tracking_cache.get(tracking_code)
+    if entry is not None:
+        return entry
+
+    generation = tracking_cache.generation
+    order = await read_db("tracking").orders.find_one({"trackingCode": tracking_code}, TRACKING_PROJECTION)
+    if not order:
+        return None
+
+    entry = _build_entry(order)
+    if tracking_cache.generation == generation:
+        tracking_cache.put(tracking_code, entry)
+    return entry
+
+
+# Tells the other workers; set by socket_manager when a message queue is configured
+_broadcast: Optional[Callable[[str], Awaitable[None]]] = None
+
+
+def set_invalidation_broadcast(broadcast: Optional[Callable[[str], Awaitable[None]]]):
+    global _broadcast
+    _broadcast = broadcast
+
+
+async def invalidate_tracking(tracking_code: str):
+    tracking_cache.invalidate(tracking_code)
+    if _broadcast is not None:
+        await _broadcast(tracking_code)
@@ -34,3 +34,47 @@ def get_default_location(city: str):
     }
     default_coords = {"lat": 39.9334, "lng": 32.8597}  # Default to Ankara
     return city_coords.get(city.lower(), default_coords)
+
+def build_order_document(order_data: dict, shipping_company: dict, user_id: str, now: datetime, price: float = None) -> dict:
+    """Build a new order document from OrderCreate fields; price defaults to the carrier's flat price"""
+    from order_search import recipient_name_key
+    
+    location_coords = get_default_location(order_data["recipientCity"])
+    return {
+        "orderId": generate_order_id(),
+        "userId": user_id,
+        "trackingCode": generate_tracking_code(),
+        "recipient": {
+            "name": order_data["recipientName"],
+            "phone": order_data["recipientPhone"],
+            "city": order_data["recipientCity"],
+            "district": order_data["recipientDistrict"],
+            "address": order_data["recipientAddress"]
+        },
+        "recipientNameKey": recipient_name_key(order_data["recipientName"]),
+        "shippingCompanyId": order_data["shippingCompanyId"],
+        "shippingCompany": shipping_company["name"],
+        "status": "created",
+        "statusText": "Sipariş Oluşturuldu",
+        "weight": order_data["weight"],
+        "desi": order_data["desi"],
+        "price": shipping_company["price"] if price is None else price,
+        "paymentType": order_data["paymentType"],
+        "codAmount": order_data.get("codAmount"),
+        "description": order_data.get("description", ""),
+        "currentLocation": {
+            "lat": location_coords["lat"],
+            "lng": location_coords["lng"],
+            "city": order_data["recipientCity"],
+            "district": order_data["recipientDistrict"]
+        },
+        "timeline": [
+            {
+                "date": now,
+                "status": "created",
+                "description": "Sipariş oluşturuldu"
+            }
+        ],
+        "createdAt": now,
+        "updatedAt": now
+    }
@@ -0,0 +1,267 @@
+"""
+Wallet ledger: every balance mutation goes through here.
+
+Balances change with a single conditional $inc whose guard lives in the update
+filter, and the matching `transactions` entry is written in the same
+transaction (or directly after the guarded update on standalone servers).
+The helpers only write through the session they are given, so the driver can
+rerun them when a concurrent debit causes a write conflict.
+"""
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from database import db, run_in_transaction
+
+DUPLICATE_KEY = 11000
+
+
+async def _apply(user_id: str, amount: float, tx_type: str, description: str,
+                 min_balance_after: Optional[float], inc: Optional[dict],
+                 tx_fields: dict, session) -> Optional[dict]:
+    query = {"_id": ObjectId(user_id)}
+    if min_balance_after is not None:
+        query["balance"] = {"$gte": min_balance_after - amount}
+
+    user = await db.users.find_one_and_update(
+        query,
+        {"$inc": {"balance": amount, **(inc or {})}},
+        projection={"balance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if not user:
+        return None
+
+    transaction = {
+        "_id": str(uuid.uuid4()),
+        "userId": user_id,
+        "type": tx_type,
+        "amount": amount,
+        "balanceBefore": user["balance"] - amount,
+        "balanceAfter": user["balance"],
+        "description": description,
+        **tx_fields,
+        "createdAt": datetime.utcnow()
+    }
+    await db.transactions.insert_one(transaction, session=session)
+    return transaction
+
+
+async def apply_balance_change(
+    user_id: str,
+    amount: float,
+    tx_type: str,
+    description: str,
+    min_balance_after: Optional[float] = None,
+    inc: Optional[dict] = None,
+    session=None,
+    **tx_fields
+) -> Optional[dict]:
+    """
+    Atomically add `amount` (negative for debits) to the user's balance and
+    record it in `transactions`.
+
+    `min_balance_after` is enforced by the update filter, so concurrent
+    callers can never push the balance below it. `inc` adds extra counters to
+    the same update (e.g. totalShipments). Returns the transaction record, or
+    None if the user does not exist or the guard rejected the change.
+
+    Pass `session` to join a caller's transaction; otherwise one is opened
+    when the deployment supports it.
+    """
+    if session is not None:
+        return await _apply(user_id, amount, tx_type, description,
+                            min_balance_after, inc, tx_fields, session)
+
+    return await run_in_transaction(
+        lambda session: _apply(user_id, amount, tx_type, description,
+                               min_balance_after, inc, tx_fields, session)
+    )
+
+
+async def _apply_many(user_id: str, entries: list, tx_type: str,
+                      min_balance_after: Optional[float], inc: Optional[dict],
+                      session) -> Optional[list]:
+    total = sum(entry["amount"] for entry in entries)
+    query = {"_id": ObjectId(user_id)}
+    if min_balance_after is not None:
+        query["balance"] = {"$gte": min_balance_after - total}
+
+    user = await db.users.find_one_and_update(
+        query,
+        {"$inc": {"balance": total, **(inc or {})}},
+        projection={"balance": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if not user:
+        return None
+
+    now = datetime.utcnow()
+    balance = user["balance"] - total
+    transactions = []
+    for entry in entries:
+        amount = entry["amount"]
+        transactions.append({
+            "_id": str(uuid.uuid4()),
+            "userId": user_id,
+            "type": tx_type,
+            **entry,
+            "balanceBefore": balance,
+            "balanceAfter": balance + amount,
+            "createdAt": now
+        })
+        balance += amount
+    await db.transactions.insert_many(transactions, ordered=False, session=session)
+    return transactions
+
+
+async def apply_balance_changes(
+    user_id: str,
+    entries: list,
+    tx_type: str,
+    min_balance_after: Optional[float] = None,
+    inc: Optional[dict] = None,
+    session=None
+) -> Optional[list]:
+    """
+    Batch form of apply_balance_change: one guarded $inc for the sum of the
+    entries' `amount`s and one transaction per entry (each entry holds
+    `amount`, `description` and any extra transaction fields), with running
+    balanceBefore/balanceAfter values.
+    """
+    if session is not None:
+        return await _apply_many(user_id, entries, tx_type, min_balance_after, inc, session)
+
+    return await run_in_transaction(
+        lambda session: _apply_many(user_id, entries, tx_type, min_balance_after, inc, session)
+    )
+
+
+OPENING_BALANCES_MIGRATION = "wallet_opening_balances"
+
+
+class LedgerNotMigrated(Exception):
+    """Balances credited before the ledger existed are not in it yet"""
+
+
+async def _ledger_totals(user_id: Optional[str] = None) -> dict:
+    pipeline = [{"$match": {"userId": user_id}}] if user_id else []
+    totals = {}
+    async for row in db.transactions.aggregate(pipeline + [
+        {"$group": {"_id": "$userId", "total": {"$sum": "$amount"}, "entries": {"$sum": 1}}}
+    ]):
+        totals[row["_id"]] = row
+    return totals
+
+
+async def opening_balances_recorded() -> bool:
+    return await db.migrations.find_one({"_id": OPENING_BALANCES_MIGRATION}) is not None
+
+
+async def record_opening_balances() -> int:
+    """
+    One-off migration: write an "opening" ledger entry for whatever part of
+    each stored balance the ledger does not explain (credits made before the
+    ledger existed). Run it once, while no balances are moving, before the
+    first reconcile with `fix`. Returns the number of entries written.
+    """
+    if await opening_balances_recorded():
+        return 0
+    totals = await _ledger_totals()
+    now = datetime.utcnow()
+    entries = []
+    async for user in db.users.find({}, {"balance": 1, "createdAt": 1}):
+        user_id = str(user["_id"])
+        opening = round(user.get("balance", 0.0) - totals.get(user_id, {}).get("total", 0.0), 2)
+        if abs(opening) < 0.005:
+            continue
+        entries.append({
+            "_id": f"opening-{user_id}",
+            "userId": user_id,
+            "type": "opening",
+            "amount": opening,
+            "balanceBefore": 0.0,
+            "balanceAfter": opening,
+            "description": "Açılış bakiyesi",
+            "createdAt": user.get("createdAt") or now
+        })
+
+    written = 0
+    for start in range(0, len(entries), 1000):
+        try:
+            result = await db.transactions.insert_many(entries[start:start + 1000], ordered=False)
+            written += len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Entries from an interrupted earlier run keep their original amount
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+            written += e.details.get("nInserted", 0)
+    await db.migrations.update_one(
+        {"_id": OPENING_BALANCES_MIGRATION},
+        {"$set": {"completedAt": datetime.utcnow(), "entries": written}},
+        upsert=True
+    )
+    return written
+
+
+async def reconcile_balances(fix: bool = False, tolerance: float = 0.005) -> list:
+    """
+    Recompute every balance from the ledger and report users whose stored
+    balance drifted. With `fix`, stored balances are reset to the ledger sum.
+    Fixing needs the opening-balance migration, and users without any ledger
+    entries are only reported, never reset.
+    """
+    if fix and not await opening_balances_recorded():
+        raise LedgerNotMigrated("Run record_opening_balances before fixing balances")
+    # Balances before the ledger: a debit landing in between moves the ledger
+    # sum but also the balance, so the guarded reset below skips that user
+    users = await db.users.find({}, {"balance": 1, "email": 1}).to_list(None)
+    totals = await _ledger_totals()
+
+    mismatches = []
+    for user in users:
+        user_id = str(user["_id"])
+        stored = user.get("balance", 0.0)
+        ledger = totals.get(user_id, {})
+        expected = round(ledger.get("total", 0.0), 2)
+        if abs(stored - expected) > tolerance:
+            mismatches.append({
+                "userId": user_id,
+                "email": user.get("email", ""),
+                "balance": stored,
+                "ledgerBalance": expected,
+                "difference": round(stored - expected, 2),
+                "ledgerEntries": ledger.get("entries", 0)
+            })
+
+    fixes = []
+    for m in mismatches:
+        if not (fix and m["ledgerEntries"]):
+            continue
+        # Without transactions a debit's $inc lands before its ledger entry
+        fresh = await _ledger_totals(m["userId"])
+        if abs(fresh.get(m["userId"], {}).get("total", 0.0) - m["ledgerBalance"]) > tolerance:
+            continue
+        fixes.append(UpdateOne(
+            # Only reset balances that have not moved since they were read
+            {"_id": ObjectId(m["userId"]), "balance": m["balance"]},
+            {"$set": {"balance": m["ledgerBalance"]}}
+        ))
+    if fixes:
+        await db.users.bulk_write(fixes, ordered=False)
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    import sys
+    if "--record-opening-balances" in sys.argv:
+        print(f"{asyncio.run(record_opening_balances())} opening entries written")
+    else:
+        for mismatch in asyncio.run(reconcile_balances(fix="--fix" in sys.argv)):
+            print(mismatch)
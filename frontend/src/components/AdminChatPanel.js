@@ -43,26 +43,26 @@ const AdminChatPanel = () => {
         setSessions(data.sessions || []);
       });
 
-      newSocket.on('new_session', (data) => {
-        // Add new session to list
-        setSessions((prev) => [{
-          _id: data.sessionId,
-          userName: data.userName,
-          userEmail: data.userEmail,
-          status: 'waiting',
-          startedAt: new Date().toISOString()
-        }, ...prev]);
-        
-        toast({
-          title: 'Yeni Destek Talebi',
-          description: `${data.userName} canlı destek talebinde bulundu`
-        });
+      newSocket.on('queue_delta', (delta) => {
+        if (delta.op === 'added') {
+          // Add new session to list
+          setSessions((prev) => [...prev.filter((s) => s._id !== delta.session._id), delta.session]);
+          
+          toast({
+            title: 'Yeni Destek Talebi',
+            description: `${delta.session.userName} canlı destek talebinde bulundu`
+          });
+        } else if (delta.op === 'removed') {
+          // Taken by another agent or closed while waiting
+          setSessions((prev) => prev.filter((s) => s._id !== delta.sessionId || s.status !== 'waiting'));
+        }
       });
 
       newSocket.on('session_taken', (data) => {
         setSelectedSession(data.sessionId);
         setMessages(data.messages || []);
-        setActiveSessions((prev) => [...prev, data.sessionId]);
+        setActiveSessions((prev) => (prev.includes(data.sessionId) ? prev : [...prev, data.sessionId]));
+        setSessions((prev) => prev.map((s) => (s._id === data.sessionId ? { ...s, status: 'active' } : s)));
       });
 
       newSocket.on('new_message', (message) => {
@@ -38,6 +38,7 @@ export const AuthProvider = ({ children }) => {
           // Token invalid, clear storage
           localStorage.removeItem('user');
           localStorage.removeItem('token');
+          localStorage.removeItem('refreshToken');
           setUser(null);
         })
         .finally(() => {
@@ -59,6 +60,7 @@ export const AuthProvider = ({ children }) => {
         setUser(userData);
         localStorage.setItem('user', JSON.stringify(userData));
         localStorage.setItem('token', response.data.token);
+        localStorage.setItem('refreshToken', response.data.refreshToken);
         return { success: true, user: userData };
       }
       return { success: false, error: 'Giriş başarısız' };
@@ -81,6 +83,7 @@ export const AuthProvider = ({ children }) => {
         setUser(user);
         localStorage.setItem('user', JSON.stringify(user));
         localStorage.setItem('token', response.data.token);
+        localStorage.setItem('refreshToken', response.data.refreshToken);
         return { success: true, user };
       }
       return { success: false, error: 'Kayıt başarısız' };
@@ -93,9 +96,14 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      authAPI.logout(refreshToken).catch(() => {});
+    }
     setUser(null);
     localStorage.removeItem('user');
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
   };
 
   const updateBalance = async (amount) => {
@@ -66,10 +66,15 @@ const SettingsPage = () => {
     
     setLoading(true);
     try {
-      await profileAPI.changePassword({
+      const response = await profileAPI.changePassword({
         currentPassword: passwordData.currentPassword,
         newPassword: passwordData.newPassword
       });
+      // Older tokens are revoked by the password change
+      if (response.data.token) {
+        localStorage.setItem('token', response.data.token);
+        localStorage.setItem('refreshToken', response.data.refreshToken);
+      }
       
       toast({
         title: 'Başarılı',
@@ -25,13 +25,73 @@ api.interceptors.request.use(
   }
 );
 
+// One refresh at a time; concurrent 401s wait for the same rotation
+let refreshPromise = null;
+
+// How long a tab that lost a refresh race waits for the winner to store the new pair
+const ROTATION_WAIT_MS = 5000;
+
+const waitForRotation = (previousRefreshToken) => new Promise((resolve, reject) => {
+  const startedAt = Date.now();
+  const check = () => {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken && refreshToken !== previousRefreshToken) {
+      resolve(localStorage.getItem('token'));
+    } else if (!refreshToken || Date.now() - startedAt > ROTATION_WAIT_MS) {
+      reject(new Error('Session was not refreshed'));
+    } else {
+      setTimeout(check, 100);
+    }
+  };
+  check();
+});
+
+const refreshSession = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshPromise = (refreshToken
+      ? axios.post(`${API_BASE}/auth/refresh`, { refreshToken })
+      : Promise.reject(new Error('No refresh token'))
+    )
+      .then((response) => {
+        localStorage.setItem('token', response.data.token);
+        localStorage.setItem('refreshToken', response.data.refreshToken);
+        return response.data.token;
+      })
+      .catch((refreshError) => {
+        // Another tab sharing this storage may have rotated the same token first
+        if (refreshToken && refreshError.response?.status === 401) {
+          return waitForRotation(refreshToken);
+        }
+        throw refreshError;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // Handle response errors
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const original = error.config;
+    if (error.response?.status === 401 && original && !original._retried && !/^\/auth\/(login|register|refresh|logout)/.test(original.url || '')) {
+      // Access token expired: rotate the refresh token and retry once
+      original._retried = true;
+      try {
+        const token = await refreshSession();
+        original.headers.Authorization = `Bearer ${token}`;
+        return api(original);
+      } catch (refreshError) {
+        // Fall through to sign-out
+      }
+    }
     if (error.response?.status === 401) {
       // Token expired or invalid
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
       localStorage.removeItem('user');
       window.location.href = '/login';
     }
@@ -43,7 +103,8 @@ api.interceptors.response.use(
 export const authAPI = {
   register: (data) => api.post('/auth/register', data),
   login: (data) => api.post('/auth/login', data),
-  getMe: () => api.get('/auth/me')
+  getMe: () => api.get('/auth/me'),
+  logout: (refreshToken) => api.post('/auth/logout', { refreshToken })
 };
 
 // Orders API
@@ -0,0 +1,35 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules import each other as top-level modules, as they do under uvicorn
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+BENCH_MONGO_URL = os.getenv("BENCH_MONGO_URL", "mongodb://localhost:27017")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "mongod: needs a throwaway mongod at BENCH_MONGO_URL")
+
+
+def _mongod_available() -> bool:
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+    client = MongoClient(BENCH_MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+
+def pytest_collection_modifyitems(config, items):
+    marked = [item for item in items if "mongod" in item.keywords]
+    if marked and not _mongod_available():
+        skip = pytest.mark.skip(reason=f"no mongod at {BENCH_MONGO_URL}")
+        for item in marked:
+            item.add_marker(skip)
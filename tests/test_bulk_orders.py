@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+import bulk_orders
+
+
+class FakeOrders:
+    """orders collection holding a set of taken codes per unique field"""
+
+    def __init__(self, taken=None, races=0):
+        self.taken = {"orderId": set(), "trackingCode": set(), **(taken or {})}
+        self.races = races
+        self.inserted = []
+
+    async def distinct(self, field, query):
+        return [code for code in query[field]["$in"] if code in self.taken[field]]
+
+    async def insert_many(self, docs, ordered=False, session=None):
+        if self.races:
+            # Another request took the first row's tracking code after the pre-check
+            self.races -= 1
+            self.inserted += docs[1:]
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}], "nInserted": len(docs) - 1})
+        self.inserted += docs
+
+    async def delete_many(self, query):
+        ids = set(query["_id"]["$in"])
+        self.inserted = [doc for doc in self.inserted if doc["_id"] not in ids]
+
+
+def orders(*codes):
+    return [{"orderId": order_id, "trackingCode": tracking} for order_id, tracking in codes]
+
+
+def prepaid(*codes):
+    return [
+        {**order, "_id": index, "price": 10.0, "paymentType": "prepaid", "shippingCompany": "Aras"}
+        for index, order in enumerate(orders(*codes))
+    ]
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    calls = []
+
+    def install(accept=True):
+        async def apply_balance_changes(user_id, entries, tx_type, **kwargs):
+            calls.append(entries)
+            return entries if accept else None
+        monkeypatch.setattr(bulk_orders, "apply_balance_changes", apply_balance_changes)
+        return calls
+    return install
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def install(collection):
+        monkeypatch.setattr(bulk_orders, "db", SimpleNamespace(orders=collection))
+        return collection
+    return install
+
+
+def test_unique_codes_regenerates_both_fields(fake_db):
+    fake_db(FakeOrders(taken={"trackingCode": {"TRK1"}}))
+    batch = orders(("KRG-1", "TRK1"), ("KRG-1", "TRK2"))
+    asyncio.run(bulk_orders._unique_codes(batch))
+    assert len({o["orderId"] for o in batch}) == 2
+    assert batch[0]["trackingCode"] != "TRK1"
+    assert batch[1]["trackingCode"] == "TRK2"
+
+
+def test_insert_retries_only_rejected_rows_outside_transaction(fake_db):
+    collection = fake_db(FakeOrders(races=1))
+    batch = orders(("KRG-1", "TRK1"), ("KRG-2", "TRK2"))
+    asyncio.run(bulk_orders._insert_orders(batch, session=None))
+    assert [o["orderId"] for o in collection.inserted] == ["KRG-2", batch[0]["orderId"]]
+    assert batch[0]["trackingCode"] != "TRK1"
+
+
+def test_insert_inside_transaction_reraises_for_a_full_retry(fake_db):
+    fake_db(FakeOrders(races=1))
+    with pytest.raises(BulkWriteError):
+        asyncio.run(bulk_orders._insert_orders(orders(("KRG-1", "TRK1")), session=object()))
+
+
+def test_other_write_errors_are_not_swallowed():
+    error = BulkWriteError({"writeErrors": [{"index": 0, "code": 121}]})
+    with pytest.raises(BulkWriteError):
+        bulk_orders._duplicate_rows(error)
+
+
+def test_insert_gives_up_after_repeated_collisions(fake_db):
+    fake_db(FakeOrders(races=10))
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(bulk_orders._insert_orders(orders(("KRG-1", "TRK1"), ("KRG-2", "TRK2")), session=None))
+    assert raised.value.status_code == 503
+
+
+def test_standalone_debit_uses_the_codes_that_were_inserted(fake_db, ledger):
+    collection = fake_db(FakeOrders(races=1))
+    entries = ledger()
+    batch = prepaid(("KRG-1", "TRK1"), ("KRG-2", "TRK2"))
+    asyncio.run(bulk_orders._persist_orders("user", batch, session=None))
+    inserted = {order["orderId"] for order in collection.inserted}
+    assert {entry["orderId"] for entry in entries[0]} == inserted
+    assert "KRG-1" not in inserted
+
+
+def test_standalone_rejected_debit_deletes_the_orders(fake_db, ledger):
+    collection = fake_db(FakeOrders())
+    ledger(accept=False)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(bulk_orders._persist_orders("user", prepaid(("KRG-1", "TRK1")), session=None))
+    assert raised.value.status_code == 400
+    assert collection.inserted == []
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from chat_dispatch import CHAT_MAX_SESSIONS_PER_AGENT, WaitingQueue, free_slots
+
+EPOCH = datetime(2026, 1, 1)
+
+
+def entry(session_id, minutes):
+    return {"_id": session_id, "startedAt": EPOCH + timedelta(minutes=minutes)}
+
+
+def test_oldest_first_and_lazy_removal():
+    queue = WaitingQueue()
+    for session_id, minutes in [("b", 2), ("a", 1), ("c", 3)]:
+        queue.add(entry(session_id, minutes))
+    assert queue.oldest()["_id"] == "a"
+    queue.remove("a")
+    assert queue.oldest()["_id"] == "b"
+    assert len(queue) == 2 and "a" not in queue
+
+
+def test_add_is_idempotent():
+    queue = WaitingQueue()
+    queue.add(entry("a", 1))
+    queue.add(entry("a", 1))
+    assert len(queue) == 1
+    queue.remove("a")
+    assert queue.oldest() is None
+
+
+def test_snapshot_is_ordered_and_limited():
+    queue = WaitingQueue()
+    for i in reversed(range(10)):
+        queue.add(entry(f"s{i}", i))
+    queue.remove("s1")
+    assert [e["_id"] for e in queue.snapshot(3)] == ["s0", "s2", "s3"]
+
+
+def test_dead_heap_entries_are_compacted():
+    queue = WaitingQueue()
+    for i in range(200):
+        queue.add(entry(f"s{i}", i))
+    for i in range(190):
+        queue.remove(f"s{i}")
+    assert len(queue._heap) < 200
+    assert queue.oldest()["_id"] == "s190"
+
+
+def test_sync_adds_remote_sessions_and_drops_claimed_ones():
+    queue = WaitingQueue()
+    for i in range(5):
+        queue.add(entry(f"s{i}", i))
+    # s1 was claimed elsewhere, r started on another worker; the list stops at s2
+    queue.sync([entry("s0", 0), entry("r", 0.5), entry("s2", 2)], complete=False)
+    assert [e["_id"] for e in queue.snapshot()] == ["s0", "r", "s2", "s3", "s4"]
+    queue.sync([entry("s4", 4)], complete=True)
+    assert [e["_id"] for e in queue.snapshot()] == ["s4"]
+
+
+def test_free_slots():
+    assert free_slots([]) == list(range(CHAT_MAX_SESSIONS_PER_AGENT))
+    assert 0 not in free_slots([{"agentSlot": 0}])
+    full = [{"agentSlot": slot} for slot in range(CHAT_MAX_SESSIONS_PER_AGENT)]
+    assert free_slots(full) == []
+    # Sessions claimed before slots existed still count
+    legacy = [{} for _ in range(CHAT_MAX_SESSIONS_PER_AGENT - 1)]
+    assert len(free_slots(legacy)) == 1
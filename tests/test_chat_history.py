@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import chat_history
+
+START = datetime(2026, 1, 1, 12, 0)
+
+
+class FakeMessages:
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def find_one(self, query, projection=None):
+        return next((m for m in self.messages if m["_id"] == query["_id"]), None)
+
+    def find(self, query):
+        position = query["$or"][1]
+        timestamp, message_id = position["timestamp"], position["_id"]["$gt"]
+        later = [m for m in self.messages if (m["timestamp"], m["_id"]) > (timestamp, message_id)]
+        return FakeFind(sorted(later, key=lambda m: (m["timestamp"], m["_id"])))
+
+
+class FakeFind:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        return self
+
+    def limit(self, count):
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeBuffer:
+    """Write-behind buffer holding messages the database has not seen yet"""
+
+    def __init__(self, collection, pending):
+        self.collection = collection
+        self.pending = pending
+
+    async def flush(self):
+        self.collection.messages += self.pending
+        self.pending = []
+
+
+def message(index):
+    return {"_id": f"m{index}", "sessionId": "s1", "timestamp": START + timedelta(seconds=index)}
+
+
+def test_sync_from_a_message_still_in_the_write_buffer(monkeypatch):
+    collection = FakeMessages([message(1)])
+    monkeypatch.setattr(chat_history, "db", SimpleNamespace(chat_messages=collection))
+    monkeypatch.setattr(chat_history, "message_buffer", FakeBuffer(collection, [message(2), message(3)]))
+
+    result = asyncio.run(chat_history.messages_since("s1", last_message_id="m2"))
+    assert result["reset"] is False
+    assert [m["_id"] for m in result["messages"]] == ["m3"]
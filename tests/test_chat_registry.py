@@ -0,0 +1,74 @@
+import asyncio
+
+from chat_registry import ConnectionRegistry
+
+
+def test_attach_and_detach_resolve_by_sid():
+    registry = ConnectionRegistry(grace_seconds=1)
+    registry.attach("s1", "user", "sid-u")
+    registry.attach("s1", "agent", "sid-a")
+    assert registry.sid_for("s1", "agent") == "sid-a"
+    assert registry.lookup("sid-u") == ("s1", "user")
+    assert registry.detach("sid-u") == ("s1", "user")
+    assert registry.sid_for("s1", "user") is None
+    assert registry.sid_for("s1", "agent") == "sid-a"
+    assert registry.detach("unknown") is None
+
+
+def test_reattach_replaces_previous_sid():
+    registry = ConnectionRegistry(grace_seconds=1)
+    registry.attach("s1", "user", "old")
+    registry.attach("s1", "user", "new")
+    assert registry.lookup("old") is None
+    assert len(registry) == 1
+
+
+def test_grace_timer_fires_when_side_does_not_return():
+    async def scenario():
+        expired = []
+
+        async def on_expire(session_id, role):
+            expired.append((session_id, role))
+
+        registry = ConnectionRegistry(grace_seconds=0.02)
+        registry.attach("s1", "user", "sid-1")
+        registry.detach("sid-1", on_expire=on_expire)
+        await asyncio.sleep(0.06)
+        return expired
+
+    assert asyncio.run(scenario()) == [("s1", "user")]
+
+
+def test_resume_within_grace_cancels_timer():
+    async def scenario():
+        expired = []
+
+        async def on_expire(session_id, role):
+            expired.append((session_id, role))
+
+        registry = ConnectionRegistry(grace_seconds=0.05)
+        registry.attach("s1", "user", "sid-1")
+        registry.detach("sid-1", on_expire=on_expire)
+        resumed = registry.attach("s1", "user", "sid-2")
+        await asyncio.sleep(0.1)
+        return resumed, expired
+
+    assert asyncio.run(scenario()) == (True, [])
+
+
+def test_drop_session_cancels_timers():
+    async def scenario():
+        expired = []
+
+        async def on_expire(session_id, role):
+            expired.append(role)
+
+        registry = ConnectionRegistry(grace_seconds=0.02)
+        registry.attach("s1", "user", "u")
+        registry.attach("s1", "agent", "a")
+        registry.detach("u", on_expire=on_expire)
+        registry.drop_session("s1")
+        await asyncio.sleep(0.06)
+        return expired, len(registry)
+
+    assert asyncio.run(scenario()) == ([], 0)
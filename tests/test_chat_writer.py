@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from chat_writer import ChatMessageBuffer
+
+
+class RecordingBuffer(ChatMessageBuffer):
+    """Buffer whose database write is replaced by a list of batches"""
+
+    def __init__(self, *args, fail_times=0, gate=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+        self.fail_times = fail_times
+        self.gate = gate
+
+    async def _write(self, batch):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("write failed")
+        self.batches.append([message["_id"] for message in batch])
+
+
+def message(i):
+    return {"_id": f"m{i}", "sessionId": "s1", "timestamp": datetime(2026, 1, 1) + timedelta(seconds=i)}
+
+
+def test_without_flusher_writes_through():
+    async def scenario():
+        buffer = RecordingBuffer(batch_size=10)
+        await buffer.enqueue(message(1))
+        return buffer.batches, len(buffer)
+
+    assert asyncio.run(scenario()) == ([["m1"]], 0)
+
+
+def test_flush_splits_into_batches_in_order():
+    async def scenario():
+        buffer = RecordingBuffer(batch_size=2)
+        buffer._task = object()  # pretend a flusher runs, so enqueue only queues
+        for i in range(5):
+            await buffer.enqueue(message(i))
+        buffer._task = None
+        written = await buffer.flush()
+        return written, buffer.batches
+
+    assert asyncio.run(scenario()) == (5, [["m0", "m1"], ["m2", "m3"], ["m4"]])
+
+
+def test_failed_batch_is_put_back_in_order():
+    async def scenario():
+        buffer = RecordingBuffer(batch_size=2, fail_times=1)
+        buffer._task = object()
+        for i in range(3):
+            await buffer.enqueue(message(i))
+        buffer._task = None
+        with pytest.raises(RuntimeError):
+            await buffer.flush()
+        pending = [m["_id"] for m in buffer._pending]
+        await buffer.flush()
+        return pending, buffer.batches
+
+    assert asyncio.run(scenario()) == (["m0", "m1", "m2"], [["m0", "m1"], ["m2"]])
+
+
+def test_senders_block_when_buffer_is_full():
+    async def scenario():
+        gate = asyncio.Event()
+        buffer = RecordingBuffer(batch_size=10, interval_ms=5, max_pending=2, gate=gate)
+        buffer.start()
+        await buffer.enqueue(message(0))
+        await buffer.enqueue(message(1))
+        blocked = asyncio.create_task(buffer.enqueue(message(2)))
+        await asyncio.sleep(0.03)
+        was_blocked = not blocked.done()
+        gate.set()
+        await asyncio.wait_for(blocked, 1)
+        await buffer.stop()
+        return was_blocked, [m for batch in buffer.batches for m in batch]
+
+    assert asyncio.run(scenario()) == (True, ["m0", "m1", "m2"])
+
+
+def test_background_flusher_drains_on_interval_and_stop():
+    async def scenario():
+        buffer = RecordingBuffer(batch_size=100, interval_ms=10)
+        buffer.start()
+        await buffer.enqueue(message(0))
+        await asyncio.sleep(0.05)
+        after_interval = list(buffer.batches)
+        await buffer.enqueue(message(1))
+        await buffer.stop()
+        return after_interval, buffer.batches, len(buffer)
+
+    assert asyncio.run(scenario()) == ([["m0"]], [["m0"], ["m1"]], 0)
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from routes import order_routes
+
+
+class FakeOrders:
+    def __init__(self, taken=()):
+        self.taken = set(taken)
+        self.stored = {}
+
+    async def insert_one(self, doc, session=None):
+        if doc["orderId"] in self.taken:
+            raise DuplicateKeyError("E11000 duplicate key error")
+        self.stored[doc["_id"]] = dict(doc)
+
+    async def delete_one(self, query):
+        self.stored.pop(query["_id"], None)
+
+
+@pytest.fixture
+def orders(monkeypatch):
+    async def standalone(callback):
+        return await callback(None)
+
+    def install(collection, accept=True):
+        debits = []
+
+        async def apply_balance_change(user_id, amount, tx_type, description, **fields):
+            debits.append(fields["orderId"])
+            return {"orderId": fields["orderId"]} if accept else None
+
+        monkeypatch.setattr(order_routes, "db", SimpleNamespace(orders=collection))
+        monkeypatch.setattr(order_routes, "run_in_transaction", standalone)
+        monkeypatch.setattr(order_routes, "apply_balance_change", apply_balance_change)
+        return debits
+    return install
+
+
+def order(order_id="KRG-202601-0001"):
+    return {"_id": 1, "userId": "user", "orderId": order_id, "trackingCode": "TRK1", "shippingCompany": "Aras"}
+
+
+def test_taken_order_id_is_regenerated_before_the_debit(orders):
+    collection = FakeOrders(taken={"KRG-202601-0001"})
+    debits = orders(collection)
+    doc = order()
+    asyncio.run(order_routes._create_order_records(doc, 10.0, True))
+    assert doc["orderId"] != "KRG-202601-0001"
+    assert debits == [doc["orderId"]]
+    assert collection.stored[1]["orderId"] == doc["orderId"]
+
+
+def test_rejected_debit_removes_the_order_without_a_transaction(orders):
+    collection = FakeOrders()
+    orders(collection, accept=False)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(order_routes._create_order_records(order(), 10.0, True))
+    assert raised.value.status_code == 400
+    assert collection.stored == {}
+
+
+def test_gives_up_after_repeated_collisions(orders, monkeypatch):
+    monkeypatch.setitem(order_routes.GENERATED_CODES, "orderId", lambda: "KRG-202601-0001")
+    debits = orders(FakeOrders(taken={"KRG-202601-0001"}))
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(order_routes._create_order_records(order(), 10.0, True))
+    assert raised.value.status_code == 503
+    assert debits == []
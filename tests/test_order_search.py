@@ -0,0 +1,42 @@
+import re
+
+import pytest
+
+from order_search import build_order_search_query, fold_turkish, recipient_name_key
+
+
+@pytest.mark.parametrize("text,folded", [
+    ("AYŞE", "ayşe"),
+    ("İsmail", "ismail"),
+    ("IŞIL", "ışıl"),
+    ("  Ali   Kaya ", "ali kaya"),
+    (None, ""),
+])
+def test_fold_turkish(text, folded):
+    assert fold_turkish(text) == folded
+
+
+def test_recipient_name_key_matches_search_fold():
+    assert recipient_name_key("ŞÜKRÜ Öztürk") == fold_turkish("şükrü ÖZTÜRK")
+
+
+def test_search_query_is_anchored_prefix_per_index():
+    query = build_order_search_query("  krg-2024 ")
+    assert query == {"$or": [
+        {"orderId": {"$regex": "^KRG\\-2024"}},
+        {"trackingCode": {"$regex": "^KRG\\-2024"}},
+        {"recipientNameKey": {"$regex": "^krg\\-2024"}}
+    ]}
+
+
+def test_search_query_escapes_regex_input():
+    clauses = build_order_search_query("a.*(")["$or"]
+    assert clauses[0]["orderId"]["$regex"] == "^A\\.\\*\\("
+    assert clauses[2]["recipientNameKey"]["$regex"] == "^a\\.\\*\\("
+    assert not re.match(clauses[2]["recipientNameKey"]["$regex"], "abc(")
+
+
+def test_search_query_turkish_name_and_code():
+    clauses = build_order_search_query("İrem")["$or"]
+    assert clauses[0]["orderId"]["$regex"] == "^IREM"
+    assert clauses[2]["recipientNameKey"]["$regex"] == "^irem"
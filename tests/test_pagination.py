@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from pagination import _after, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip_object_id():
+    doc = {"_id": ObjectId(), "createdAt": datetime(2026, 3, 1, 12, 30, 15, 123000)}
+    assert decode_cursor(encode_cursor(doc)) == (doc["createdAt"], doc["_id"])
+
+
+def test_cursor_round_trip_string_id_and_missing_created_at():
+    created_at, doc_id = decode_cursor(encode_cursor({"_id": "tx-1"}))
+    assert created_at is None
+    assert doc_id == "tx-1"
+
+
+def test_cursor_is_url_safe_without_padding():
+    token = encode_cursor({"_id": ObjectId(), "createdAt": datetime(2026, 1, 1)})
+    assert "=" not in token and "+" not in token and "/" not in token
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", "eyJ0IjoxfQ", encode_cursor({"_id": "x"})[:-3]])
+def test_invalid_cursor_is_400(token):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(token)
+    assert raised.value.status_code == 400
+
+
+def test_after_breaks_ties_on_id():
+    created_at, doc_id = datetime(2026, 1, 1), ObjectId()
+    assert _after(created_at, doc_id) == {"$or": [
+        {"createdAt": {"$lt": created_at}},
+        {"createdAt": created_at, "_id": {"$lt": doc_id}},
+        {"createdAt": None}
+    ]}
+    assert _after(None, doc_id) == {"createdAt": None, "_id": {"$lt": doc_id}}
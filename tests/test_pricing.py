@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from pricing import LOCAL, NATIONAL, REGIONAL, PricingEngine, city_key, zones_for
+
+CATALOGUE = {
+    "flat": {"_id": "flat", "name": "Flat Kargo", "price": 50.0, "isActive": True},
+    "banded": {
+        "_id": "banded", "name": "Bant Kargo", "price": 45.0, "isActive": True,
+        "tariff": {
+            "bands": [{"upTo": 5, "price": 40.0}, {"upTo": 1, "price": 30.0}],
+            "extraPerUnit": 2.0,
+            "zoneMultipliers": {"local": 1.0, "regional": 1.25, "national": 1.5},
+            "codFee": 10.0,
+            "codRate": 0.01
+        }
+    },
+    "inactive": {"_id": "inactive", "name": "Kapalı Kargo", "price": 1.0, "isActive": False},
+}
+
+
+@pytest.mark.parametrize("spelling", ["İstanbul", "Istanbul", "ISTANBUL", "istanbul", "  İstanbul "])
+def test_city_key_istanbul_spellings(spelling):
+    assert city_key(spelling) == "istanbul"
+
+
+@pytest.mark.parametrize("turkish,ascii_", [
+    ("Muğla", "Mugla"), ("İzmir", "Izmir"), ("Şanlıurfa", "Sanliurfa"),
+    ("Çanakkale", "Canakkale"), ("Iğdır", "IGDIR"), ("Gümüşhane", "Gumushane"), ("Kırşehir", "Kirsehir"),
+])
+def test_city_key_matches_ascii_spelling(turkish, ascii_):
+    assert city_key(turkish) == city_key(ascii_)
+
+
+def test_zones_for_ascii_input():
+    zones = zones_for("Istanbul", ["istanbul", "Bursa", "Izmir", "Mugla", "Ankara"])
+    assert zones.tolist() == [LOCAL, REGIONAL, NATIONAL, NATIONAL, NATIONAL]
+    assert zones_for("Izmir", ["Mugla", "İZMİR"]).tolist() == [REGIONAL, LOCAL]
+
+
+def test_price_one_istanbul_ascii_is_local():
+    engine = PricingEngine(CATALOGUE)
+    turkish = engine.price_one("banded", 3, 2, "İstanbul")
+    assert engine.price_one("banded", 3, 2, "Istanbul") == turkish == 40.0
+
+
+def test_bands_extra_units_and_cod():
+    engine = PricingEngine(CATALOGUE)
+    prices = engine.price_rows(
+        ["banded"] * 4, [0.5, 5, 7.2, 1], [0, 0, 0, 0], ["İstanbul"] * 4, [0, 0, 0, 200], origin="İstanbul"
+    )
+    assert prices.tolist() == [30.0, 40.0, 40.0 + 3 * 2.0, 30.0 + 10.0 + 2.0]
+
+
+def test_flat_price_zone_neutral_and_unknown_carrier():
+    engine = PricingEngine(CATALOGUE)
+    prices = engine.price_rows(["flat", "missing"], [3, 3], [0, 0], ["Van", "Van"], [0, 0])
+    assert prices[0] == 50.0
+    assert np.isnan(prices[1])
+
+
+def test_cheapest_skips_inactive_carriers():
+    engine = PricingEngine(CATALOGUE)
+    [result] = engine.cheapest([{"weight": 2, "desi": 1, "recipientCity": "Ankara", "paymentType": "prepaid"}],
+                               include_all=True)
+    assert result["cheapest"] == {"shippingCompanyId": "flat", "name": "Flat Kargo", "price": 50.0}
+    assert [quote["shippingCompanyId"] for quote in result["quotes"]] == ["flat", "banded"]
+    assert result["quotes"][1]["price"] == 60.0
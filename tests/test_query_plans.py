@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from benchmarks import query_plans
+
+
+@pytest.mark.mongod
+def test_query_shapes_avoid_collscan_and_sort():
+    results, failures = asyncio.run(query_plans.check_plans(docs=500, seed=7))
+    assert len(results) == len(query_plans.shapes(query_plans.datetime.utcnow()))
+    assert not failures, failures
+
+
+def test_plan_stages_ignore_rejected_plans():
+    explain = {"queryPlanner": {
+        "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+        "rejectedPlans": [{"stage": "COLLSCAN"}],
+    }}
+    assert query_plans.plan_stages(explain, set()) == {"FETCH", "IXSCAN"}
+
+
+def test_every_exemption_is_explained():
+    for shape in query_plans.shapes(query_plans.datetime.utcnow()):
+        assert not shape["allow"] or shape["why"], shape["name"]
+        assert shape["command"].get(next(iter(shape["command"]))) in query_plans.indexes.INDEXES, shape["name"]
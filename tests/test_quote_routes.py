@@ -0,0 +1,18 @@
+from routes import quote_routes
+
+
+def test_quota_is_per_user_and_resets_with_window(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(quote_routes.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(quote_routes, "QUOTE_PARCELS_PER_WINDOW", 100)
+    monkeypatch.setattr(quote_routes, "_quote_usage", {})
+
+    assert quote_routes._consume_quota("a", 60) == 0
+    assert quote_routes._consume_quota("a", 40) == 0
+    assert quote_routes._consume_quota("b", 100) == 0
+
+    clock[0] += 15
+    assert quote_routes._consume_quota("a", 1) == 45
+
+    clock[0] += 45
+    assert quote_routes._consume_quota("a", 100) == 0
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+import refresh_tokens
+from refresh_tokens import RefreshError
+
+USER = "64b0000000000000000000bb"
+
+
+class FakeRefreshTokens:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_update(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc["usedAt"] is not None or doc["expiresAt"] <= query["expiresAt"]["$gt"]:
+            return None
+        before = dict(doc)
+        doc.update(update["$set"])
+        return before
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    async def delete_many(self, query):
+        self.docs = {key: doc for key, doc in self.docs.items() if doc["family"] != query["family"]}
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    collection = FakeRefreshTokens()
+    user = {"_id": ObjectId(USER), "role": "user", "tokenVersion": 0}
+
+    async def find_user(query, projection=None):
+        return user if query["_id"] == user["_id"] else None
+
+    monkeypatch.setattr(refresh_tokens, "db", SimpleNamespace(
+        refresh_tokens=collection, users=SimpleNamespace(find_one=find_user)
+    ))
+    return collection, user
+
+
+def rotate(token):
+    return asyncio.run(refresh_tokens.rotate_refresh_token(token))
+
+
+def age(collection, token, seconds):
+    """Pretend the token was consumed `seconds` ago"""
+    doc = collection.docs[refresh_tokens._hash(token)]
+    doc["usedAt"] -= timedelta(seconds=seconds)
+
+
+def test_rotation_issues_a_successor_and_consumes_the_old_token(tokens):
+    collection, _ = tokens
+    first = asyncio.run(refresh_tokens.issue_session(USER, "user"))["refreshToken"]
+    second = rotate(first)["refreshToken"]
+
+    assert second != first
+    with pytest.raises(RefreshError):
+        rotate(first)
+    # Within the reuse grace the family survives, so the successor still works
+    assert rotate(second)["token"]
+    # Stored as hashes only, all in one family
+    assert first not in collection.docs
+    assert len({doc["family"] for doc in collection.docs.values()}) == 1
+
+
+def test_reuse_after_grace_revokes_the_whole_family(tokens):
+    collection, _ = tokens
+    first = asyncio.run(refresh_tokens.issue_session(USER, "user"))["refreshToken"]
+    second = rotate(first)["refreshToken"]
+    other = asyncio.run(refresh_tokens.issue_session(USER, "user"))["refreshToken"]
+    age(collection, first, refresh_tokens.REFRESH_REUSE_GRACE_SECONDS + 1)
+
+    with pytest.raises(RefreshError):
+        rotate(first)
+    # The successor an attacker may hold is gone too; other sessions are not
+    with pytest.raises(RefreshError):
+        rotate(second)
+    assert rotate(other)["refreshToken"]
+
+
+def test_session_revocation_retires_refresh_tokens(tokens):
+    _, user = tokens
+    token = asyncio.run(refresh_tokens.issue_session(USER, "user"))["refreshToken"]
+    user["tokenVersion"] = 1
+
+    with pytest.raises(RefreshError):
+        rotate(token)
@@ -0,0 +1,81 @@
+import asyncio
+
+from request_metrics import (
+    IN_FLIGHT,
+    REQUEST_SECONDS,
+    RESPONSE_BYTES,
+    Histogram,
+    MetricsMiddleware,
+    render_prometheus,
+)
+
+
+def call(app, path):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+    asyncio.run(MetricsMiddleware(app)(scope, receive, send))
+    return sent
+
+
+def series(histogram, labels):
+    return histogram._series.get(labels, [0] * (len(histogram.buckets) + 2))
+
+
+def test_latency_stops_at_last_body_not_background_work():
+    in_flight_after_body = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b"abc", "more_body": True})
+        await send({"type": "http.response.body", "body": b"de"})
+        in_flight_after_body.append(IN_FLIGHT._values.get(()))
+        # Starlette background tasks run here, after the response is complete
+        await asyncio.sleep(0.2)
+
+    labels = ("GET", "unmatched")
+    before_seconds = series(REQUEST_SECONDS, labels)
+    before_bytes = series(RESPONSE_BYTES, labels)
+    in_flight = IN_FLIGHT._values.get((), 0.0)
+
+    sent = call(app, "/background")
+
+    after_seconds = series(REQUEST_SECONDS, labels)
+    assert after_seconds[-1] == before_seconds[-1] + 1
+    assert after_seconds[-2] - before_seconds[-2] < 0.1
+    assert series(RESPONSE_BYTES, labels)[-2] - before_bytes[-2] == 5
+    assert in_flight_after_body == [in_flight]
+    assert any(name == b"server-timing" for name, _ in sent[0]["headers"])
+
+
+def test_failed_request_is_recorded_once():
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    labels = ("GET", "unmatched")
+    before = series(REQUEST_SECONDS, labels)[-1]
+    in_flight = IN_FLIGHT._values.get((), 0.0)
+    try:
+        call(app, "/boom")
+    except RuntimeError:
+        pass
+    assert series(REQUEST_SECONDS, labels)[-1] == before + 1
+    assert IN_FLIGHT._values.get(()) == in_flight
+    assert 'http_requests_total{method="GET",route="unmatched",status="500"}' in render_prometheus()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "help", ("route",), (1, 5))
+    for value in (0.5, 3, 3, 10):
+        histogram.observe(("/x",), value)
+    lines = histogram.render()
+    assert 'h_bucket{route="/x",le="1"} 1' in lines
+    assert 'h_bucket{route="/x",le="5"} 3' in lines
+    assert 'h_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'h_count{route="/x"} 4' in lines
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+import session_versions
+from auth import authenticate_token, create_session_token
+
+USER = "64b0000000000000000000aa"
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeDb:
+    """users with tokenVersion and the token_revocations feed, shared by every 'worker'"""
+
+    def __init__(self):
+        self.versions = {USER: 0}
+        self.feed = []
+        self.users = SimpleNamespace(find_one_and_update=self.bump, find=self.find_users)
+        self.token_revocations = SimpleNamespace(insert_one=self.publish, find=self.find_revocations)
+
+    async def bump(self, query, update, **kwargs):
+        user_id = str(query["_id"])
+        self.versions[user_id] += update["$inc"]["tokenVersion"]
+        return {"_id": query["_id"], "tokenVersion": self.versions[user_id]}
+
+    def find_users(self, query, projection):
+        return FakeCursor([
+            {"_id": ObjectId(user_id), "tokenVersion": version}
+            for user_id, version in self.versions.items() if version > 0
+        ])
+
+    async def publish(self, entry):
+        self.feed.append(entry)
+
+    def find_revocations(self, query, projection):
+        since = query["createdAt"]["$gte"]
+        return FakeCursor([entry for entry in self.feed if entry["createdAt"] >= since])
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDb()
+    monkeypatch.setattr(session_versions, "db", fake)
+    monkeypatch.setattr(session_versions, "_versions", {})
+    monkeypatch.setattr(session_versions, "_last_polled", None)
+    return fake
+
+
+def other_worker(monkeypatch):
+    """Forget what this worker applied itself, as if the revocation happened elsewhere"""
+    monkeypatch.setattr(session_versions, "_versions", {})
+
+
+def test_revocation_refuses_existing_tokens_on_this_worker(fake_db):
+    token = create_session_token(USER, "user", 0)
+    assert authenticate_token(token)["userId"] == USER
+
+    assert asyncio.run(session_versions.revoke_user_sessions(USER, "password_change")) == 1
+    # Refused even though the verified token is still cached
+    assert authenticate_token(token) is None
+    assert authenticate_token(create_session_token(USER, "user", 1))["userId"] == USER
+
+
+def test_other_workers_refuse_the_token_after_the_next_poll(fake_db, monkeypatch):
+    token = create_session_token(USER, "user", 0)
+    asyncio.run(session_versions.load_session_versions())
+    asyncio.run(session_versions.revoke_user_sessions(USER, "admin"))
+    other_worker(monkeypatch)
+    assert authenticate_token(token) is not None
+
+    asyncio.run(session_versions.poll_revocations())
+    assert authenticate_token(token) is None
+    assert session_versions.current_version(USER) == 1
+
+
+def test_startup_load_applies_stored_versions(fake_db):
+    fake_db.versions[USER] = 3
+    asyncio.run(session_versions.load_session_versions())
+    assert not session_versions.is_current(USER, 2)
+    assert session_versions.is_current(USER, 3)
+
+
+def test_versions_never_go_backwards(fake_db):
+    session_versions._apply(USER, 5)
+    fake_db.feed.append({"userId": USER, "version": 2, "createdAt": datetime.utcnow()})
+    session_versions._last_polled = datetime.utcnow()
+    asyncio.run(session_versions.poll_revocations())
+    assert session_versions.current_version(USER) == 5
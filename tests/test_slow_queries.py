@@ -0,0 +1,72 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from slow_queries import SlowQueryLog, command_shape, query_shape
+
+
+def test_query_shape_hides_values():
+    shape = query_shape({
+        "userId": "u1",
+        "createdAt": {"$gte": datetime(2026, 1, 1)},
+        "_id": ObjectId(),
+        "status": {"$in": ["a", "b", "c"]},
+        "$or": [{"orderId": {"$regex": "^KRG"}}, {"price": 10.5}],
+    })
+    assert shape == {
+        "userId": "str",
+        "createdAt": {"$gte": "datetime"},
+        "_id": "ObjectId",
+        "status": {"$in": "[3]"},
+        "$or": [{"orderId": {"$regex": "str"}}, {"price": "float"}],
+    }
+
+
+def test_query_shape_truncates_wide_documents():
+    assert len(query_shape({f"f{i}": i for i in range(50)})) == 10
+
+
+def test_command_shapes():
+    find = command_shape("find", {"find": "orders", "filter": {"userId": "u"}, "sort": {"createdAt": -1}, "limit": 21})
+    assert find == {"filter": {"userId": "str"}, "sort": {"createdAt": -1}, "limit": 21}
+    update = command_shape("update", {"update": "users", "updates": [{"q": {"_id": ObjectId()}}, {"q": {"email": "x"}}]})
+    assert update == {"filter": [{"_id": "ObjectId"}, {"email": "str"}], "statements": 2}
+    assert command_shape("insert", {"insert": "orders", "documents": [{}, {}]}) == {"documents": 2}
+    assert command_shape("aggregate", {"aggregate": "orders", "pipeline": [{"$match": {"status": "x"}}]}) == {
+        "filter": [{"$match": {"status": "str"}}]
+    }
+
+
+def event(command_name, command=None, micros=0, request_id=1):
+    return SimpleNamespace(
+        command_name=command_name, command=command or {command_name: "orders"}, request_id=request_id,
+        connection_id=("localhost", 27017), database_name="kargo", duration_micros=micros, failure=None
+    )
+
+
+def test_log_keeps_only_slow_commands():
+    log = SlowQueryLog(threshold_ms=100, size=2)
+    for request_id, micros in enumerate([50_000, 150_000, 250_000, 350_000]):
+        started = event("find", {"find": "orders", "filter": {"userId": "secret"}}, micros, request_id)
+        log.started(started)
+        log.succeeded(started)
+    recent = log.recent()
+    assert log.total == 3
+    assert [entry["durationMs"] for entry in recent["entries"]] == [350.0, 250.0]
+    assert recent["entries"][0]["shape"] == {"filter": {"userId": "str"}}
+    assert recent["entries"][0]["collection"] == "orders"
+    assert "secret" not in str(recent)
+    assert not log._pending
+
+
+def test_log_skips_handshakes_and_records_failures():
+    log = SlowQueryLog(threshold_ms=0, size=10)
+    hello = event("hello", micros=10_000)
+    log.started(hello)
+    log.succeeded(hello)
+    failed = event("find", micros=5_000, request_id=2)
+    failed.failure = {"errmsg": "boom"}
+    log.started(failed)
+    log.failed(failed)
+    assert [(e["command"], e["failure"]) for e in log.recent()["entries"]] == [("find", "boom")]
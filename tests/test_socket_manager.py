@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import socket_manager
+
+
+class FakeSessions:
+    """One chat session document; filters on `connectedSid.<role>` and `disconnectedAt.<role>`"""
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    def _matches(self, query):
+        for key, condition in query.items():
+            if key == "_id":
+                continue
+            field, role = key.split(".")
+            value = self.doc.get(field, {}).get(role)
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$lte" in condition and (value is None or value > condition["$lte"]):
+                return False
+        return True
+
+    def _apply(self, update):
+        for key, value in update.get("$set", {}).items():
+            field, role = key.split(".")
+            self.doc.setdefault(field, {})[role] = value
+        for key in update.get("$unset", {}):
+            field, role = key.split(".")
+            self.doc.get(field, {}).pop(role, None)
+
+    async def update_one(self, query, update):
+        if not self._matches(query):
+            return SimpleNamespace(modified_count=0)
+        self._apply(update)
+        return SimpleNamespace(modified_count=1)
+
+    async def find_one_and_update(self, query, update, projection=None):
+        if not self._matches(query):
+            return None
+        self._apply(update)
+        return {"_id": self.doc["_id"]}
+
+
+@pytest.fixture
+def session(monkeypatch):
+    sessions = FakeSessions({"_id": "s1", "connectedSid": {"user": "old"}})
+    emitted = []
+
+    async def emit(event, data, **kwargs):
+        emitted.append(event)
+
+    monkeypatch.setattr(socket_manager, "db", SimpleNamespace(chat_sessions=sessions))
+    monkeypatch.setattr(socket_manager.sio, "emit", emit)
+    monkeypatch.setattr(socket_manager.registry, "grace_seconds", 0)
+    return sessions, emitted
+
+
+def test_disconnect_after_resume_elsewhere_is_not_recorded(session):
+    sessions, emitted = session
+
+    async def scenario():
+        # The user resumed on another worker before this one saw the old sid drop
+        await socket_manager.mark_connected("s1", "user", "new")
+        recorded = await socket_manager.mark_disconnected("s1", "user", "old")
+        await socket_manager.participant_left("s1", "user")
+        return recorded
+
+    assert asyncio.run(scenario()) is False
+    assert sessions.doc.get("disconnectedAt", {}) == {}
+    assert emitted == []
+
+
+def test_disconnect_without_resume_expires(session):
+    sessions, emitted = session
+
+    async def scenario():
+        recorded = await socket_manager.mark_disconnected("s1", "user", "old")
+        await socket_manager.participant_left("s1", "user")
+        return recorded
+
+    assert asyncio.run(scenario()) is True
+    assert emitted == ["participant_left"]
+
+
+def test_resume_after_disconnect_cancels_the_expiry(session):
+    sessions, emitted = session
+
+    async def scenario():
+        await socket_manager.mark_disconnected("s1", "user", "old")
+        await socket_manager.mark_connected("s1", "user", "new")
+        await socket_manager.participant_left("s1", "user")
+
+    asyncio.run(scenario())
+    assert sessions.doc["connectedSid"] == {"user": "new"}
+    assert emitted == []
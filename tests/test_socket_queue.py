@@ -0,0 +1,43 @@
+import asyncio
+import tempfile
+
+import socketio
+
+from benchmarks import chat_multiworker
+from socket_queue import AsyncUnixSocketManager
+
+
+def test_unix_socket_manager_delivers_across_workers():
+    # Worker processes each emit to one room; run() asserts every participant got every message
+    chat_multiworker.run(workers=3)
+
+
+def test_broadcast_reaches_other_managers_only():
+    async def scenario(directory):
+        received = {0: [], 1: []}
+        managers = []
+        for index in received:
+            manager = AsyncUnixSocketManager(f"unix://{directory}")
+            socketio.AsyncServer(async_mode="asgi", client_manager=manager)
+            manager.on_broadcast("tracking_invalidated", received[index].append)
+            manager.initialize()
+            managers.append(manager)
+        for _ in range(500):
+            if all(manager.socket_path.exists() for manager in managers):
+                break
+            await asyncio.sleep(0.01)
+        managers[0]._peers_listed_at = 0.0
+
+        await managers[0].broadcast("tracking_invalidated", {"trackingCode": "TRK1"})
+        for _ in range(100):
+            if received[1]:
+                break
+            await asyncio.sleep(0.01)
+        for manager in managers:
+            manager.thread.cancel()
+        return received
+
+    # Not tmp_path: Unix socket paths are limited to 107 bytes
+    with tempfile.TemporaryDirectory(prefix="sq-") as directory:
+        received = asyncio.run(scenario(directory))
+    assert received == {0: [], 1: [{"trackingCode": "TRK1"}]}
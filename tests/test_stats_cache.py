@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+import stats_cache
+
+
+class FakeStats:
+    def __init__(self, doc):
+        self.doc = doc
+        self.before_recount_set = None
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        for key, step in update["$inc"].items():
+            self.doc[key] = self.doc.get(key, 0) + step
+        return dict(self.doc)
+
+    async def update_one(self, query, update, upsert=False):
+        if any(self.doc.get(key) != value for key, value in query.items()):
+            return SimpleNamespace(matched_count=0)
+        for key, step in update.get("$inc", {}).items():
+            self.doc[key] = self.doc.get(key, 0) + step
+        self.doc.update(update.get("$set", {}))
+        return SimpleNamespace(matched_count=1)
+
+
+def run_refresh(monkeypatch, stats, during_recount=None):
+    async def recount():
+        if during_recount:
+            await during_recount()
+        return {"totalShipments": 10, "totalUsers": 3}
+
+    async def figure(*args):
+        return 0.0
+
+    monkeypatch.setattr(stats_cache, "db", SimpleNamespace(stats=stats))
+    monkeypatch.setattr(stats_cache, "_recount", recount)
+    monkeypatch.setattr(stats_cache, "_monthly_growth", figure)
+    monkeypatch.setattr(stats_cache, "_average_delivery_days", figure)
+    asyncio.run(stats_cache.refresh_stats())
+
+
+def test_recount_replaces_counters_when_nothing_moved(monkeypatch):
+    stats = FakeStats({"_id": stats_cache.STATS_DOC_ID, "totalShipments": 7, "totalUsers": 3})
+    run_refresh(monkeypatch, stats)
+    assert stats.doc["totalShipments"] == 10
+    assert "refreshedAt" in stats.doc
+
+
+def test_recount_keeps_increments_made_while_it_ran(monkeypatch):
+    stats = FakeStats({"_id": stats_cache.STATS_DOC_ID, "totalShipments": 7, "totalUsers": 3})
+    run_refresh(monkeypatch, stats, lambda: stats_cache.record_user_registered())
+    assert stats.doc["totalUsers"] == 4
+    assert stats.doc["totalShipments"] == 7
+    assert "refreshedAt" in stats.doc
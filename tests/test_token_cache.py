@@ -0,0 +1,47 @@
+import time
+
+from token_cache import TokenCache
+
+
+def test_hit_miss_and_digest_keys():
+    cache = TokenCache(max_entries=10, enabled=True)
+    assert cache.get("token") is None
+    cache.put("token", {"userId": "u1"}, time.time() + 60)
+    assert cache.get("token") == {"userId": "u1"}
+    assert "token" not in cache._entries
+    assert cache.metrics()["hits"] == 1 and cache.metrics()["misses"] == 1
+
+
+def test_expired_entry_is_dropped():
+    cache = TokenCache(enabled=True)
+    cache.put("token", {"userId": "u1"}, time.time() - 1)
+    assert cache.get("token") is None
+    assert cache.metrics()["entries"] == 0
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = TokenCache(max_entries=2, enabled=True)
+    expires = time.time() + 60
+    cache.put("a", {"userId": "a"}, expires)
+    cache.put("b", {"userId": "b"}, expires)
+    cache.get("a")
+    cache.put("c", {"userId": "c"}, expires)
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.evictions == 1
+
+
+def test_disabled_and_tokens_without_exp_are_not_cached():
+    disabled = TokenCache(enabled=False)
+    disabled.put("a", {"userId": "a"}, time.time() + 60)
+    assert disabled.get("a") is None
+    cache = TokenCache(enabled=True)
+    cache.put("a", {"userId": "a"}, None)
+    assert cache.get("a") is None
+
+
+def test_discard():
+    cache = TokenCache(enabled=True)
+    cache.put("a", {"userId": "a"}, time.time() + 60)
+    cache.discard("a")
+    assert cache.get("a") is None
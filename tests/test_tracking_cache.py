@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+import tracking_cache
+from routes.order_routes import track_order
+from tracking_cache import TrackingCache, get_tracking, invalidate_tracking
+
+
+class FakeOrders:
+    def __init__(self, order, during_find=None):
+        self.order = order
+        self.during_find = during_find
+        self.finds = 0
+
+    async def find_one(self, query, projection):
+        self.finds += 1
+        order = dict(self.order)
+        if self.during_find:
+            self.during_find()
+        return order
+
+
+@pytest.fixture
+def orders(monkeypatch):
+    collection = FakeOrders({
+        "_id": "o1",
+        "trackingCode": "TRK1",
+        "status": "created",
+        "timeline": [{"status": "created"}],
+        "createdAt": datetime(2026, 1, 1, 9, 0),
+        "updatedAt": datetime(2026, 1, 1, 9, 0)
+    })
+    monkeypatch.setattr(tracking_cache, "tracking_cache", TrackingCache(100, 60))
+    monkeypatch.setattr(tracking_cache, "read_db", lambda read_class: SimpleNamespace(orders=collection))
+    monkeypatch.setattr(tracking_cache, "_broadcast", None)
+    return collection
+
+
+def track(**headers):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/orders/tracking/TRK1",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    }
+    return asyncio.run(track_order("TRK1", Request(scope)))
+
+
+def test_revalidation_across_a_status_update(orders):
+    first = track()
+    assert first.status_code == 200
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+    assert track(if_none_match=etag).status_code == 304
+    assert track(if_none_match=f'W/"other", {etag}').status_code == 304
+    assert track(if_modified_since=last_modified).status_code == 304
+    assert orders.finds == 1
+
+    # What the admin status update does
+    orders.order["status"] = "picked"
+    orders.order["timeline"] = orders.order["timeline"] + [{"status": "picked"}]
+    orders.order["updatedAt"] = datetime(2026, 1, 1, 10, 0)
+    asyncio.run(invalidate_tracking("TRK1"))
+
+    updated = track(if_none_match=etag)
+    assert updated.status_code == 200
+    assert updated.headers["etag"] != etag
+    assert b'"picked"' in updated.body
+    assert track(if_modified_since=last_modified).status_code == 200
+    assert track(if_none_match=updated.headers["etag"]).status_code == 304
+
+
+def test_if_none_match_wins_over_if_modified_since(orders):
+    first = track()
+    response = track(if_none_match='W/"other"', if_modified_since=first.headers["last-modified"])
+    assert response.status_code == 200
+
+
+def test_load_racing_an_invalidation_is_not_cached(orders):
+    orders.during_find = lambda: tracking_cache.tracking_cache.invalidate("TRK1")
+    assert asyncio.run(get_tracking("TRK1")) is not None
+    orders.during_find = None
+
+    asyncio.run(get_tracking("TRK1"))
+    assert orders.finds == 2
+
+
+def test_invalidation_is_broadcast(orders, monkeypatch):
+    sent = []
+
+    async def broadcast(tracking_code):
+        sent.append(tracking_code)
+
+    monkeypatch.setattr(tracking_cache, "_broadcast", broadcast)
+    track()
+    asyncio.run(invalidate_tracking("TRK1"))
+    assert sent == ["TRK1"]
+    assert tracking_cache.tracking_cache.metrics()["invalidations"] == 1
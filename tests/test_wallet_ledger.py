@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+import wallet_ledger
+from benchmarks import wallet_stress
+
+
+@pytest.mark.mongod
+def test_parallel_debits_respect_guard_and_match_ledger():
+    # run() asserts final balances against accepted operations and the ledger
+    asyncio.run(wallet_stress.run(operations=1000, users=3, seed=7))
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return [dict(doc) for doc in self.docs]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeLedgerDb:
+    """users and transactions; `during_aggregate` runs once the ledger is summed"""
+
+    def __init__(self, balances, entries, during_aggregate=None):
+        self.balances = balances
+        self.entries = entries
+        self.during_aggregate = during_aggregate
+        self.resets = []
+        self.users = SimpleNamespace(find=self.find_users, bulk_write=self.bulk_write)
+        self.transactions = SimpleNamespace(aggregate=self.aggregate)
+        self.migrations = SimpleNamespace(find_one=self.find_migration)
+
+    def find_users(self, query, projection):
+        return FakeCursor([{"_id": ObjectId(uid), "balance": b} for uid, b in self.balances.items()])
+
+    def aggregate(self, pipeline):
+        user = pipeline[0]["$match"]["userId"] if "$match" in pipeline[0] else None
+        totals = {}
+        for uid, amount in self.entries:
+            if user in (None, uid):
+                row = totals.setdefault(uid, {"_id": uid, "total": 0.0, "entries": 0})
+                row["total"] += amount
+                row["entries"] += 1
+        if self.during_aggregate:
+            self.during_aggregate(self)
+            self.during_aggregate = None
+        return FakeCursor(list(totals.values()))
+
+    async def bulk_write(self, requests, ordered=False):
+        for request in requests:
+            uid = str(request._filter["_id"])
+            if self.balances[uid] == request._filter["balance"]:
+                self.balances[uid] = request._doc["$set"]["balance"]
+                self.resets.append(uid)
+
+    async def find_migration(self, query):
+        return {"_id": query["_id"]}
+
+
+USER = "64b000000000000000000001"
+
+
+def test_fix_does_not_refund_a_debit_that_lands_mid_reconcile(monkeypatch):
+    def debit(fake):
+        fake.balances[USER] -= 30.0
+        fake.entries.append((USER, -30.0))
+
+    fake = FakeLedgerDb({USER: 100.0}, [(USER, 100.0)], during_aggregate=debit)
+    monkeypatch.setattr(wallet_ledger, "db", fake)
+    asyncio.run(wallet_ledger.reconcile_balances(fix=True))
+    assert fake.balances[USER] == 70.0
+    assert fake.resets == []
+
+
+def test_fix_resets_a_drifted_balance(monkeypatch):
+    fake = FakeLedgerDb({USER: 120.0}, [(USER, 100.0)])
+    monkeypatch.setattr(wallet_ledger, "db", fake)
+    mismatches = asyncio.run(wallet_ledger.reconcile_balances(fix=True))
+    assert [m["difference"] for m in mismatches] == [20.0]
+    assert fake.balances[USER] == 100.0